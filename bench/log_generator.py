@@ -0,0 +1,241 @@
+"""
+Synthetic Wowza Streaming Engine access logs for benchmarks
+
+Writes W3C extended logs with the default Wowza field list: sessions that
+connect, play or publish and stop, mixed with warnings and errors (codec,
+transcoder, network) at a configurable ratio, so every prompt filter and
+statistic has something to find. Output is written in blocks, so logs of
+any size (1 MB to 10 GB and more) can be generated with constant memory.
+"""
+
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from log_parser import WOWZA_DEFAULT_FIELDS  # noqa: E402
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+COMPRESSORS = {
+    None: (open, ""),
+    "gz": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+APPS = ("live", "vod", "edge", "transcode")
+STREAMS = ("camera1", "camera2", "news_720p", "sports_1080p", "event_hevc", "radio_aac", "lobby", "stage")
+USER_AGENTS = ("LNX 9,0,124,2", "Wirecast/14.3", "OBS-Studio/29.1", "Lavf/60.3.100", "AppleCoreMedia/1.0.0")
+
+INFO_EVENTS = (
+    ("connect-pending", "session", "100", "-"),
+    ("connect", "session", "200", "-"),
+    ("create", "stream", "200", "-"),
+    ("play", "stream", "200", "-"),
+    ("publish", "stream", "200", "-"),
+    ("stop", "stream", "200", "-"),
+    ("unpublish", "stream", "200", "-"),
+    ("destroy", "stream", "200", "-"),
+    ("disconnect", "session", "200", "-"),
+    ("comment", "server", "200", "LiveStreamPacketizerCupertino.addChunk: Add chunk"),
+)
+
+WARN_EVENTS = (
+    ("comment", "server", "200", "LiveStreamPacketizerCupertino.endChunkTS: Chunk duration exceeded target duration"),
+    ("comment", "server", "200", "MediaReaderH264.indexFrame: Buffer underrun, frame dropped"),
+    ("comment", "stream", "200", "RTPDePacketizerMPEG4LATM: Audio timestamp jump, AAC sync lost"),
+    ("comment", "server", "200", "TranscoderStreamDestination: Encode latency above threshold, frames dropped"),
+    ("comment", "session", "200", "RTMP bandwidth below stream bitrate, client buffering"),
+)
+
+ERROR_EVENTS = (
+    ("comment", "server", "500", "TranscoderSessionVideo: GPU decode failed (nvenc session limit reached)"),
+    ("comment", "stream", "400", "LiveStreamPacketizerCupertino: Unsupported codec (video:HEVC) for HLS packetization"),
+    ("comment", "stream", "400", "H264 SPS/PPS missing, codec config not received for stream"),
+    ("comment", "session", "408", "RTMP handshake timeout after 10000 ms, connection reset"),
+    ("comment", "server", "500", "TranscoderStreamNameGroup: Encode profile 240p failed, transcode stopped"),
+    ("comment", "stream", "404", "MediaCaster.start: Stream not found, origin unreachable"),
+)
+
+CRITICAL_EVENTS = (
+    ("comment", "server", "500", "OutOfMemoryError in MediaCasterStreamMap, server out of heap memory"),
+)
+
+
+def parse_size(text):
+    """
+    Parse a size like '1MB', '500KB' or '10GB' (binary units).
+
+    Args:
+        text (str): Size with an optional unit
+
+    Returns:
+        int: Size in bytes
+    """
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?B?)\s*", text.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    unit = match.group(2)
+    if unit and not unit.endswith("B"):
+        unit += "B"
+    return int(float(match.group(1)) * SIZE_UNITS[unit])
+
+
+def format_size(size):
+    """Return a size in bytes as the shortest exact label (e.g. 10485760 -> '10MB')."""
+    for unit in ("TB", "GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def file_header(start):
+    """W3C directives at the top of a Wowza access log."""
+    return (
+        "#Version: 1.0\n"
+        f"#Start-Date: {start:%Y-%m-%d %H:%M:%S} UTC\n"
+        "#Software: Wowza Streaming Engine 4.8.25\n"
+        "#Fields: " + "\t".join(WOWZA_DEFAULT_FIELDS) + "\n"
+    )
+
+
+class LogLineFactory:
+    """Builds random W3C records with the default Wowza fields"""
+
+    def __init__(self, seed=0, error_ratio=0.02, warn_ratio=0.05):
+        self.random = random.Random(seed)
+        self.error_ratio = error_ratio
+        self.warn_ratio = warn_ratio
+        self.context = 0
+
+    def _event(self):
+        roll = self.random.random()
+        if roll < self.error_ratio * 0.05:
+            return "CRITICAL", self.random.choice(CRITICAL_EVENTS)
+        if roll < self.error_ratio:
+            return "ERROR", self.random.choice(ERROR_EVENTS)
+        if roll < self.error_ratio + self.warn_ratio:
+            return "WARN", self.random.choice(WARN_EVENTS)
+        return "INFO", self.random.choice(INFO_EVENTS)
+
+    def line(self, timestamp):
+        """Return one record (with newline) written at timestamp."""
+        rnd = self.random
+        severity, (event, category, status, comment) = self._event()
+        self.context += 1
+        app = rnd.choice(APPS)
+        stream = rnd.choice(STREAMS)
+        client_ip = f"10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}"
+        client_id = str(rnd.randrange(10 ** 9))
+        sent = str(rnd.randrange(3000, 50_000_000))
+        received = str(rnd.randrange(3000, 200_000))
+        uri = f"rtmp://192.168.1.10:1935/{app}/_definst_/{stream}"
+        values = (
+            f"{timestamp:%Y-%m-%d}", f"{timestamp:%H:%M:%S}", "UTC", event, category, severity, status,
+            f"{stream}-{self.context % 997}", comment, "_defaultVHost_", app, "_definst_",
+            f"{rnd.random() * 3600:.3f}", "192.168.1.10", "1935", uri, client_ip, "rtmp", "-",
+            rnd.choice(USER_AGENTS), client_id, received, sent, str(rnd.randrange(1, 64)), "0",
+            received, sent, stream, "-", stream, "-", "0", "0.0", uri, uri, "-", f"{app}/_definst_", "-"
+        )
+        return "\t".join(values) + "\n"
+
+
+def generate_logs(folder, size, files=1, seed=0, error_ratio=0.02, compress=None,
+                  start=datetime(2025, 8, 22), lines_per_second=50):
+    """
+    Write synthetic Wowza logs of about the given total (uncompressed) size.
+
+    Args:
+        folder (str): Output folder, created if missing
+        size (int): Total uncompressed size in bytes, split evenly over the files
+        files (int): Number of log files
+        seed (int): Random seed; the same arguments always give the same logs
+        error_ratio (float): Share of ERROR/CRITICAL records
+        compress (str): None, 'gz', 'bz2' or 'xz'
+        start (datetime): Timestamp of the first record
+        lines_per_second (int): Records per second of log time
+
+    Returns:
+        dict: {'files': [...], 'bytes': uncompressed bytes, 'lines': records written}
+    """
+    opener, suffix = COMPRESSORS[compress]
+    os.makedirs(folder, exist_ok=True)
+    factory = LogLineFactory(seed, error_ratio)
+    written_files = []
+    total_bytes = 0
+    total_lines = 0
+    per_file = max(1, size // max(1, files))
+    step = timedelta(seconds=1.0 / max(1, lines_per_second))
+    timestamp = start
+    for index in range(files):
+        path = Path(folder) / f"wowzastreamingengine_access.log.{start:%Y-%m-%d}.{index:03d}.log{suffix}"
+        header = file_header(timestamp)
+        written = len(header)
+        with opener(path, "wt", encoding="utf-8", newline="") as f:
+            f.write(header)
+            block = []
+            block_bytes = 0
+            while written < per_file:
+                line = factory.line(timestamp)
+                timestamp += step
+                block.append(line)
+                block_bytes += len(line)
+                written += len(line)
+                total_lines += 1
+                if block_bytes >= 1024 * 1024:
+                    f.write("".join(block))
+                    block = []
+                    block_bytes = 0
+            f.write("".join(block))
+        written_files.append(str(path))
+        total_bytes += written
+    return {"files": written_files, "bytes": total_bytes, "lines": total_lines}
+
+
+def ensure_logs(data_dir, size, files=1, seed=0, error_ratio=0.02, compress=None):
+    """
+    Return a folder of generated logs, generating it only if it does not exist yet.
+
+    Args:
+        data_dir (str): Parent folder for generated data sets
+        size, files, seed, error_ratio, compress: See generate_logs()
+
+    Returns:
+        Path: Folder with the logs
+    """
+    name = f"wowza_{format_size(size)}_{files}f_s{seed}_e{error_ratio}" + (f"_{compress}" if compress else "")
+    folder = Path(data_dir) / name
+    marker = folder / ".complete"
+    if not marker.exists():
+        for stale in folder.glob("*.log*"):
+            stale.unlink()
+        print(f"Generating {format_size(size)} of logs in {folder} ...", file=sys.stderr)
+        info = generate_logs(folder, size, files, seed, error_ratio, compress)
+        marker.write_text(f"{info['bytes']} {info['lines']}\n")
+    return folder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Wowza access logs")
+    parser.add_argument("folder", help="Output folder")
+    parser.add_argument("--size", default="10MB", help="Total uncompressed size, e.g. 1MB, 500MB, 10GB (default 10MB)")
+    parser.add_argument("--files", type=int, default=1, help="Number of log files (default 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default 0)")
+    parser.add_argument("--error-ratio", type=float, default=0.02, help="Share of ERROR/CRITICAL records (default 0.02)")
+    parser.add_argument("--compress", choices=("gz", "bz2", "xz"), help="Write compressed log archives")
+    args = parser.parse_args(argv)
+    info = generate_logs(args.folder, parse_size(args.size), args.files, args.seed, args.error_ratio, args.compress)
+    print(f"Wrote {info['lines']:,} records ({info['bytes']:,} bytes) in {len(info['files'])} file(s) to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
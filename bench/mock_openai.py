@@ -0,0 +1,428 @@
+"""
+Local stand-in for the OpenAI Responses API, for benchmarks without API costs
+
+Answers POST /v1/responses like the real endpoint (plain JSON or a streamed
+event sequence) after a configurable latency, and can inject server errors
+and 429 rate limit responses. GET /__stats returns request counters, so a
+benchmark can compute requests/sec on the server side.
+
+The Batch API is covered too: POST /v1/files uploads an input file, POST
+/v1/batches answers every request line at once and completes the batch
+immediately, GET /v1/batches/{id} and GET /v1/files/{id}/content return the
+job and its output and error files. Request lines for another endpoint than
+/v1/responses, and lines hit by the error rate, go to the error file.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockSettings:
+    """Behaviour of the mock server"""
+
+    def __init__(self, latency=0.2, jitter=0.25, first_token=0.05, output_tokens=300,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=0.5,
+                 requests_per_minute=0, tokens_per_minute=0, seed=0):
+        self.latency = latency                      # Seconds until the response is complete
+        self.jitter = jitter                        # Random +/- share of the latency
+        self.first_token = first_token              # Seconds until the first streamed token
+        self.output_tokens = output_tokens          # Output tokens per answer
+        self.error_rate = error_rate                # Share of requests answered with HTTP 500
+        self.rate_limit_rate = rate_limit_rate      # Share of requests answered with HTTP 429
+        self.retry_after = retry_after              # retry-after of 429 responses, in seconds
+        self.requests_per_minute = requests_per_minute  # Reported in x-ratelimit-* headers (0 = none)
+        self.tokens_per_minute = tokens_per_minute
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def build_answer(output_tokens):
+    """JSON answer text of roughly output_tokens tokens (4 characters per token)."""
+    filler = " ".join("buffer underrun on edge stream" for _ in range(max(0, output_tokens * 4 - 120) // 31))
+    return json.dumps({
+        "summary": {"total_errors": 3, "critical_errors": 1, "time_range": "2025-08-22 00:00 to 2025-08-22 01:00"},
+        "errors": [{"type": "codec", "count": 3, "severity": "ERROR", "description": filler}]
+    })
+
+
+def build_response(model, input_tokens, answer, output_tokens):
+    """Responses API response object."""
+    return {
+        "id": f"resp_mock_{time.time_ns()}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [{
+            "type": "message", "id": "msg_mock", "role": "assistant", "status": "completed",
+            "content": [{"type": "output_text", "text": answer, "annotations": []}]
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens
+        }
+    }
+
+
+class MockStats:
+    """Thread-safe request counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.values = {
+                "requests": 0, "succeeded": 0, "server_errors": 0, "rate_limited": 0,
+                "input_tokens": 0, "output_tokens": 0, "in_flight": 0, "max_in_flight": 0,
+                "batches": 0, "batch_requests": 0, "batch_errors": 0
+            }
+
+    def add(self, **counts):
+        with self.lock:
+            for name, amount in counts.items():
+                self.values[name] += amount
+            self.values["max_in_flight"] = max(self.values["max_in_flight"], self.values["in_flight"])
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+def parse_multipart(content_type, body):
+    """
+    Split a multipart/form-data body into its fields.
+
+    Returns:
+        dict: Field name -> (file name or None, content bytes)
+    """
+    message = BytesParser(policy=HTTP).parsebytes(f"content-type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    return {
+        part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+        for part in message.iter_parts()
+    }
+
+
+class BatchStore:
+    """Uploaded files and batch jobs of the mock Batch API"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.files = {}
+        self.batches = {}
+
+    def add_file(self, content, filename, purpose):
+        with self.lock:
+            file_id = f"file-mock{next(self.ids)}"
+            self.files[file_id] = (content, {
+                "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"
+            })
+        return self.files[file_id][1]
+
+    def add_batch(self, batch):
+        with self.lock:
+            batch["id"] = f"batch_mock{next(self.ids)}"
+            self.batches[batch["id"]] = batch
+        return batch
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate_limit_headers(self, settings):
+        headers = []
+        if settings.requests_per_minute:
+            headers += [("x-ratelimit-limit-requests", str(settings.requests_per_minute)),
+                        ("x-ratelimit-remaining-requests", str(settings.requests_per_minute - 1)),
+                        ("x-ratelimit-reset-requests", "1s")]
+        if settings.tokens_per_minute:
+            headers += [("x-ratelimit-limit-tokens", str(settings.tokens_per_minute)),
+                        ("x-ratelimit-remaining-tokens", str(settings.tokens_per_minute)),
+                        ("x-ratelimit-reset-tokens", "1s")]
+        return headers
+
+    def _send_not_found(self):
+        self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}", "type": "invalid_request_error"}})
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        store = self.server.batch_store
+        parts = path.split("/")
+        if path == "/__stats":
+            self._send_json(200, self.server.stats.snapshot())
+        elif parts[-2:-1] == ["batches"] and parts[-1] in store.batches:
+            self._send_json(200, store.batches[parts[-1]])
+        elif parts[-2:-1] == ["files"] and parts[-1] in store.files:
+            self._send_json(200, store.files[parts[-1]][1])
+        elif parts[-3:-2] == ["files"] and parts[-1] == "content" and parts[-2] in store.files:
+            content = store.files[parts[-2]][0]
+            self.send_response(200)
+            self.send_header("content-type", "application/octet-stream")
+            self.send_header("content-length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self._send_not_found()
+
+    def do_DELETE(self):
+        if self.path.rstrip("/") == "/__stats":
+            self.server.stats.reset()
+            self._send_json(200, {})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        settings = self.server.settings
+        stats = self.server.stats
+        path = self.path.split("?", 1)[0].rstrip("/")
+        raw = self.rfile.read(int(self.headers.get("content-length", 0)))
+        if path.endswith("/files"):
+            self._create_file(raw)
+            return
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+        if path.endswith("/batches"):
+            self._create_batch(body)
+            return
+        if not path.endswith("/responses"):
+            self._send_not_found()
+            return
+
+        stats.add(requests=1)
+        with self.server.random_lock:
+            roll = self.server.random.random()
+            delay = settings.latency * (1 + self.server.random.uniform(-settings.jitter, settings.jitter))
+        if roll < settings.rate_limit_rate:
+            stats.add(rate_limited=1)
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                            [("retry-after-ms", str(int(settings.retry_after * 1000)))])
+            return
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            stats.add(server_errors=1)
+            self._send_json(500, {"error": {"message": "Internal server error (mock)", "type": "server_error"}})
+            return
+
+        input_tokens = len(str(body.get("input", ""))) // 4
+        answer = build_answer(settings.output_tokens)
+        response = build_response(body.get("model", "gpt-4o-mini"), input_tokens, answer, settings.output_tokens)
+        stats.add(in_flight=1)
+        try:
+            if body.get("stream"):
+                self._stream(response, answer, delay, settings)
+            else:
+                time.sleep(max(0.0, delay))
+                self._send_json(200, response, self._rate_limit_headers(settings))
+        finally:
+            stats.add(in_flight=-1, succeeded=1, input_tokens=input_tokens, output_tokens=settings.output_tokens)
+
+    def _create_file(self, raw):
+        fields = parse_multipart(self.headers.get("content-type", ""), raw)
+        filename, content = fields.get("file", (None, None))
+        if content is None:
+            self._send_json(400, {"error": {"message": "Missing file", "type": "invalid_request_error"}})
+            return
+        purpose = (fields.get("purpose") or (None, b""))[1].decode("utf-8")
+        self._send_json(200, self.server.batch_store.add_file(content, filename or "upload.jsonl", purpose))
+
+    def _create_batch(self, body):
+        settings = self.server.settings
+        stats = self.server.stats
+        store = self.server.batch_store
+        if body.get("input_file_id") not in store.files:
+            self._send_json(404, {"error": {"message": f"No such file: {body.get('input_file_id')}",
+                                            "type": "invalid_request_error"}})
+            return
+
+        outputs, errors = [], []
+        for index, line in enumerate(store.files[body["input_file_id"]][0].decode("utf-8").splitlines()):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            result = {"id": f"batch_req_mock{index}", "custom_id": request.get("custom_id"), "response": None, "error": None}
+            with self.server.random_lock:
+                roll = self.server.random.random()
+            if request.get("url") != body.get("endpoint"):
+                result["error"] = {"code": "invalid_url",
+                                   "message": f"The URL provided for this request does not match the batch endpoint {body.get('endpoint')}"}
+                errors.append(result)
+            elif roll < settings.error_rate:
+                result["response"] = {"status_code": 500, "request_id": f"req_mock{index}",
+                                      "body": {"error": {"message": "Internal server error (mock)", "type": "server_error"}}}
+                errors.append(result)
+            else:
+                request_body = request.get("body") or {}
+                input_tokens = len(str(request_body.get("input", ""))) // 4
+                response = build_response(request_body.get("model", "gpt-4o-mini"), input_tokens,
+                                          build_answer(settings.output_tokens), settings.output_tokens)
+                result["response"] = {"status_code": 200, "request_id": f"req_mock{index}", "body": response}
+                outputs.append(result)
+                stats.add(input_tokens=input_tokens, output_tokens=settings.output_tokens)
+
+        now = int(time.time())
+        output_file = store.add_file("".join(json.dumps(item) + "\n" for item in outputs).encode("utf-8"),
+                                     "batch_output.jsonl", "batch_output") if outputs else None
+        error_file = store.add_file("".join(json.dumps(item) + "\n" for item in errors).encode("utf-8"),
+                                    "batch_errors.jsonl", "batch_output") if errors else None
+        batch = store.add_batch({
+            "object": "batch", "endpoint": body.get("endpoint"), "errors": None,
+            "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+            "status": "completed", "output_file_id": output_file and output_file["id"],
+            "error_file_id": error_file and error_file["id"], "created_at": now, "in_progress_at": now,
+            "expires_at": now + 24 * 3600, "finalizing_at": now, "completed_at": now,
+            "request_counts": {"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)},
+            "metadata": body.get("metadata")
+        })
+        stats.add(batches=1, batch_requests=len(outputs) + len(errors), batch_errors=len(errors))
+        self._send_json(200, batch)
+
+    def _stream(self, response, answer, delay, settings):
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        for name, value in self._rate_limit_headers(settings):
+            self.send_header(name, value)
+        self.end_headers()
+        sequence = [0]
+
+        def send(event):
+            event["sequence_number"] = sequence[0]
+            sequence[0] += 1
+            data = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        send({"type": "response.created", "response": dict(response, status="in_progress", output=[], usage=None)})
+        first_token = min(settings.first_token, delay)
+        time.sleep(max(0.0, first_token))
+        pieces = [answer[i:i + 400] for i in range(0, len(answer), 400)] or [""]
+        pause = max(0.0, delay - first_token) / len(pieces)
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(pause)
+            send({"type": "response.output_text.delta", "item_id": "msg_mock", "output_index": 0,
+                  "content_index": 0, "delta": piece, "logprobs": []})
+        time.sleep(pause)
+        send({"type": "response.completed", "response": response})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockResponsesServer:
+    """
+    Mock Responses API server running in a background thread.
+
+    Usage:
+        with MockResponsesServer(MockSettings(latency=0.1)) as server:
+            config['base_url'] = server.base_url
+    """
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        self.settings = settings or MockSettings()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.settings = self.settings
+        self.httpd.stats = MockStats()
+        self.httpd.random = random.Random(self.settings.seed)
+        self.httpd.random_lock = threading.Lock()
+        self.httpd.batch_store = BatchStore()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-openai", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_settings_arguments(parser):
+    """Add the MockSettings options to an argparse parser."""
+    group = parser.add_argument_group("mock server")
+    group.add_argument("--latency", type=float, default=0.2, help="Seconds per response (default 0.2)")
+    group.add_argument("--jitter", type=float, default=0.25, help="Random +/- share of the latency (default 0.25)")
+    group.add_argument("--first-token", type=float, default=0.05, help="Seconds to the first streamed token (default 0.05)")
+    group.add_argument("--output-tokens", type=int, default=300, help="Output tokens per answer (default 300)")
+    group.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with HTTP 500")
+    group.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests rejected with HTTP 429")
+    group.add_argument("--retry-after", type=float, default=0.5, help="retry-after of 429 responses in seconds")
+    group.add_argument("--rpm", type=int, default=0, help="Requests per minute reported in x-ratelimit headers")
+    group.add_argument("--tpm", type=int, default=0, help="Tokens per minute reported in x-ratelimit headers")
+    group.add_argument("--seed", type=int, default=0, help="Random seed (default 0)")
+
+
+def settings_from_args(args):
+    """Build MockSettings from options added by add_settings_arguments()."""
+    return MockSettings(args.latency, args.jitter, args.first_token, args.output_tokens, args.error_rate,
+                        args.rate_limit_rate, args.retry_after, args.rpm, args.tpm, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock OpenAI Responses API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+    server = MockResponsesServer(settings_from_args(args), args.host, args.port)
+    print(f"Mock Responses API on {server.base_url} (set OPENAI_BASE_URL to this URL). Press Ctrl+C to stop.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Benchmark suite: throughput, latency and memory of the analyzer against a local mock API
+
+For every (log size, payload mode) case a fresh Python process measures:
+  - ingestion: streaming all log lines from disk (MB/s)
+  - prompt assembly: building the payload (parsing, statistics, chunking)
+    and the full prompt text of every request
+  - analyze_logs end to end against the mock Responses server (wall time,
+    requests/sec, errors)
+  - peak RSS of the process and of its worker processes
+Logs are generated once per size and reused. Results are written as JSON;
+--baseline compares them with an earlier result file and exits with status 1
+when a metric regressed by more than --tolerance.
+
+Usage:
+    python bench/run_bench.py --sizes 1MB,10MB,100MB --modes summary,raw
+    python bench/run_bench.py --sizes 1GB --baseline bench/results/previous.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from log_generator import ensure_logs, format_size, parse_size  # noqa: E402
+from mock_openai import MockResponsesServer, add_settings_arguments, settings_from_args  # noqa: E402
+
+RESULT_SCHEMA = 1
+
+# (metric path, True if higher is better) compared against a baseline
+COMPARED_METRICS = (
+    ("ingest.mb_per_s", True),
+    ("prompt_assembly.seconds", False),
+    ("analyze.seconds", False),
+    ("analyze.requests_per_s", True),
+    ("peak_rss_mb", False),
+)
+
+# Timings that change by less than this are treated as noise
+MIN_SECONDS_CHANGE = 0.05
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(logs_folder, base_url, payload_mode, overrides):
+    """
+    Measure one case in the current process (called in a fresh subprocess by the suite).
+
+    Args:
+        logs_folder (str): Folder with generated logs
+        base_url (str): Mock server URL
+        payload_mode (str): LOG_PAYLOAD_MODE for the run
+        overrides (dict): Extra configuration values
+
+    Returns:
+        dict: Measurements of the case
+    """
+    from config import get_config
+    from log_filter import group_prompts_by_filter
+    from log_reader import iter_log_lines
+    from payload import build_log_payload
+    from prompts import WowzaAnalysisPrompts, build_full_prompt
+
+    config = dict(
+        get_config(),
+        api_key="bench",
+        base_url=base_url,
+        log_payload_mode=payload_mode,
+        cache_mode="off",
+        runs_folder="",
+        incremental=False,
+        batch_mode=False,
+        max_run_cost_usd=0.0,
+        max_run_tokens=0,
+        **overrides
+    )
+    result = {}
+
+    # Ingestion: stream every line from disk
+    read_stats = {}
+    start = time.perf_counter()
+    for _ in iter_log_lines(Path(logs_folder), config['log_read_buffer_kb'] * 1024, config['log_use_mmap'],
+                            stats=read_stats, decompress_workers=config['log_decompress_workers']):
+        pass
+    seconds = time.perf_counter() - start
+    megabytes = read_stats["bytes_read"] / (1024 * 1024)
+    result["ingest"] = {
+        "seconds": round(seconds, 3),
+        "bytes": read_stats["bytes_read"],
+        "lines": read_stats["lines"],
+        "mb_per_s": round(megabytes / seconds, 1) if seconds else None,
+        "lines_per_s": round(read_stats["lines"] / seconds) if seconds else None
+    }
+
+    # Prompt assembly: payloads for the configured mode (one per pre-filter group in raw mode)
+    # plus the full text of every request
+    prompts = WowzaAnalysisPrompts.get_active_prompts(config['prompt_set'])
+    groups = [(None, prompts)]
+    if payload_mode == "raw":
+        groups = group_prompts_by_filter(prompts, WowzaAnalysisPrompts.get_prompt_filters(), config)
+    start = time.perf_counter()
+    characters = 0
+    requests = 0
+    for line_filter, group_prompts in groups:
+        payload = build_log_payload(logs_folder, config, line_filter=line_filter)
+        for shard in payload.chunks if payload.chunks is not None else [payload.content]:
+            for prompt_text in group_prompts.values():
+                characters += len(build_full_prompt(prompt_text, shard))
+                requests += 1
+    seconds = time.perf_counter() - start
+    result["prompt_assembly"] = {
+        "seconds": round(seconds, 3),
+        "requests": requests,
+        "prompt_characters": characters,
+        "mb_per_s": round(megabytes * len(groups) / seconds, 1) if seconds else None
+    }
+    del payload
+
+    # End to end against the mock server
+    from ai_analyzer import analyze_logs
+    start = time.perf_counter()
+    results = analyze_logs(logs_folder, config)
+    seconds = time.perf_counter() - start
+    analyses = (results or {}).get("analysis_results", {})
+    result["analyze"] = {
+        "seconds": round(seconds, 3),
+        "prompts": len(analyses),
+        "failed_prompts": sum(1 for analysis in analyses.values() if analysis.get("status") != "success"),
+        "total_tokens": (results or {}).get("token_summary", {}).get("total_tokens", 0)
+    }
+
+    result["peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_SELF)
+    result["peak_worker_rss_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metric(case, path):
+    value = case
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def compare_results(current, baseline, tolerance):
+    """
+    Compare a result file with a baseline.
+
+    Args:
+        current (dict): Results of this run
+        baseline (dict): Results of an earlier run
+        tolerance (float): Allowed relative change in the bad direction (0.15 = 15%)
+
+    Returns:
+        list: (case name, metric, baseline value, current value, relative change, regressed)
+    """
+    baseline_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    rows = []
+    for case in current["cases"]:
+        previous = baseline_cases.get(case["name"])
+        if previous is None or "error" in case or "error" in previous:
+            continue
+        for path, higher_is_better in COMPARED_METRICS:
+            old, new = _metric(previous, path), _metric(case, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = -change > tolerance if higher_is_better else change > tolerance
+            if path.endswith(".seconds") and abs(new - old) < MIN_SECONDS_CHANGE:
+                regressed = False
+            rows.append((case["name"], path, old, new, change, regressed))
+    return rows
+
+
+def run_suite(args):
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    overrides = json.loads(args.config) if args.config else {}
+    work_dir = Path(args.data_dir) / "work"
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    settings = settings_from_args(args)
+    report = {
+        "schema": RESULT_SCHEMA,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "mock_server": settings.as_dict(),
+        "config_overrides": overrides,
+        "cases": []
+    }
+
+    with MockResponsesServer(settings) as server:
+        for size in sizes:
+            logs_folder = ensure_logs(args.data_dir, size, args.files, args.seed, args.error_ratio, args.compress)
+            for mode in modes:
+                name = f"{format_size(size)}/{mode}"
+                print(f"[{name}] running ...", file=sys.stderr)
+                server.stats.reset()
+                command = [sys.executable, str(Path(__file__).resolve()), "--case", str(logs_folder.resolve()),
+                           "--base-url", server.base_url, "--mode", mode, "--config", json.dumps(overrides)]
+                with open(work_dir / f"{format_size(size)}_{mode}.log", "w") as log_file:
+                    child = subprocess.run(command, cwd=work_dir, stdout=subprocess.PIPE,
+                                           stderr=None if args.verbose else log_file, text=True)
+                case = {"name": name, "size_bytes": size, "payload_mode": mode}
+                if child.returncode != 0:
+                    case["error"] = f"exit status {child.returncode}, see {log_file.name}"
+                else:
+                    case.update(json.loads(child.stdout.strip().splitlines()[-1]))
+                    stats = server.stats.snapshot()
+                    seconds = case["analyze"]["seconds"]
+                    case["analyze"].update(
+                        requests=stats["requests"],
+                        requests_per_s=round(stats["requests"] / seconds, 2) if seconds else None,
+                        server_errors=stats["server_errors"],
+                        rate_limited=stats["rate_limited"],
+                        max_in_flight=stats["max_in_flight"],
+                        input_tokens=stats["input_tokens"]
+                    )
+                report["cases"].append(case)
+                _print_case(case)
+
+    output = Path(args.output) if args.output else \
+        BENCH_DIR / "results" / f"bench_{report['git_commit'] or 'unknown'}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results: {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        rows = compare_results(report, baseline, args.tolerance)
+        regressions = [row for row in rows if row[5]]
+        print(f"\nCompared with {args.baseline} (commit {baseline.get('git_commit')}, tolerance {args.tolerance:.0%}):")
+        for name, path, old, new, change, regressed in rows:
+            print(f"  {'REGRESSION' if regressed else 'ok':10} {name:20} {path:26} {old:>12} -> {new:<12} ({change:+.1%})")
+        if regressions:
+            return 1
+    return 1 if any("error" in case for case in report["cases"]) else 0
+
+
+def _print_case(case):
+    if "error" in case:
+        print(f"  {case['name']}: FAILED ({case['error']})")
+        return
+    ingest, assembly, analyze = case["ingest"], case["prompt_assembly"], case["analyze"]
+    print(f"  {case['name']}: ingest {ingest['mb_per_s']} MB/s, prompt assembly {assembly['seconds']}s, "
+          f"analyze {analyze['seconds']}s ({analyze['requests']} requests, {analyze['requests_per_s']} req/s), "
+          f"peak RSS {case['peak_rss_mb']} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wowza Log Analyzer benchmark suite (no API costs)")
+    parser.add_argument("--sizes", default="1MB,10MB,100MB", help="Comma-separated log sizes, e.g. 1MB,1GB,10GB")
+    parser.add_argument("--modes", default="summary", help="Comma-separated payload modes: summary, templates, raw")
+    parser.add_argument("--files", type=int, default=4, help="Log files per data set (default 4)")
+    parser.add_argument("--error-ratio", type=float, default=0.02, help="Share of ERROR/CRITICAL records")
+    parser.add_argument("--compress", choices=("gz", "bz2", "xz"), help="Generate compressed log archives")
+    parser.add_argument("--data-dir", default=str(BENCH_DIR / "data"), help="Generated logs (reused between runs)")
+    parser.add_argument("--config", help="JSON object of configuration overrides, e.g. '{\"max_concurrency\": 8}'")
+    parser.add_argument("--output", help="Result file (default bench/results/bench_<commit>_<time>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed regression (default 0.15 = 15%%)")
+    parser.add_argument("--verbose", action="store_true", help="Show the analyzer output of every case")
+    add_settings_arguments(parser)
+    # Internal: measure one case in this process
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        overrides = json.loads(args.config) if args.config else {}
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_case(args.case, args.base_url, args.mode, overrides)
+        print(json.dumps(result))
+        return 0
+    return run_suite(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Startup time of the command line commands that do not talk to the API
+
+Runs each command several times in a fresh interpreter and compares the
+median wall time, minus the time of an empty interpreter start, with a
+budget. It also checks that no heavy module (openai, httpx) is imported by
+these commands. Exits with status 1 when a budget is exceeded.
+
+Usage:
+    python bench/startup_bench.py
+    python bench/startup_bench.py --budget-ms 80 --runs 15 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "main.py"
+
+# Commands measured, as arguments of main.py
+COMMANDS = (
+    ("--help",),
+    ("analyze", "--help"),
+    ("plan", "--help"),
+    ("report",),
+)
+
+# Modules that only commands sending requests may import
+HEAVY_MODULES = ("openai", "httpx")
+
+
+def _run(arguments, env=None):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *arguments], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               env=env, text=True)
+    return time.perf_counter() - start, completed
+
+
+def measure(arguments, runs):
+    """Median wall time in seconds of running the Python arguments in a fresh interpreter."""
+    return statistics.median(_run(arguments)[0] for _ in range(runs))
+
+
+def imported_heavy_modules(arguments):
+    """Heavy modules imported by a command, from python -X importtime output."""
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME="1")
+    _, completed = _run(arguments, env)
+    imported = {line.rsplit("|", 1)[-1].strip() for line in completed.stderr.splitlines() if line.startswith("import time:")}
+    return sorted(name for name in imported if name.split(".")[0] in HEAVY_MODULES)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup time budget of local commands")
+    parser.add_argument("--runs", type=int, default=9, help="Runs per command; the median is used (default 9)")
+    parser.add_argument("--budget-ms", type=float, default=60.0,
+                        help="Allowed startup time over an empty interpreter, in ms (default 60)")
+    parser.add_argument("--output", help="Write the measurements as JSON to this file")
+    args = parser.parse_args(argv)
+
+    baseline = measure(["-c", "pass"], args.runs)
+    report = {"python": sys.version.split()[0], "interpreter_ms": round(baseline * 1000, 1),
+              "budget_ms": args.budget_ms, "commands": []}
+    failed = False
+    print(f"Empty interpreter: {baseline * 1000:.1f} ms (median of {args.runs})")
+    for command in COMMANDS:
+        arguments = [str(MAIN), *command]
+        overhead = (measure(arguments, args.runs) - baseline) * 1000
+        heavy = imported_heavy_modules(arguments)
+        ok = overhead <= args.budget_ms and not heavy
+        failed = failed or not ok
+        report["commands"].append({"command": " ".join(command), "startup_ms": round(overhead, 1),
+                                   "heavy_modules": heavy, "ok": ok})
+        print(f"  {'ok' if ok else 'OVER BUDGET'}: main.py {' '.join(command):16} +{overhead:.1f} ms"
+              + (f", imports {', '.join(heavy)}" if heavy else ""))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Local pre-aggregation of parsed Wowza logs into compact statistics
+"""
+
+import json
+import re
+from collections import Counter
+from log_parser import EMPTY_VALUE, PLAIN_FIELDS, parse_batches
+
+# Severity levels counted as errors, and as problems worth listing in top messages
+ERROR_SEVERITIES = frozenset(("ERROR", "CRITICAL"))
+PROBLEM_SEVERITIES = frozenset(("WARN", "ERROR", "CRITICAL"))
+
+# Upper bound on distinct message templates tracked, keeps memory flat on noisy logs
+MAX_MESSAGE_KEYS = 10000
+OTHER_MESSAGES = "(other messages)"
+
+_NUMBERS = re.compile(r"\b(?:0x)?[0-9a-fA-F]*\d[0-9a-fA-F]*\b")
+
+
+def normalize_message(message, max_length=200):
+    """
+    Collapse IDs and numbers in a message so identical errors are counted together.
+
+    Args:
+        message (str): Log message
+        max_length (int): Maximum length of the returned text
+
+    Returns:
+        str: Normalized message
+    """
+    return _NUMBERS.sub("#", message.strip())[:max_length]
+
+
+class LogAggregator:
+    """
+    Counts severities, categories, events, streams, messages and per-minute
+    rates over parsed records. Aggregators can be merged, so partial results
+    from several files or workers add up to the same totals.
+    """
+
+    def __init__(self):
+        self.total_records = 0
+        self.severity = Counter()
+        self.category = Counter()
+        self.error_category = Counter()
+        self.event = Counter()
+        self.stream = Counter()
+        self.messages = Counter()
+        self.per_minute = Counter()
+        self.errors_per_minute = Counter()
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def add_batch(self, batch):
+        """
+        Add a RecordBatch from log_parser.parse_batches.
+
+        Args:
+            batch (RecordBatch): Column-oriented records
+        """
+        severities = batch.column("x-severity")
+        categories = batch.column("x-category")
+        dates = batch.column("date")
+        times = batch.column("time")
+        streams = batch.column("x-sname")
+        contexts = batch.column("x-ctx")
+        comments = batch.column("x-comment")
+
+        self.total_records += batch.size
+        self.severity.update(severity or "UNKNOWN" for severity in severities)
+        self.category.update(category for category in categories if category)
+        self.event.update(event for event in batch.column("x-event") if event)
+        self.stream.update(stream for stream in streams if stream)
+        self.error_category.update(
+            category or "uncategorized"
+            for severity, category in zip(severities, categories)
+            if severity in ERROR_SEVERITIES
+        )
+
+        for severity, comment, context in zip(severities, comments, contexts):
+            if severity in PROBLEM_SEVERITIES:
+                self._count_message(f"[{severity}] {normalize_message(comment or context or '')}")
+
+        for date, time_value, severity in zip(dates, times, severities):
+            if not date or not time_value:
+                continue
+            minute = f"{date} {time_value[:5]}"
+            self.per_minute[minute] += 1
+            if severity in ERROR_SEVERITIES:
+                self.errors_per_minute[minute] += 1
+            timestamp = f"{date} {time_value}"
+            if self.first_timestamp is None or timestamp < self.first_timestamp:
+                self.first_timestamp = timestamp
+            if self.last_timestamp is None or timestamp > self.last_timestamp:
+                self.last_timestamp = timestamp
+
+    def _count_message(self, key, count=1):
+        if key in self.messages or len(self.messages) < MAX_MESSAGE_KEYS:
+            self.messages[key] += count
+        else:
+            self.messages[OTHER_MESSAGES] += count
+
+    def merge(self, other):
+        """
+        Add the counts of another aggregator to this one.
+
+        Args:
+            other (LogAggregator): Aggregator to merge in
+
+        Returns:
+            LogAggregator: self
+        """
+        self.total_records += other.total_records
+        self.severity.update(other.severity)
+        self.category.update(other.category)
+        self.error_category.update(other.error_category)
+        self.event.update(other.event)
+        self.stream.update(other.stream)
+        for key, count in other.messages.items():
+            self._count_message(key, count)
+        self.per_minute.update(other.per_minute)
+        self.errors_per_minute.update(other.errors_per_minute)
+        for timestamp in (other.first_timestamp, other.last_timestamp):
+            if timestamp is None:
+                continue
+            if self.first_timestamp is None or timestamp < self.first_timestamp:
+                self.first_timestamp = timestamp
+            if self.last_timestamp is None or timestamp > self.last_timestamp:
+                self.last_timestamp = timestamp
+        return self
+
+    def summary(self, top_n=5):
+        """
+        Build the statistics dictionary sent to the model.
+
+        Args:
+            top_n (int): Number of entries kept in top-N lists
+
+        Returns:
+            dict: Counts, distributions, top messages and per-minute rates
+        """
+        total_errors = sum(self.severity[severity] for severity in ERROR_SEVERITIES)
+        error_percentages = {
+            category: round(count * 100.0 / total_errors, 1)
+            for category, count in self.error_category.most_common()
+        } if total_errors else {}
+
+        minutes = len(self.per_minute)
+        return {
+            "total_records": self.total_records,
+            "total_errors": total_errors,
+            "time_range": {"start": self.first_timestamp, "end": self.last_timestamp},
+            "severity_distribution": dict(self.severity.most_common()),
+            "error_categories": dict(self.error_category.most_common()),
+            "error_category_percentages": error_percentages,
+            "categories": dict(self.category.most_common(top_n * 2)),
+            "top_events": dict(self.event.most_common(top_n * 2)),
+            "top_streams": dict(self.stream.most_common(top_n)),
+            "top_messages": [
+                {"message": message, "count": count}
+                for message, count in self.messages.most_common(top_n)
+            ],
+            "rates": {
+                "minutes_with_activity": minutes,
+                "average_lines_per_minute": round(self.total_records / minutes, 1) if minutes else 0,
+                "peak_minutes": dict(self.per_minute.most_common(3)),
+                "peak_error_minutes": dict(self.errors_per_minute.most_common(3))
+            }
+        }
+
+
+def format_summary_block(summary):
+    """
+    Render a statistics dictionary as the compact text block used in prompts.
+
+    Args:
+        summary (dict): Output of LogAggregator.summary()
+
+    Returns:
+        str: Prompt text
+    """
+    return (
+        "PRE-COMPUTED LOG STATISTICS (exact counts over all log lines):\n"
+        + json.dumps(summary, separators=(",", ":"), ensure_ascii=False)
+    )
+
+
+def _format_sample(sample):
+    """Render sampled (schema, values) rows as log text, repeating the #Fields header when the schema changes."""
+    lines = []
+    names = None
+    for row_schema, values in sample:
+        if row_schema.names == PLAIN_FIELDS:
+            lines.append(values[-1])
+            continue
+        if row_schema.names != names:
+            lines.append("#Fields: " + " ".join(row_schema.names))
+            names = row_schema.names
+        lines.append("\t".join(EMPTY_VALUE if value is None else value for value in values))
+    return "\n".join(lines)
+
+
+class LogSampler:
+    """
+    Keeps the first sample_lines WARN/ERROR/CRITICAL rows and the first
+    sample_lines other rows of a record stream. Samplers of consecutive parts
+    of a stream can be merged in order and give the same sample as one pass.
+    """
+
+    def __init__(self, sample_lines=200):
+        self.sample_lines = sample_lines
+        self.problems = []
+        self.others = []
+
+    def add_batch(self, batch):
+        """
+        Sample rows from a RecordBatch from log_parser.parse_batches.
+
+        Args:
+            batch (RecordBatch): Column-oriented records
+        """
+        if len(self.problems) >= self.sample_lines:
+            return
+        severities = batch.column("x-severity")
+        if len(self.others) >= self.sample_lines and PROBLEM_SEVERITIES.isdisjoint(severities):
+            return
+        for severity, values in zip(severities, zip(*batch.columns)):
+            if severity in PROBLEM_SEVERITIES:
+                self.problems.append((batch.schema, values))
+                if len(self.problems) >= self.sample_lines:
+                    break
+            elif len(self.others) < self.sample_lines:
+                self.others.append((batch.schema, values))
+
+    def merge(self, other):
+        """
+        Append the sample of the part of the stream that follows this one.
+
+        Args:
+            other (LogSampler): Sampler of the next part
+
+        Returns:
+            LogSampler: self
+        """
+        self.problems.extend(other.problems[:max(0, self.sample_lines - len(self.problems))])
+        self.others.extend(other.others[:max(0, self.sample_lines - len(self.others))])
+        return self
+
+    def sample(self):
+        """Return the sampled rows, problems first, topped up with other rows."""
+        return self.problems + self.others[:max(0, self.sample_lines - len(self.problems))]
+
+
+def format_summary_payload(aggregator, sampler, top_n=5):
+    """
+    Render aggregated statistics and sampled rows as the payload text.
+
+    Args:
+        aggregator (LogAggregator): Counts over all records
+        sampler (LogSampler): Sampled rows
+        top_n (int): Number of entries kept in top-N lists
+
+    Returns:
+        tuple: (payload text, summary dict)
+    """
+    sample = sampler.sample()
+    summary = aggregator.summary(top_n)
+    payload = format_summary_block(summary)
+    if sample:
+        payload += (
+            f"\n\nSAMPLE LOG LINES ({len(sample)} of {aggregator.total_records}, warnings and errors first):\n"
+            + _format_sample(sample)
+        )
+    return payload, summary
+
+
+def build_summary_payload(lines, sample_lines=200, top_n=5, stats=None):
+    """
+    Aggregate a log stream into statistics plus a small raw sample, in one pass.
+
+    The sample prefers WARN/ERROR/CRITICAL lines and is topped up with other
+    lines when there are not enough of them.
+
+    Args:
+        lines (iterable): Stream of log lines
+        sample_lines (int): Maximum number of raw lines kept
+        top_n (int): Number of entries kept in top-N lists
+        stats (dict): Optional dict updated with parser counters
+
+    Returns:
+        tuple: (payload text, summary dict)
+    """
+    aggregator = LogAggregator()
+    sampler = LogSampler(sample_lines)
+    for batch in parse_batches(lines, stats=stats):
+        aggregator.add_batch(batch)
+        sampler.add_batch(batch)
+    return format_summary_payload(aggregator, sampler, top_n)
@@ -1,239 +1,1176 @@
+import os
 import json
-import openai
+import asyncio
+import contextlib
 import time
 import logging
 from pathlib import Path
-from prompts import WowzaAnalysisPrompts
+from types import SimpleNamespace
+from prompts import WowzaAnalysisPrompts, build_full_prompt
+from prompt_graph import AGGREGATES, build_derived_input, plan_stages, resolve_inputs
 from config import get_config
+from log_reader import iter_log_lines, collect_log_text
+from chunking import estimate_tokens, merge_answers
+from openai_client import ClientSession, create_client
+from rate_limiter import RequestScheduler
+from response_cache import ResponseCache, fingerprint_text, make_cache_key
+from result_sink import open_result_sink
+from metrics import count, span
+from incremental import IncrementalState, format_history_block
+from payload import build_log_payload, iter_window_payloads
+from log_index import LogIndex, fts5_available
+from time_windows import stitch_timeline
+from log_filter import group_prompts_by_filter
+from planner import preflight, plan_run, budget_overruns, format_plan
+from pricing import calculate_cost
+from batch import (make_custom_id, build_request_line, submit_batch,
+                   wait_for_batch, download_batch_results, response_text)
 
+# The openai package is imported on first use (it takes about half a second), so runs
+# answered from the cache or resumed, and local commands, never load it. Logging is
+# set up by the caller (see main.setup_logging).
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('wowza_analysis.log'),
-        logging.StreamHandler()
-    ]
-)
-
-def read_log_files(log_dir: Path) -> str:
+def read_log_files(log_dir: Path, max_bytes: int = 0, stats: dict = None,
+                   buffer_size: int = 1024 * 1024, use_mmap: bool = False) -> str:
     """
     Read all .log and .txt files in the specified directory and its subdirectories.
+    Lines are streamed from disk and joined until max_bytes is reached (0 = no limit).
     Return the combined content as a string.
     """
-    contents = []
-    for ext in ("*.log", "*.txt"):
-        for file in log_dir.rglob(ext):
-            contents.append(file.read_text(encoding="utf-8", errors="ignore"))
-    return "\n".join(contents)
+    with span("read_log_files"):
+        lines = iter_log_lines(log_dir, buffer_size=buffer_size, use_mmap=use_mmap, stats=stats)
+        return collect_log_text(lines, max_bytes, stats=stats)
 
-def calculate_cost(prompt_tokens, completion_tokens, model):
+def format_answer(answer):
     """
-    Calculate cost based on token usage.
+    Format answer for better readability in JSON.
     
     Args:
-        prompt_tokens (int): Number of input tokens
-        completion_tokens (int): Number of output tokens
+        answer (str): Raw model output text
+        
+    Returns:
+        str: Pretty-printed JSON if the answer parses, otherwise cleaned-up text
+    """
+    formatted_answer = answer.strip()
+    # Try to parse as JSON and reformat if possible
+    try:
+        parsed_json = json.loads(formatted_answer)
+        formatted_answer = json.dumps(parsed_json, indent=2, ensure_ascii=False)
+    except (json.JSONDecodeError, ValueError):
+        # If not valid JSON, just clean up the text
+        formatted_answer = formatted_answer.replace('\\n', '\n').replace('\\t', '\t')
+    return formatted_answer
+
+def build_success_result(prompt_name, response, latency, model, batch=False, time_to_first_token=None):
+    """
+    Build the per-prompt result for a successful Responses API call.
+    
+    Args:
+        prompt_name (str): Prompt name
+        response: Responses API response object
+        latency (float): Request latency in seconds
         model (str): Model name
+        batch (bool): The request ran in a Batch API job
+        time_to_first_token (float): Seconds until the first streamed output token, if streamed
         
     Returns:
-        dict: Cost breakdown information
+        dict: Result with answer, token usage and cost breakdown
     """
-    # OpenAI pricing (USD per 1M tokens)
-    pricing = {
-        "gpt-4o-mini": {
-            "input": 0.15,     # $0.15 per 1M input tokens
-            "output": 0.60     # $0.60 per 1M output tokens
-        },
-        "gpt-4o": {
-            "input": 2.50,    # $2.50 per 1M input tokens
-            "output": 10.00   # $10.00 per 1M output tokens
+    with span("format_answer"):
+        formatted_answer = format_answer(response.output_text)
+    
+    # Get token usage information from Responses API
+    usage = getattr(response, "usage")
+    prompt_tokens = getattr(usage, "input_tokens")
+    completion_tokens = getattr(usage, "output_tokens")
+    total_tokens = getattr(usage, "total_tokens")
+    # Input tokens served from the provider's prompt cache
+    input_details = getattr(usage, "input_tokens_details", None)
+    cached_tokens = getattr(input_details, "cached_tokens", 0) or 0
+
+    # Calculate cost for this request
+    request_cost = calculate_cost(prompt_tokens, completion_tokens, model, batch, cached_tokens)
+    
+    # Log success
+    logging.info("SUCCESS: %s - %ss - %s tokens (%s cached) - $%s", prompt_name, latency, total_tokens, cached_tokens, request_cost['total_cost_usd'])
+    print(f"  Completed: {prompt_name} (Input: {prompt_tokens}, Cached: {cached_tokens}, Output: {completion_tokens}, Total: {total_tokens} tokens, {latency}s, ${request_cost['total_cost_usd']})")
+    
+    result = {
+        "status": "success",
+        "answer": formatted_answer,
+        "token_usage": {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens
         },
-        "gpt-5": {
-            "input": 1.25,    # $1.25 per 1M input tokens
-            "output": 10.00   # $10.00 per 1M output tokens
-        }
+        "latency_seconds": latency,
+        "cost_breakdown": request_cost,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
     }
+    if time_to_first_token is not None:
+        result["time_to_first_token_seconds"] = time_to_first_token
+    return result
+
+def build_error_result(prompt_name, error, latency):
+    """
+    Build the per-prompt result for a failed Responses API call.
     
-    # Use model from config, fallback to gpt-4o-mini (cheapest)
-    model_key = model if model in pricing else "gpt-4o-mini"
+    Args:
+        prompt_name (str): Prompt name
+        error (Exception): Error raised by the request
+        latency (float): Time spent before the failure in seconds
+        
+    Returns:
+        dict: Result with error details
+    """
+    # Log failure
+    logging.error("FAILED: %s - %ss - Error: %s", prompt_name, latency, str(error))
+    print(f"  ERROR: {prompt_name} - {error} ({latency}s)")
     
-    # Calculate cost based on 1M tokens
-    input_cost = (prompt_tokens / 1_000_000) * pricing[model_key]["input"]
-    output_cost = (completion_tokens / 1_000_000) * pricing[model_key]["output"]
-    total_cost = input_cost + output_cost
+    return {
+        "status": "error",
+        "error": str(error),
+        "answer": None,
+        "latency_seconds": latency,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def create_response_cache(config):
+    """
+    Create the response cache for a run.
+    
+    Args:
+        config (dict): Configuration from get_config()
+        
+    Returns:
+        ResponseCache | None: Cache, or None when config['cache_mode'] is 'off'
+    """
+    if config['cache_mode'] == 'off':
+        return None
+    return ResponseCache(
+        config['cache_folder'],
+        max_bytes=config['cache_max_mb'] * 1024 * 1024,
+        ttl_seconds=config['cache_ttl_hours'] * 3600,
+        refresh=config['cache_mode'] == 'refresh'
+    )
+
+def build_cached_result(prompt_name, entry, latency, model):
+    """
+    Build the per-prompt result for a response served from the cache.
+    
+    Cache hits cost nothing, so token usage and cost are zero; the usage of
+    the original request is kept under cached_token_usage.
+    
+    Args:
+        prompt_name (str): Prompt name
+        entry (dict): Cache entry
+        latency (float): Cache lookup time in seconds
+        model (str): Model name
+        
+    Returns:
+        dict: Per-prompt result
+    """
+    logging.info("CACHE HIT: %s - %ss", prompt_name, latency)
+    print(f"  Completed: {prompt_name} (cache hit, {latency}s, $0)")
     
     return {
-        "model_used": model,
-        "pricing_per_1m_tokens": pricing[model_key],
-        "input_cost_usd": round(input_cost, 6),
-        "output_cost_usd": round(output_cost, 6),
-        "total_cost_usd": round(total_cost, 6)
+        "status": "success",
+        "answer": entry["answer"],
+        "cache_hit": True,
+        "token_usage": {
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0
+        },
+        "cached_token_usage": entry.get("token_usage", {}),
+        "latency_seconds": latency,
+        "cost_breakdown": calculate_cost(0, 0, model),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
     }
 
-def analyze_logs(logs_folder):
+def lookup_cache(cache, prompt_name, prompt_text, logs_content, config):
     """
-    Read log files and analyze with OpenAI using ALL prompts (simple + detailed).
+    Check the response cache for a prompt.
     
     Args:
-        logs_folder (str): Path to directory containing log files
+        cache (ResponseCache): Response cache, or None when caching is off
+        prompt_name (str): Prompt name
+        prompt_text (str): Prompt instructions
+        logs_content (str): Log data
+        config (dict): Configuration from get_config()
         
     Returns:
-        dict: Analysis results with cost breakdown
+        tuple: (cache key, cached result or None); the key is None when caching is off
     """
-    print("Reading log files...")
+    if cache is None:
+        return None, None
+    start_time = time.time()
+    cache_key = make_cache_key(prompt_text, fingerprint_text(logs_content), config['model'], config['temperature'])
+    entry = cache.get(cache_key)
+    if entry is None:
+        return cache_key, None
+    latency = round(time.time() - start_time, 4)
+    return cache_key, build_cached_result(prompt_name, entry, latency, config['model'])
+
+def store_cache(cache, cache_key, result):
+    """Save a successful result in the response cache."""
+    if cache is None or cache_key is None or result.get("status") != "success":
+        return
+    cache.put(cache_key, {
+        "answer": result["answer"],
+        "token_usage": result["token_usage"]
+    })
+
+def lookup_resumed(sink, prompt_name, prompt_text, logs_content, config):
+    """
+    Check the run being resumed for a finished result of a request.
     
-    # Use simple function to read logs
-    log_dir = Path(logs_folder)
-    all_logs_content = read_log_files(log_dir)
+    Args:
+        sink (ResultSink): Result file of the run, or None
+        prompt_name (str): Request label
+        prompt_text (str): Prompt instructions
+        logs_content (str): Log data
+        config (dict): Configuration from get_config()
+        
+    Returns:
+        tuple: (input fingerprint, saved result or None); the fingerprint is None without a sink
+    """
+    if sink is None:
+        return None, None
+    fingerprint = make_cache_key(prompt_text, fingerprint_text(logs_content), config['model'], config['temperature'])
+    resumed = sink.get(prompt_name, fingerprint)
+    if resumed is not None:
+        count("requests_resumed")
+    return fingerprint, resumed
+
+def count_result(result):
+    """Add a finished request to the run metrics."""
+    if result.get("cache_hit"):
+        count("cache_hits")
+        return
+    count("requests")
+    if result.get("status") != "success":
+        count("request_errors")
+        return
+    usage = result["token_usage"]
+    count("tokens_sent", usage.get("prompt_tokens", 0))
+    count("tokens_cached", usage.get("cached_tokens", 0))
+    count("tokens_received", usage.get("completion_tokens", 0))
+
+def record_result(sink, prompt_name, fingerprint, result):
+    """Count a finished request in the run metrics and append it to the run's result file."""
+    count_result(result)
+    if sink is None:
+        return
+    try:
+        sink.record(prompt_name, fingerprint, result)
+    except OSError as e:
+        logging.warning("Could not save result of %s: %s", prompt_name, e)
+
+def _stream_event(event, timing):
+    """Handle one streaming event: note the first output token, return the completed response."""
+    if event.type == "response.output_text.delta":
+        timing.setdefault("first_token", time.time())
+    elif event.type == "response.completed":
+        return event.response
+    elif event.type in ("response.failed", "response.incomplete"):
+        import openai
+        details = getattr(event.response, "error", None) or getattr(event.response, "incomplete_details", None)
+        raise openai.OpenAIError(f"Response {event.response.status}: {details}")
+    return None
+
+def collect_stream(stream, timing):
+    """
+    Read a streamed response to the end.
     
-    if not all_logs_content:
-        print("ERROR: No log files found!")
-        return None
+    Args:
+        stream (openai.Stream): Response stream events
+        timing (dict): Gets 'first_token', the time.time() of the first output text
+        
+    Returns:
+        Response: The completed response, with usage
+    """
+    timing.pop("first_token", None)
+    completed = None
+    for event in stream:
+        completed = _stream_event(event, timing) or completed
+    if completed is None:
+        # Connection dropped mid-stream: retried like other connection errors
+        raise ConnectionError("Response stream ended before the response completed")
+    return completed
+
+async def collect_stream_async(stream, timing):
+    """Async version of collect_stream()."""
+    timing.pop("first_token", None)
+    completed = None
+    async for event in stream:
+        completed = _stream_event(event, timing) or completed
+    if completed is None:
+        raise ConnectionError("Response stream ended before the response completed")
+    return completed
+
+def analyze_prompt(client, prompt_name, prompt_text, logs_content, config, cache=None, scheduler=None, sink=None):
+    """
+    Send one prompt to OpenAI and build its result.
     
-    print(f"SUMMARY: Read log files ({len(all_logs_content)} characters)")
+    Args:
+        client (openai.OpenAI): Shared client
+        prompt_name (str): Prompt name
+        prompt_text (str): Prompt instructions
+        logs_content (str): Log data
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        scheduler (RequestScheduler): Shared rate limiter and retry policy
+        sink (ResultSink): Result file of the run; finished results are appended to it
+        
+    Returns:
+        dict: Per-prompt result
+    """
+    fingerprint, resumed = lookup_resumed(sink, prompt_name, prompt_text, logs_content, config)
+    if resumed is not None:
+        return resumed
+    cache_key, cached = lookup_cache(cache, prompt_name, prompt_text, logs_content, config)
+    if cached is not None:
+        record_result(sink, prompt_name, fingerprint, cached)
+        return cached
     
-    # Get ALL prompts (both simple and detailed)
-    detailed_prompts = WowzaAnalysisPrompts.get_all_prompts()
-    simple_prompts = WowzaAnalysisPrompts.get_simple_prompts()
+    print(f"  Processing: {prompt_name}")
+    import openai
     
-    # Combine all prompts
-    all_prompts = {**simple_prompts}
+    # Measure latency
+    start_time = time.time()
     
-    print(f"\nStarting complete OpenAI analysis ({len(all_prompts)} prompts)...")
+    # Send to OpenAI
+    try:
+        # Log request
+        logging.info("Starting analysis: %s with model %s", prompt_name, config['model'])
+        
+        if scheduler is None:
+            scheduler = RequestScheduler.from_config(config)
+        with span("prompt_assembly"):
+            full_prompt = build_full_prompt(prompt_text, logs_content)
+        stream = config['stream_responses']
+        timing = {}
+        
+        # Use Responses API, paced by the rate limiter and retried on transient errors
+        with span("api_call", prompt=prompt_name, stream=stream):
+            response = scheduler.call(
+                lambda: client.responses.with_raw_response.create(
+                    model=config['model'],
+                    input=full_prompt,
+                    temperature=config['temperature'],
+                    stream=stream
+                ),
+                estimate_tokens(full_prompt),
+                prompt_name,
+                collect=(lambda events: collect_stream(events, timing)) if stream else None
+            )
+        
+        latency = round(time.time() - start_time, 2)
+        first_token = round(timing["first_token"] - start_time, 2) if "first_token" in timing else None
+        result = build_success_result(prompt_name, response, latency, config['model'], time_to_first_token=first_token)
+        store_cache(cache, cache_key, result)
+        
+    except (openai.OpenAIError, ConnectionError, TimeoutError) as e:
+        latency = round(time.time() - start_time, 2)
+        result = build_error_result(prompt_name, e, latency)
     
-    # Analyze with each prompt
-    results = {}
+    record_result(sink, prompt_name, fingerprint, result)
+    return result
+
+async def analyze_prompt_async(client, semaphore, prompt_name, prompt_text, logs_content, config, cache=None, scheduler=None, sink=None):
+    """
+    Send one prompt to OpenAI with the async client, waiting for a free concurrency slot.
     
-    for prompt_name, prompt_text in all_prompts.items():
+    Args:
+        client (openai.AsyncOpenAI): Shared async client
+        semaphore (asyncio.Semaphore): Concurrency limit
+        prompt_name (str): Prompt name
+        prompt_text (str): Prompt instructions
+        logs_content (str): Log data
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        scheduler (RequestScheduler): Shared rate limiter and retry policy
+        sink (ResultSink): Result file of the run; finished results are appended to it
+        
+    Returns:
+        dict: Per-prompt result
+    """
+    # Resumed results and cache hits do not need a concurrency slot
+    fingerprint, resumed = lookup_resumed(sink, prompt_name, prompt_text, logs_content, config)
+    if resumed is not None:
+        return resumed
+    cache_key, cached = lookup_cache(cache, prompt_name, prompt_text, logs_content, config)
+    if cached is not None:
+        record_result(sink, prompt_name, fingerprint, cached)
+        return cached
+    
+    import openai
+    async with semaphore:
         print(f"  Processing: {prompt_name}")
         
-        # Create complete prompt
-        full_prompt = f"""{prompt_text}
-
-WOWZA LOG DATA:
-{all_logs_content}
-
-Please analyze and return JSON results according to the format requested above.
-Provide clear and detailed analysis.
-"""
+        # Latency is measured from dispatch, not from when the prompt was queued
+        start_time = time.time()
         
-        # Send to OpenAI
         try:
-            config = get_config()
-            client = openai.OpenAI(api_key=config['api_key'])
-            
-            # Measure latency
-            start_time = time.time()
-            
-            # Log request
             logging.info("Starting analysis: %s with model %s", prompt_name, config['model'])
             
-            # Use Responses API
-            response = client.responses.create(
-                model=config['model'],
-                input=full_prompt,
-                temperature=0.1
-            )
-            
-            # Calculate latency
-            end_time = time.time()
-            latency = round(end_time - start_time, 2)
+            if scheduler is None:
+                scheduler = RequestScheduler.from_config(config)
+            with span("prompt_assembly"):
+                full_prompt = build_full_prompt(prompt_text, logs_content)
+            stream = config['stream_responses']
+            timing = {}
             
-            answer = response.output_text
+            with span("api_call", prompt=prompt_name, stream=stream):
+                response = await scheduler.call_async(
+                    lambda: client.responses.with_raw_response.create(
+                        model=config['model'],
+                        input=full_prompt,
+                        temperature=config['temperature'],
+                        stream=stream
+                    ),
+                    estimate_tokens(full_prompt),
+                    prompt_name,
+                    collect=(lambda events: collect_stream_async(events, timing)) if stream else None
+                )
             
-            # Format answer for better readability in JSON
-            formatted_answer = answer.strip()
-            # Try to parse as JSON and reformat if possible
-            try:
-                parsed_json = json.loads(formatted_answer)
-                formatted_answer = json.dumps(parsed_json, indent=2, ensure_ascii=False)
-            except (json.JSONDecodeError, ValueError):
-                # If not valid JSON, just clean up the text
-                formatted_answer = formatted_answer.replace('\\n', '\n').replace('\\t', '\t')
-            
-            # Get token usage information from Responses API
-            usage = getattr(response, "usage")
-            prompt_tokens = getattr(usage, "input_tokens")
-            completion_tokens = getattr(usage, "output_tokens")
-            total_tokens = getattr(usage, "total_tokens")
-
-            # Calculate cost for this request
-            request_cost = calculate_cost(prompt_tokens, completion_tokens, config['model'])
-            
-            results[prompt_name] = {
-                "status": "success",
-                "answer": formatted_answer,
-                "token_usage": {
-                    "prompt_tokens": prompt_tokens,
-                    "completion_tokens": completion_tokens,
-                    "total_tokens": total_tokens
-                },
-                "latency_seconds": latency,
-                "cost_breakdown": request_cost,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            # Log success
-            logging.info("SUCCESS: %s - %ss - %s tokens - $%s", prompt_name, latency, total_tokens, request_cost['total_cost_usd'])
-            print(f"  Completed: {prompt_name} (Input: {prompt_tokens}, Output: {completion_tokens}, Total: {total_tokens} tokens, {latency}s, ${request_cost['total_cost_usd']})")
+            latency = round(time.time() - start_time, 2)
+            first_token = round(timing["first_token"] - start_time, 2) if "first_token" in timing else None
+            result = build_success_result(prompt_name, response, latency, config['model'], time_to_first_token=first_token)
+            store_cache(cache, cache_key, result)
             
         except (openai.OpenAIError, ConnectionError, TimeoutError) as e:
-            # Calculate latency for error
-            end_time = time.time()
-            latency = round(end_time - start_time, 2) if 'start_time' in locals() else 0
-            
-            results[prompt_name] = {
-                "status": "error",
-                "error": str(e),
-                "answer": None,
-                "latency_seconds": latency,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            # Log failure
-            logging.error("FAILED: %s - %ss - Error: %s", prompt_name, latency, str(e))
-            print(f"  ERROR: {prompt_name} - {e} ({latency}s)")
+            latency = round(time.time() - start_time, 2)
+            result = build_error_result(prompt_name, e, latency)
+    
+    record_result(sink, prompt_name, fingerprint, result)
+    return result
+
+def run_prompts(client, prompts, logs_content, config, cache=None, sink=None, scheduler=None):
+    """
+    Send all prompts one after another with a shared client.
+    
+    Args:
+        client (LazyClient): Client of the session
+        prompts (dict): Prompt name -> prompt text
+        logs_content (str | dict): Log data, or prompt name -> the input of that prompt
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        scheduler (RequestScheduler): Rate limiter and retry policy shared by the run
+        
+    Returns:
+        dict: Prompt name -> result, in the same order as prompts
+    """
+    results = {}
+    if scheduler is None:
+        scheduler = RequestScheduler.from_config(config)
+    for prompt_name, prompt_text in prompts.items():
+        content = logs_content[prompt_name] if isinstance(logs_content, dict) else logs_content
+        results[prompt_name] = analyze_prompt(client, prompt_name, prompt_text, content, config, cache, scheduler, sink)
+    return results
+
+async def run_prompts_async(client, prompts, logs_content, config, cache=None, sink=None, scheduler=None):
+    """
+    Send all prompts concurrently, at most config['max_concurrency'] at a time.
+    
+    Args:
+        client (LazyAsyncClient): Async client of the session
+        prompts (dict): Prompt name -> prompt text
+        logs_content (str | dict): Log data, or prompt name -> the input of that prompt
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        scheduler (RequestScheduler): Rate limiter and retry policy shared by the run
+        
+    Returns:
+        dict: Prompt name -> result, in the same order as prompts
+    """
+    semaphore = asyncio.Semaphore(max(1, config['max_concurrency']))
+    if scheduler is None:
+        scheduler = RequestScheduler.from_config(config)
+    tasks = [
+        analyze_prompt_async(
+            client, semaphore, prompt_name, prompt_text,
+            logs_content[prompt_name] if isinstance(logs_content, dict) else logs_content,
+            config, cache, scheduler, sink
+        )
+        for prompt_name, prompt_text in prompts.items()
+    ]
+    outcomes = []
+    if config['prompt_cache_warmup'] and len(tasks) > 1:
+        # The first request puts the shared log prefix into the provider's prompt cache
+        outcomes.append(await tasks.pop(0))
+    outcomes.extend(await asyncio.gather(*tasks))
+    return dict(zip(prompts.keys(), outcomes))
+
+async def run_chunked_prompts_async(client, prompts, chunks, config, cache=None, unit="chunk", sink=None, scheduler=None):
+    """
+    Map step: send every prompt over every log chunk concurrently.
+    
+    Chunks are pulled from the stream only when there is room for them, so at
+    most config['max_concurrency'] chunks are held in memory at once.
+    
+    Args:
+        client (LazyAsyncClient): Async client of the session
+        prompts (dict): Prompt name -> prompt text
+        chunks (iterable): Stream of log chunks
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        unit (str): Name of a chunk in log messages (e.g. 'window')
+        scheduler (RequestScheduler): Rate limiter and retry policy shared by the run
+        
+    Returns:
+        dict: Prompt name -> list of per-chunk results, in chunk order
+    """
+    window = max(1, config['max_concurrency'])
+    semaphore = asyncio.Semaphore(window)
+    if scheduler is None:
+        scheduler = RequestScheduler.from_config(config)
+    chunk_results = {prompt_name: {} for prompt_name in prompts}
+    
+    async def analyze_chunk(index, chunk):
+        tasks = [
+            analyze_prompt_async(client, semaphore, f"{prompt_name} [{unit} {index + 1}]", prompt_text, chunk, config, cache, scheduler, sink)
+            for prompt_name, prompt_text in prompts.items()
+        ]
+        for prompt_name, result in zip(prompts.keys(), await asyncio.gather(*tasks)):
+            chunk_results[prompt_name][index] = result
+    
+    pending = set()
+    for index, chunk in enumerate(chunks):
+        if len(pending) >= window:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        pending.add(asyncio.create_task(analyze_chunk(index, chunk)))
+    if pending:
+        await asyncio.gather(*pending)
+    
+    return {
+        prompt_name: [results[index] for index in sorted(results)]
+        for prompt_name, results in chunk_results.items()
+    }
+
+def run_chunked_prompts(client, prompts, chunks, config, cache=None, unit="chunk", sink=None, scheduler=None):
+    """
+    Map step without asyncio: send every prompt over every log chunk, one request at a time.
+    
+    Args:
+        client (LazyClient): Client of the session
+        prompts (dict): Prompt name -> prompt text
+        chunks (iterable): Stream of log chunks
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        unit (str): Name of a chunk in log messages (e.g. 'window')
+        scheduler (RequestScheduler): Rate limiter and retry policy shared by the run
+        
+    Returns:
+        dict: Prompt name -> list of per-chunk results, in chunk order
+    """
+    chunk_results = {prompt_name: [] for prompt_name in prompts}
+    if scheduler is None:
+        scheduler = RequestScheduler.from_config(config)
+    for index, chunk in enumerate(chunks):
+        for prompt_name, prompt_text in prompts.items():
+            chunk_results[prompt_name].append(
+                analyze_prompt(client, f"{prompt_name} [{unit} {index + 1}]", prompt_text, chunk, config, cache, scheduler, sink)
+            )
+    return chunk_results
+
+def run_prompts_batch(prompts, shards, config, cache=None, sink=None):
+    """
+    Send every (prompt, log shard) request as one Batch API job and wait for the results.
+    
+    Requests already in the response cache are not submitted. The batch input
+    file is kept in config['batch_folder'] for reference.
+    
+    Args:
+        prompts (dict): Prompt name -> prompt text
+        shards (iterable): Log shards (a single payload or a stream of chunks); a shard may
+            also be a dict of prompt name -> the input of that prompt
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        
+    Returns:
+        dict: Prompt name -> list of per-shard results, in shard order
+    """
+    os.makedirs(config['batch_folder'], exist_ok=True)
+    input_path = os.path.join(config['batch_folder'], f"batch_input_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+    shard_results = {prompt_name: {} for prompt_name in prompts}
+    pending = {}
+    
+    # Write the input file while streaming the shards, so they are never all in memory
+    with open(input_path, "w", encoding="utf-8") as f:
+        for shard_index, shard in enumerate(shards):
+            for prompt_name, prompt_text in prompts.items():
+                label = f"{prompt_name} [shard {shard_index + 1}]"
+                content = shard[prompt_name] if isinstance(shard, dict) else shard
+                fingerprint, resumed = lookup_resumed(sink, label, prompt_text, content, config)
+                if resumed is not None:
+                    shard_results[prompt_name][shard_index] = resumed
+                    continue
+                cache_key, cached = lookup_cache(cache, label, prompt_text, content, config)
+                if cached is not None:
+                    record_result(sink, label, fingerprint, cached)
+                    shard_results[prompt_name][shard_index] = cached
+                    continue
+                custom_id = make_custom_id(prompt_name, shard_index, content)
+                f.write(build_request_line(custom_id, build_full_prompt(prompt_text, content), config))
+                pending[custom_id] = (prompt_name, shard_index, cache_key, fingerprint)
+    
+    if pending:
+        import openai
+        print(f"  Submitting batch of {len(pending)} requests ({input_path})")
+        outputs = {}
+        batch_error = None
+        batch_id = None
+        start_time = time.time()
+        client = create_client(config, max_retries=config['max_retries'])
+        try:
+            batch_job = submit_batch(client, input_path)
+            batch_id = batch_job.id
+            batch_job = wait_for_batch(client, batch_id, config['batch_poll_seconds'], config['batch_timeout_hours'] * 3600)
+            outputs = download_batch_results(client, batch_job)
+            if batch_job.status != "completed":
+                batch_error = f"Batch {batch_id} ended with status {batch_job.status}"
+        except (openai.OpenAIError, ConnectionError, TimeoutError) as e:
+            batch_error = f"Batch {batch_id or 'submission'} failed: {e}"
+        finally:
+            client.close()
+        latency = round(time.time() - start_time, 2)
+        
+        for custom_id, (prompt_name, shard_index, cache_key, fingerprint) in pending.items():
+            label = f"{prompt_name} [shard {shard_index + 1}]"
+            item = outputs.get(custom_id) or {}
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                body = response.get("body", {})
+                usage = body.get("usage", {})
+                adapted = SimpleNamespace(
+                    output_text=response_text(body),
+                    usage=SimpleNamespace(
+                        input_tokens=usage.get("input_tokens", 0),
+                        input_tokens_details=SimpleNamespace(
+                            cached_tokens=(usage.get("input_tokens_details") or {}).get("cached_tokens", 0)
+                        ),
+                        output_tokens=usage.get("output_tokens", 0),
+                        total_tokens=usage.get("total_tokens", 0)
+                    )
+                )
+                result = build_success_result(label, adapted, latency, config['model'], batch=True)
+                store_cache(cache, cache_key, result)
+            else:
+                error = item.get("error") or (response.get("body") or {}).get("error") or batch_error \
+                    or f"No result for {custom_id} in batch {batch_id}"
+                result = build_error_result(label, error, latency)
+            result["batch_id"] = batch_id
+            record_result(sink, label, fingerprint, result)
+            shard_results[prompt_name][shard_index] = result
+    
+    return {
+        prompt_name: [results[index] for index in sorted(results)]
+        for prompt_name, results in shard_results.items()
+    }
+
+def merge_chunk_results(prompt_name, chunk_results, model, batch=False):
+    """
+    Reduce step: combine the per-chunk results of one prompt into a single result.
+    
+    Args:
+        prompt_name (str): Prompt name
+        chunk_results (list): Per-chunk results, in chunk order
+        model (str): Model name
+        batch (bool): The chunks ran in a Batch API job
+        
+    Returns:
+        dict: Per-prompt result with merged answer and summed token usage
+    """
+    successes = [result for result in chunk_results if result.get("status") == "success"]
+    chunks_info = {
+        "total": len(chunk_results),
+        "failed": len(chunk_results) - len(successes),
+        "cache_hits": sum(1 for result in successes if result.get("cache_hit")),
+        "resumed": sum(1 for result in successes if result.get("resumed"))
+    }
+    
+    if not successes:
+        logging.error("FAILED: %s - all %s chunks failed", prompt_name, len(chunk_results))
+        return {
+            "status": "error",
+            "error": f"All {len(chunk_results)} chunks failed: {chunk_results[0].get('error')}",
+            "answer": None,
+            "latency_seconds": max(result.get("latency_seconds", 0) for result in chunk_results),
+            "chunks": chunks_info,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    
+    prompt_tokens = sum(result["token_usage"]["prompt_tokens"] for result in successes)
+    cached_tokens = sum(result["token_usage"].get("cached_tokens", 0) for result in successes)
+    completion_tokens = sum(result["token_usage"]["completion_tokens"] for result in successes)
+    total_tokens = sum(result["token_usage"]["total_tokens"] for result in successes)
+    
+    first_tokens = [result["time_to_first_token_seconds"] for result in successes if "time_to_first_token_seconds" in result]
+    
+    if chunks_info["failed"]:
+        logging.warning("%s: %s of %s chunks failed, merged result is partial", prompt_name, chunks_info["failed"], chunks_info["total"])
+    
+    with span("merge_chunks", prompt=prompt_name, chunks=len(successes)):
+        answer = merge_answers([result["answer"] for result in successes])
+    
+    result = {
+        "status": "success",
+        "answer": answer,
+        "cache_hit": chunks_info["cache_hits"] == chunks_info["total"],
+        "resumed": chunks_info["resumed"] == chunks_info["total"],
+        "token_usage": {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens
+        },
+        # Chunks run in parallel, so the slowest chunk bounds the prompt's latency
+        "latency_seconds": max(result["latency_seconds"] for result in successes),
+        "cost_breakdown": calculate_cost(prompt_tokens, completion_tokens, model, batch, cached_tokens),
+        "chunks": chunks_info,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if first_tokens:
+        # The first chunk to start answering is when output first becomes available
+        result["time_to_first_token_seconds"] = min(first_tokens)
+    return result
+
+def send_prompts(session, prompts, logs_content, chunks, config, cache=None, sink=None, scheduler=None):
+    """
+    Send prompts over one log payload: a single text, a stream of chunks, or a Batch API job.
+    
+    Args:
+        session (ClientSession): Clients and event loop of the run
+        prompts (dict): Prompt name -> prompt text
+        logs_content (str | dict): Log data (the first chunk when chunks is given), or
+            prompt name -> the input of that prompt (retrieval payloads)
+        chunks (iterable): Stream of log chunks, or None for a single payload
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        scheduler (RequestScheduler): Rate limiter and retry policy shared by the run
+        
+    Returns:
+        dict: Prompt name -> result
+    """
+    if config['batch_mode']:
+        print("  Batch mode: submitting all requests as one Batch API job")
+        shards = chunks if chunks is not None else [logs_content]
+        shard_results = run_prompts_batch(prompts, shards, config, cache, sink)
+        results = {
+            prompt_name: prompt_shard_results[0] if len(prompt_shard_results) == 1
+            else merge_chunk_results(prompt_name, prompt_shard_results, config['model'], batch=True)
+            for prompt_name, prompt_shard_results in shard_results.items()
+        }
+    elif chunks is not None:
+        if config['async_mode']:
+            print(f"  Sending chunks concurrently (max {config['max_concurrency']} requests at a time)")
+            chunk_results = session.run(run_chunked_prompts_async(session.async_client, prompts, chunks, config, cache,
+                                                                  sink=sink, scheduler=scheduler))
+        else:
+            chunk_results = run_chunked_prompts(session.client, prompts, chunks, config, cache, sink=sink, scheduler=scheduler)
+        results = {
+            prompt_name: merge_chunk_results(prompt_name, prompt_chunk_results, config['model'])
+            for prompt_name, prompt_chunk_results in chunk_results.items()
+        }
+    elif config['async_mode']:
+        print(f"  Sending prompts concurrently (max {config['max_concurrency']} at a time)")
+        results = session.run(run_prompts_async(session.async_client, prompts, logs_content, config, cache, sink, scheduler))
+    else:
+        results = run_prompts(session.client, prompts, logs_content, config, cache, sink, scheduler)
+    
+    return results
+
+def merge_window_parts(prompt_name, part_results, windows, config):
+    """
+    Merge the results of the parts of each window into one result per window.
+    
+    Args:
+        prompt_name (str): Prompt name
+        part_results (list): Per-payload results, in the order iter_window_payloads() yielded them
+        windows (list): Window info dicts; a window split into parts has a 'parts' count
+        config (dict): Configuration from get_config()
+        
+    Returns:
+        list: One result per window, in window order
+    """
+    window_results = []
+    position = 0
+    for window in windows:
+        parts = part_results[position:position + window.get('parts', 1)]
+        position += len(parts)
+        if len(parts) == 1:
+            window_results.append(parts[0])
+        elif parts:
+            window_results.append(merge_chunk_results(f"{prompt_name} [window {window['start']}]", parts,
+                                                      config['model'], config['batch_mode']))
+    return window_results
+
+def run_windowed_prompts(session, prompts, logs_folder, config, state=None, cache=None, sink=None, scheduler=None):
+    """
+    Analyze prompts time window by time window and stitch the answers into one timeline.
+    
+    The log files are merged in time order and cut into windows of
+    config['timeline_window_minutes']; windows are sent in parallel like
+    chunks, so at most config['max_concurrency'] windows are in memory. The
+    parts of a window too big for one chunk are merged back into one answer
+    per window before the timeline is stitched.
+    
+    Args:
+        session (ClientSession): Clients and event loop of the run
+        prompts (dict): Prompt name -> prompt text
+        logs_folder (str): Path to directory containing log files
+        config (dict): Configuration from get_config()
+        state (IncrementalState): If given, only lines added since the last run are read
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        scheduler (RequestScheduler): Rate limiter and retry policy shared by the run
+        
+    Returns:
+        dict: Prompt name -> stitched result
+    """
+    windows = []
+    shards = iter_window_payloads(logs_folder, config, state, windows)
+    if config['batch_mode']:
+        window_results = run_prompts_batch(prompts, shards, config, cache, sink)
+    elif config['async_mode']:
+        window_results = session.run(run_chunked_prompts_async(session.async_client, prompts, shards, config, cache, "window",
+                                                               sink, scheduler))
+    else:
+        window_results = run_chunked_prompts(session.client, prompts, shards, config, cache, "window", sink, scheduler)
+    
+    results = {}
+    for prompt_name, prompt_part_results in window_results.items():
+        prompt_window_results = merge_window_parts(prompt_name, prompt_part_results, windows, config)
+        if not prompt_window_results:
+            results[prompt_name] = build_error_result(prompt_name, "No timestamped log records to analyze", 0)
+            continue
+        result = merge_chunk_results(prompt_name, prompt_window_results, config['model'], config['batch_mode'])
+        if result["status"] == "success":
+            result["answer"] = stitch_timeline([
+                (window, window_result["answer"])
+                for window, window_result in zip(windows, prompt_window_results)
+                if window_result.get("status") == "success"
+            ])
+        result["windows"] = dict(result.pop("chunks"), minutes=config['timeline_window_minutes'], ranges=windows)
+        results[prompt_name] = result
+    return results
+
+def run_derived_prompts(session, prompts, prompt_inputs, results, aggregates, config, cache=None, sink=None, scheduler=None):
+    """
+    Send one stage of prompts that build on other prompts' answers instead of the logs.
+    
+    Each prompt gets the compact answers of its upstream prompts (and the local
+    statistics if it asks for them); the prompts of the stage are sent in
+    parallel. They are small, so they are sent directly in batch mode as well.
+    A prompt whose upstream prompts all failed is not sent.
+    
+    Args:
+        session (ClientSession): Clients and event loop of the run
+        prompts (dict): Prompt name -> prompt text of the stage
+        prompt_inputs (dict): Prompt name -> inputs, from prompt_graph.resolve_inputs()
+        results (dict): Prompt name -> result of the earlier prompts
+        aggregates (dict): Local log statistics, or None
+        config (dict): Configuration from get_config()
+        cache (ResponseCache): Response cache, or None when caching is off
+        sink (ResultSink): Result file of the run, or None
+        scheduler (RequestScheduler): Rate limiter and retry policy shared by the run
+        
+    Returns:
+        dict: Prompt name -> result
+    """
+    contents = {}
+    stage_results = {}
+    for prompt_name in prompts:
+        sources = prompt_inputs[prompt_name]
+        content, used = build_derived_input(sources, results, aggregates, config['upstream_max_tokens'])
+        if used or sources == (AGGREGATES,):
+            contents[prompt_name] = content
+        else:
+            stage_results[prompt_name] = build_error_result(prompt_name, "All upstream prompts failed, nothing to build on", 0)
+    
+    pending = {prompt_name: prompts[prompt_name] for prompt_name in contents}
+    if pending and config['async_mode']:
+        stage_results.update(session.run(run_prompts_async(session.async_client, pending, contents, config, cache, sink, scheduler)))
+    elif pending:
+        stage_results.update(run_prompts(session.client, pending, contents, config, cache, sink, scheduler))
+    for prompt_name, result in stage_results.items():
+        result["inputs"] = list(prompt_inputs[prompt_name])
+    return stage_results
+
+def analyze_logs(logs_folder, config=None, state=None, scheduler=None, session=None, cache=None):
+    """
+    Read log files and analyze with OpenAI using ALL prompts (simple + detailed).
+    
+    Args:
+        logs_folder (str): Path to directory containing log files
+        config (dict): Configuration from get_config(), read once per run if not given
+        state (IncrementalState): Read positions kept in memory between runs (watch mode);
+            loaded from config['incremental_state_file'] when not given in incremental mode
+        scheduler (RequestScheduler): Rate limiter, retry policy and request slots shared with
+            other runs (fleet mode); created for this run when not given
+        session (ClientSession): Clients and event loop shared with other runs (watch mode);
+            opened for this run when not given
+        cache (ResponseCache): Response cache shared with other runs (fleet mode), so its
+            size limit holds for all of them; created for this run when not given
+        
+    Returns:
+        dict: Analysis results with cost breakdown
+    """
+    print("Reading log files...")
+    
+    if config is None:
+        config = get_config()
+    
+    # Get the prompts of the run; prompts building on other prompts run after them, in stages
+    all_prompts = WowzaAnalysisPrompts.get_active_prompts(config['prompt_set'])
+    prompt_inputs = resolve_inputs(all_prompts, WowzaAnalysisPrompts.get_prompt_inputs())
+    log_prompts, derived_stages = plan_stages(all_prompts, prompt_inputs)
+    
+    # Retrieval payloads need SQLite's full-text search
+    if config['log_payload_mode'] == 'retrieval' and not fts5_available():
+        print("WARNING: The SQLite library of this Python has no FTS5, using summary mode instead of retrieval")
+        config = dict(config, log_payload_mode='summary')
+    
+    # In incremental mode only lines added since the last run are read
+    if state is None and config['incremental']:
+        state = IncrementalState(config['incremental_state_file'], history_size=config['incremental_history'])
+    
+    # Pre-flight: project the cost of raw payloads from file sizes before reading anything
+    plan = None
+    sample_step = 1
+    if config['log_payload_mode'] == 'raw':
+        with span("preflight"):
+            action, plan, sample_step = preflight(logs_folder, all_prompts, config, state)
+        logging.info("Plan: %s requests, ~%s tokens, ~$%s", plan['total']['requests'], plan['total']['tokens'], plan['total']['cost_usd'])
+        if action is not None:
+            print("BUDGET: " + "; ".join(plan['budget_problems']))
+        if action == "abort":
+            print(format_plan(plan, config))
+            print("ERROR: Run budget exceeded, analysis aborted (see MAX_RUN_COST_USD / MAX_RUN_TOKENS)")
+            return None
+        if action == "summary":
+            print("  Switching to summary mode to stay within budget")
+            config = dict(config, log_payload_mode='summary')
+        elif action == "downsample":
+            print(f"  Downsampling: analyzing 1 in {sample_step} log lines to stay within budget")
+    
+    # Timeline prompts are analyzed per time window instead of over the whole payload
+    windowed_prompts = {}
+    if config['timeline_window_minutes'] > 0:
+        windowed_names = WowzaAnalysisPrompts.get_windowed_prompts()
+        windowed_prompts = {name: text for name, text in log_prompts.items() if name in windowed_names}
+    payload_prompts = {name: text for name, text in log_prompts.items() if name not in windowed_prompts}
+    
+    # Raw log text is pre-filtered per prompt; prompts with the same filter share one payload
+    filter_groups = [(None, payload_prompts)]
+    if config['log_payload_mode'] == 'raw' and payload_prompts:
+        filter_groups = group_prompts_by_filter(payload_prompts, WowzaAnalysisPrompts.get_prompt_filters(), config)
+    line_filter, group_prompts = filter_groups[0]
+    # Retrieval payloads are searched in the log index with each prompt's query
+    prompt_queries = None
+    if config['log_payload_mode'] == 'retrieval':
+        queries = WowzaAnalysisPrompts.get_prompt_queries()
+        prompt_queries = {name: queries.get(name) for name in group_prompts}
+    
+    # Chunked raw payloads are read lazily, so their read time is part of send_prompts
+    with span("build_payload", mode=config['log_payload_mode']):
+        payload = build_log_payload(logs_folder, config, state, sample_step, line_filter, prompt_queries)
+    logs_info = payload.info
+    all_logs_content = payload.content
+    prompt_contexts = payload.contexts
+    chunks = payload.chunks
+    log_summary = payload.summary
+    log_templates = payload.templates
+    
+    if not logs_info.get('lines'):
+        if state is not None and logs_info.get('files'):
+            print("SUMMARY: No new log lines since the last run, nothing to analyze")
+            state.save()
+        else:
+            print("ERROR: No log files found!")
+        return None
+    
+    if state is not None:
+        logs_info['incremental'] = True
+        if chunks is None:
+            # Give the model a short rolling summary of the earlier windows
+            history = format_history_block(state.windows)
+            all_logs_content += history
+            if prompt_contexts is not None:
+                prompt_contexts = {name: context + history for name, context in prompt_contexts.items()}
+    
+    if prompt_contexts is not None:
+        print(f"SUMMARY: Log index updated ({logs_info['files']} files, {logs_info['lines_indexed']} new lines, "
+              f"{logs_info['lines']} lines to analyze)")
+        print(f"  Sending each prompt up to {config['retrieval_max_tokens']:,} tokens of the log messages matching its query")
+    elif chunks is None:
+        print(f"SUMMARY: Read log files ({logs_info['files']} files, {logs_info['lines']} lines, {len(all_logs_content)} characters)")
+        if logs_info['truncated']:
+            print(f"  WARNING: Log input truncated at {config['log_memory_limit_mb']} MB memory limit")
+        if log_templates is not None:
+            print(f"  Sending {len(log_templates)} log templates and local statistics instead of raw logs")
+        elif log_summary is not None:
+            print(f"  Sending local statistics ({log_summary['total_records']} records, {log_summary['total_errors']} errors) instead of raw logs")
+    else:
+        print(f"SUMMARY: Log data exceeds {config['chunk_max_tokens']:,} tokens, analyzing in chunks (map-reduce)")
+    
+    # Statistics and template payloads are only known after local parsing: check them now
+    if config['log_payload_mode'] != 'raw':
+        # Retrieval contexts differ per prompt: plan with the largest
+        payload_size = max(map(len, prompt_contexts.values()), default=0) if prompt_contexts is not None \
+            else len(all_logs_content)
+        plan = plan_run(all_prompts, [payload_size], config)
+        problems = budget_overruns(plan, config)
+        if problems:
+            print(format_plan(plan, config))
+            print("ERROR: Run budget exceeded, analysis aborted: " + "; ".join(problems))
+            return None
+    
+    print(f"\nStarting complete OpenAI analysis ({len(all_prompts)} prompts)...")
+    
+    # Responses of unchanged prompts and logs are reused from the on-disk cache
+    if cache is None:
+        cache = create_response_cache(config)
+    # Every finished request is saved right away, so an interrupted run can be resumed
+    sink = open_result_sink(config)
+    # One rate limiter for all requests of the run
+    if scheduler is None:
+        scheduler = RequestScheduler.from_config(config)
+    
+    # Analyze with each prompt; prompts with another pre-filter get their own payload. The clients
+    # are the run's own, or those of the caller's session, which stay connected between watch cycles
+    with ClientSession(config) if session is None else contextlib.nullcontext(session) as session:
+        results = {}
+        if group_prompts:
+            with span("send_prompts", prompts=len(group_prompts), chunked=chunks is not None):
+                results = send_prompts(session, group_prompts, prompt_contexts if prompt_contexts is not None else all_logs_content,
+                                       chunks, config, cache, sink, scheduler)
+        filter_reports = [dict(logs_info.pop('filter'), prompts=list(group_prompts))] if 'filter' in logs_info else []
+        for line_filter, group_prompts in filter_groups[1:]:
+            with span("build_payload", mode=config['log_payload_mode'], filter=line_filter.describe() if line_filter else "none"):
+                group_payload = build_log_payload(logs_folder, config, state, sample_step, line_filter)
+            group_content = group_payload.content
+            if state is not None and group_payload.chunks is None:
+                group_content += format_history_block(state.windows)
+            with span("send_prompts", prompts=len(group_prompts), chunked=group_payload.chunks is not None):
+                results.update(send_prompts(session, group_prompts, group_content, group_payload.chunks, config, cache, sink, scheduler))
+            if 'filter' in group_payload.info:
+                filter_reports.append(dict(group_payload.info['filter'], prompts=list(group_prompts)))
+        if windowed_prompts:
+            print(f"  Analyzing {', '.join(windowed_prompts)} in {config['timeline_window_minutes']}-minute time windows")
+            with span("windowed_prompts", prompts=len(windowed_prompts), minutes=config['timeline_window_minutes']):
+                results.update(run_windowed_prompts(session, windowed_prompts, logs_folder, config, state, cache, sink, scheduler))
+        if derived_stages:
+            aggregates = log_summary
+            if aggregates is None and any(AGGREGATES in prompt_inputs[name] for stage in derived_stages for name in stage):
+                # Raw payloads have no statistics yet: count locally (nothing is sent)
+                with span("build_payload", mode="summary"):
+                    aggregates = build_log_payload(logs_folder, dict(config, log_payload_mode='summary'), state, sample_step).summary
+            for stage in derived_stages:
+                print(f"  Building on earlier results: {', '.join(stage)}")
+                with span("derived_prompts", prompts=len(stage)):
+                    results.update(run_derived_prompts(session, stage, prompt_inputs, results, aggregates, config, cache, sink, scheduler))
+    results = {prompt_name: results[prompt_name] for prompt_name in all_prompts}
+    
+    if filter_reports:
+        logs_info['filters'] = filter_reports
+        for report in filter_reports:
+            print(f"  Pre-filter ({report['description']}) for {', '.join(report['prompts'])}: "
+                  f"kept {report['lines_kept']:,} of {report['lines_in']:,} lines, removed ~{report['tokens_removed']:,} tokens")
+    
+    count("log_files_read", logs_info.get('files', 0))
+    count("log_lines_read", logs_info.get('lines', 0))
+    count("log_bytes_read", logs_info.get('bytes_read', 0))
+    count("log_lines_indexed", logs_info.get('lines_indexed', 0))
+    if log_summary is not None:
+        count("log_records_parsed", log_summary.get('total_records', 0))
+    
+    if chunks is not None and group_prompts:
+        logs_info['truncated'] = False
+        print(f"SUMMARY: Read log files ({logs_info['files']} files, {logs_info['lines']} lines, "
+              f"{logs_info['total_characters']} characters in {logs_info['chunks']} chunks)")
     
     # Add summary information
     # Calculate total tokens and cost
     total_prompt_tokens = 0
+    total_cached_tokens = 0
     total_completion_tokens = 0
     total_tokens = 0
+    cache_hits = 0
+    resumed = 0
     
     for result in results.values():
+        if result.get("cache_hit"):
+            cache_hits += 1
+        if result.get("resumed"):
+            resumed += 1
         if result.get("status") == "success" and "token_usage" in result:
             usage = result["token_usage"]
             total_prompt_tokens += usage.get("prompt_tokens", 0)
+            total_cached_tokens += usage.get("cached_tokens", 0)
             total_completion_tokens += usage.get("completion_tokens", 0)
             total_tokens += usage.get("total_tokens", 0)
     
     # Calculate pricing
-    config = get_config()
-    cost_info = calculate_cost(total_prompt_tokens, total_completion_tokens, config['model'])
+    cost_info = calculate_cost(total_prompt_tokens, total_completion_tokens, config['model'], config['batch_mode'], total_cached_tokens)
     
     final_results = {
         "analysis_mode": "complete",
-        "logs_info": {
-            "total_characters": len(all_logs_content)
-        },
+        "run_id": sink.run_id if sink is not None else None,
+        "logs_info": logs_info,
         "token_summary": {
             "total_prompt_tokens": total_prompt_tokens,
+            "total_cached_tokens": total_cached_tokens,
             "total_completion_tokens": total_completion_tokens,
             "total_tokens": total_tokens,
+            "cache_hits": cache_hits,
+            "resumed": resumed,
             "cost_breakdown": cost_info
         },
         "analysis_results": results
     }
+    if log_summary is not None:
+        final_results["log_summary"] = log_summary
+    if log_templates is not None:
+        final_results["log_templates"] = log_templates
+    if plan is not None:
+        final_results["cost_plan"] = plan
     
     # Display summary
     print("\nCost Summary:")
     print(f"  Model: {cost_info.get('model_used', 'Unknown')}")
-    print(f"  Input tokens: {total_prompt_tokens:,}")
+    print(f"  Input tokens: {total_prompt_tokens:,} ({total_cached_tokens:,} from prompt cache)")
     print(f"  Output tokens: {total_completion_tokens:,}")
     print(f"  Total tokens: {total_tokens:,}")
+    if cache is not None:
+        print(f"  Cache hits: {cache_hits}/{len(results)} prompts")
+    if resumed:
+        print(f"  Resumed from run {sink.run_id}: {resumed}/{len(results)} prompts")
     print(f"  Cost USD: ${cost_info['total_cost_usd']}")
+    if total_cached_tokens:
+        print(f"  Prompt cache savings USD: ${cost_info['prompt_cache_savings_usd']}")
+    
+    # Remember read positions only after a successful analysis, so failed windows are retried
+    if state is not None:
+        if any(result.get("status") == "success" for result in results.values()):
+            state.add_window(logs_info['lines'], log_summary)
+            state.save()
+            if 'index' in logs_info:
+                # The next incremental run retrieves only lines indexed after this one
+                with LogIndex(config['log_index_file'], logs_folder) as index:
+                    index.mark_analyzed(state.path, logs_info['index']['last_id'])
+        else:
+            logging.warning("No prompt succeeded, incremental state not advanced")
     
     # Log summary
     logging.info("Total analysis completed - Model: %s - Tokens: %s - Cost: $%s", cost_info.get('model_used'), f"{total_tokens:,}", cost_info['total_cost_usd'])
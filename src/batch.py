@@ -0,0 +1,176 @@
+"""
+OpenAI Batch API support: build, submit, poll and read batch jobs of Responses requests
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+# Batch jobs are billed at half the synchronous price
+BATCH_PRICE_FACTOR = 0.5
+
+# Batch statuses after which the job will not change any more
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+RESPONSES_ENDPOINT = "/v1/responses"
+
+
+def make_custom_id(prompt_name, shard_index, shard_text):
+    """
+    Stable ID of one (prompt, log shard) request.
+
+    The same prompt over the same shard content always gets the same ID, so
+    result files of re-submitted batches can be matched reliably.
+
+    Args:
+        prompt_name (str): Prompt name
+        shard_index (int): Position of the shard in the log stream
+        shard_text (str): Shard content
+
+    Returns:
+        str: Custom ID
+    """
+    digest = hashlib.sha256(shard_text.encode("utf-8", errors="ignore")).hexdigest()[:12]
+    return f"{prompt_name}__shard{shard_index:05d}__{digest}"
+
+
+def parse_custom_id(custom_id):
+    """
+    Split a custom ID back into prompt name and shard index.
+
+    Args:
+        custom_id (str): ID from make_custom_id()
+
+    Returns:
+        tuple: (prompt name, shard index)
+    """
+    prompt_name, shard, _ = custom_id.rsplit("__", 2)
+    return prompt_name, int(shard[len("shard"):])
+
+
+def build_request_line(custom_id, full_prompt, config):
+    """
+    Build one JSONL line of a batch input file.
+
+    Args:
+        custom_id (str): Request ID
+        full_prompt (str): Complete prompt including log data
+        config (dict): Configuration from get_config()
+
+    Returns:
+        str: JSON line (with trailing newline)
+    """
+    request = {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": RESPONSES_ENDPOINT,
+        "body": {
+            "model": config['model'],
+            "input": full_prompt,
+            "temperature": config['temperature']
+        }
+    }
+    return json.dumps(request, ensure_ascii=False) + "\n"
+
+
+def submit_batch(client, input_path):
+    """
+    Upload a batch input file and start the batch job.
+
+    Args:
+        client (openai.OpenAI): Client
+        input_path (str): Path of the JSONL input file
+
+    Returns:
+        Batch: Created batch job
+    """
+    with open(input_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=RESPONSES_ENDPOINT,
+        completion_window="24h",
+        metadata={"source": "wowza-log-analyzer", "input": os.path.basename(input_path)}
+    )
+    logging.info("Submitted batch %s (input file %s)", batch.id, input_file.id)
+    return batch
+
+
+def wait_for_batch(client, batch_id, poll_seconds=30, timeout_seconds=24 * 3600):
+    """
+    Poll a batch job until it reaches a final status or the timeout expires.
+
+    Args:
+        client (openai.OpenAI): Client
+        batch_id (str): Batch ID
+        poll_seconds (float): Time between status checks
+        timeout_seconds (float): Maximum time to wait
+
+    Returns:
+        Batch: Last retrieved batch state
+    """
+    deadline = time.time() + timeout_seconds
+    last_status = None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status != last_status:
+            counts = batch.request_counts
+            progress = f" ({counts.completed}/{counts.total} requests)" if counts else ""
+            print(f"  Batch {batch_id}: {batch.status}{progress}")
+            last_status = batch.status
+        if batch.status in FINAL_STATUSES or time.time() >= deadline:
+            return batch
+        time.sleep(poll_seconds)
+
+
+def _read_file_lines(client, file_id):
+    if not file_id:
+        return []
+    content = client.files.content(file_id)
+    return [line for line in content.text.splitlines() if line.strip()]
+
+
+def download_batch_results(client, batch):
+    """
+    Read the output and error files of a finished batch.
+
+    Args:
+        client (openai.OpenAI): Client
+        batch (Batch): Finished batch job
+
+    Returns:
+        dict: custom_id -> result line (dict with 'response' and 'error' keys)
+    """
+    results = {}
+    for line in _read_file_lines(client, batch.output_file_id) + _read_file_lines(client, batch.error_file_id):
+        try:
+            item = json.loads(line)
+        except ValueError:
+            logging.warning("Skipping unreadable batch result line: %s", line[:200])
+            continue
+        results[item.get("custom_id")] = item
+    return results
+
+
+def response_text(body):
+    """
+    Extract the output text of a Responses API body returned by a batch.
+
+    Args:
+        body (dict): Response body
+
+    Returns:
+        str: Concatenated output_text parts
+    """
+    if body.get("output_text"):
+        return body["output_text"]
+    parts = []
+    for item in body.get("output", []):
+        if item.get("type") != "message":
+            continue
+        for content in item.get("content", []):
+            if content.get("type") == "output_text":
+                parts.append(content.get("text", ""))
+    return "".join(parts)
@@ -0,0 +1,225 @@
+"""
+Token-aware log chunking and merging of per-chunk analysis results
+"""
+
+import json
+import re
+
+# Rough average for English text and log lines; errs on the side of more tokens
+CHARS_PER_TOKEN = 4
+
+# How numeric fields are merged across chunks, by hints matching whole words of the
+# field name (its "_"-separated tokens, plural or not), first match wins: scores and
+# rates are averaged, counts summed, levels keep the highest value. Other numbers
+# (settings, intervals, durations) keep the first value.
+AVERAGED_KEY_HINTS = ("score", "rate", "average", "avg", "percent", "percentage", "ratio")
+SUMMED_KEY_HINTS = ("count", "total", "errors", "occurrences", "frequency", "frequencies", "issues", "drops",
+                    "underruns", "distribution", "categories")
+LEVEL_KEY_HINTS = ("level", "severity", "peak", "max", "maximum", "highest")
+NUMERIC_KEY_RULES = (("average", AVERAGED_KEY_HINTS), ("sum", SUMMED_KEY_HINTS), ("max", LEVEL_KEY_HINTS))
+
+_CODE_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_KEY_SEPARATOR = re.compile(r"[^a-z0-9]+")
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text without calling a tokenizer.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def iter_chunks(lines, max_tokens, stats=None):
+    """
+    Group streamed log lines into chunks that fit a token budget.
+
+    Chunks always end on a line boundary. A single line longer than the
+    budget is cut to fit.
+
+    Args:
+        lines (iterable): Stream of log lines
+        max_tokens (int): Token budget per chunk
+        stats (dict): Optional dict updated with chunks/total_characters counters
+
+    Yields:
+        str: Chunk of log text
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("chunks", 0)
+    stats.setdefault("total_characters", 0)
+
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    parts = []
+    size = 0
+    for line in lines:
+        line = line[:max_chars]
+        line_size = len(line) + 1
+        if parts and size + line_size > max_chars:
+            chunk = "\n".join(parts)
+            stats["chunks"] += 1
+            stats["total_characters"] += len(chunk)
+            yield chunk
+            parts = []
+            size = 0
+        parts.append(line)
+        size += line_size
+
+    if parts:
+        chunk = "\n".join(parts)
+        stats["chunks"] += 1
+        stats["total_characters"] += len(chunk)
+        yield chunk
+
+
+def parse_json_answer(answer):
+    """
+    Parse a model answer as JSON, accepting answers wrapped in ```json fences.
+
+    Args:
+        answer (str): Model answer text
+
+    Returns:
+        dict | list | None: Parsed JSON, or None if the answer is not JSON
+    """
+    if not answer:
+        return None
+    text = _CODE_FENCE.sub("", answer.strip())
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _numeric_rule(key, inherited=None):
+    """Merge rule for the numbers under key; fields without a hint follow their parent object."""
+    if key:
+        # Whole words only: "generated_errors" and "separate_streams" are not rates
+        words = set(_KEY_SEPARATOR.split(key.lower()))
+        words.update(word[:-1] for word in list(words) if word.endswith("s"))
+        for rule, hints in NUMERIC_KEY_RULES:
+            if not words.isdisjoint(hints):
+                return rule
+    return inherited
+
+
+def _identity_key(item):
+    """First string field of a dict, used to match list items across chunks."""
+    for key, value in item.items():
+        if isinstance(value, str):
+            return (key, value.strip().lower())
+    return None
+
+
+def _merge_lists(values):
+    merged = []
+    by_identity = {}
+    seen = set()
+    for items in values:
+        for item in items:
+            if isinstance(item, dict):
+                identity = _identity_key(item)
+                if identity is not None and identity in by_identity:
+                    target = by_identity[identity]
+                    merged[target] = merge_values(None, [merged[target], item])
+                    continue
+                if identity is not None:
+                    by_identity[identity] = len(merged)
+                merged.append(item)
+            else:
+                marker = json.dumps(item, sort_keys=True)
+                if marker not in seen:
+                    seen.add(marker)
+                    merged.append(item)
+
+    # Keep "top N" style lists ordered by their count field
+    for count_key in ("count", "frequency"):
+        if merged and all(isinstance(item, dict) and _is_number(item.get(count_key)) for item in merged):
+            merged.sort(key=lambda item: item[count_key], reverse=True)
+            break
+    return merged
+
+
+def merge_values(key, values, rule=None):
+    """
+    Merge the values found under the same key in several chunk results.
+
+    Counts are summed, scores and rates averaged, levels keep the highest
+    value and other numbers the first one (see NUMERIC_KEY_RULES). Objects
+    are merged field by field, lists concatenated with matching entries
+    combined, and for plain strings the first non-empty value wins.
+
+    Args:
+        key (str): Field name, used to pick the numeric merge rule
+        values (list): Values from each chunk (None values are ignored)
+        rule (str): Numeric merge rule of the parent object, for fields
+            whose name gives no hint, e.g. the counts of "error_categories"
+
+    Returns:
+        Merged value
+    """
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    rule = _numeric_rule(key, rule)
+
+    if all(isinstance(value, dict) for value in values):
+        merged = {}
+        for value in values:
+            for field in value:
+                if field not in merged:
+                    merged[field] = merge_values(field, [v.get(field) for v in values], rule)
+        return merged
+
+    if all(isinstance(value, list) for value in values):
+        return _merge_lists(values)
+
+    if all(_is_number(value) for value in values):
+        if rule == "average":
+            return round(sum(values) / len(values), 2)
+        if rule == "sum":
+            return sum(values)
+        if rule == "max":
+            return max(values)
+        return values[0]
+
+    if all(isinstance(value, bool) for value in values):
+        return any(values)
+
+    for value in values:
+        if value not in ("", [], {}):
+            return value
+    return values[0]
+
+
+def merge_answers(answers):
+    """
+    Reduce per-chunk answers into one answer.
+
+    JSON answers are merged into a single object with the same schema. If any
+    chunk returned plain text, the answers are joined as text sections instead.
+
+    Args:
+        answers (list): Answer text from each chunk, in chunk order
+
+    Returns:
+        str: Merged answer
+    """
+    parsed = [parse_json_answer(answer) for answer in answers]
+    if parsed and all(value is not None for value in parsed):
+        return json.dumps(merge_values(None, parsed), indent=2, ensure_ascii=False)
+
+    sections = []
+    for index, answer in enumerate(answers, start=1):
+        sections.append(f"--- Log chunk {index} of {len(answers)} ---\n{answer.strip()}")
+    return "\n\n".join(sections)
@@ -1,26 +1,169 @@
 import os
-from dotenv import load_dotenv
 
-# Load .env file
-load_dotenv()
+_env_loaded = False
+
+def load_env():
+    """Load the .env file into the environment, once, on first use (not at import)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _env_loaded = True
+
+def _get_int(name, default):
+    """Read an integer setting from the environment, falling back to default."""
+    value = os.getenv(name)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+def _get_float(name, default):
+    """Read a float setting from the environment, falling back to default."""
+    value = os.getenv(name)
+    try:
+        return float(value) if value else default
+    except ValueError:
+        return default
+
+def _get_bool(name, default):
+    """Read a true/false setting from the environment, falling back to default."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
 
 def get_config():
     """
     Get configuration from .env file.
     Returns: dictionary containing all settings
     """
+    load_env()
     config = {
         'api_key': os.getenv('OPENAI_API_KEY'),
+        # Alternative API endpoint, e.g. a local stand-in server for testing
+        'base_url': os.getenv('OPENAI_BASE_URL') or None,
         'model': os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
         'logs_folder': os.path.join(os.path.dirname(__file__), '../logs'),
-        'results_folder': os.path.join(os.path.dirname(__file__), '../results')
+        'results_folder': os.path.join(os.path.dirname(__file__), '../results'),
+        # Log file of the analyzer's own messages (empty = console only) and log level
+        'log_file': os.getenv('ANALYZER_LOG_FILE', 'wowza_analysis.log'),
+        'log_level': os.getenv('ANALYZER_LOG_LEVEL', 'INFO').strip().upper(),
+        # Log ingestion: max size of log text held in memory, and read tuning
+        'log_memory_limit_mb': _get_int('LOG_MEMORY_LIMIT_MB', 32),
+        'log_read_buffer_kb': _get_int('LOG_READ_BUFFER_KB', 1024),
+        'log_use_mmap': _get_bool('LOG_USE_MMAP', False),
+        # Compressed logs (.gz/.bz2/.xz/.zip) decompressed ahead in parallel
+        'log_decompress_workers': _get_int('LOG_DECOMPRESS_WORKERS', min(4, os.cpu_count() or 1)),
+        # Summary mode parses files, and ranges of files larger than LOG_SPLIT_MB, on a process pool
+        'log_parse_workers': _get_int('LOG_PARSE_WORKERS', os.cpu_count() or 1),
+        'log_split_mb': _get_int('LOG_SPLIT_MB', 64),
+        # Prompt dispatch: send prompts concurrently with asyncio, capped at max_concurrency
+        'async_mode': _get_bool('ANALYSIS_ASYNC', True),
+        'max_concurrency': _get_int('OPENAI_MAX_CONCURRENCY', 4),
+        # HTTP client shared by the whole run: timeouts and keep-alive connection pool
+        'timeout': _get_float('OPENAI_TIMEOUT', 60.0),
+        'connect_timeout': _get_float('OPENAI_CONNECT_TIMEOUT', 10.0),
+        # Rate limiting and retries: account limits (0 = learn from response headers),
+        # jittered exponential backoff on transient errors, bounded by a time budget
+        'requests_per_minute': _get_int('OPENAI_RPM_LIMIT', 0),
+        'tokens_per_minute': _get_int('OPENAI_TPM_LIMIT', 0),
+        'max_retries': _get_int('OPENAI_MAX_RETRIES', 5),
+        'retry_budget_seconds': _get_float('OPENAI_RETRY_BUDGET_SECONDS', 120.0),
+        'retry_base_delay': _get_float('OPENAI_RETRY_BASE_DELAY', 1.0),
+        'retry_max_delay': _get_float('OPENAI_RETRY_MAX_DELAY', 30.0),
+        'max_connections': _get_int('OPENAI_MAX_CONNECTIONS', 20),
+        'max_keepalive_connections': _get_int('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 10),
+        'keepalive_expiry': _get_float('OPENAI_KEEPALIVE_EXPIRY', 30.0),
+        # Logs larger than one chunk are split on line boundaries and analyzed with map-reduce
+        'chunking_enabled': _get_bool('CHUNKING_ENABLED', True),
+        'chunk_max_tokens': _get_int('CHUNK_MAX_TOKENS', 100000),
+        # What the prompts receive: 'summary' (local statistics + sample lines),
+        # 'templates' (local statistics + mined log templates), 'raw' (full log text) or
+        # 'retrieval' (per-prompt search results from the log index, see below)
+        'log_payload_mode': os.getenv('LOG_PAYLOAD_MODE', 'summary').strip().lower(),
+        'log_sample_lines': _get_int('LOG_SAMPLE_LINES', 200),
+        'summary_top_n': _get_int('SUMMARY_TOP_N', 5),
+        'log_max_templates': _get_int('LOG_MAX_TEMPLATES', 100),
+        'template_similarity': _get_float('TEMPLATE_SIMILARITY', 0.5),
+        'template_max_clusters': _get_int('TEMPLATE_MAX_CLUSTERS', 1000),
+        # Raw payloads: send each prompt only the lines its filter keeps (see WowzaAnalysisPrompts.get_prompt_filters)
+        'log_filter_enabled': _get_bool('LOG_FILTER', True),
+        'log_filter_severities': tuple(
+            severity.strip().upper() for severity in os.getenv('LOG_FILTER_SEVERITIES', 'WARN,ERROR,CRITICAL').split(',') if severity.strip()
+        ),
+        'log_filter_context': _get_int('LOG_FILTER_CONTEXT_LINES', 2),
+        # Retrieval payloads: parsed lines are kept in a SQLite full-text index that only indexes
+        # new lines on each run; every prompt gets up to LOG_RETRIEVAL_MAX_TOKENS of the distinct
+        # messages matching its query (see WowzaAnalysisPrompts.get_prompt_queries).
+        # Lines older than LOG_INDEX_RETENTION_DAYS before the newest line are removed (0 = keep all)
+        'log_index_file': os.getenv('LOG_INDEX_FILE', os.path.join(os.path.dirname(__file__), '../state/log_index.sqlite')),
+        'retrieval_max_tokens': _get_int('LOG_RETRIEVAL_MAX_TOKENS', 4000),
+        'log_index_retention_days': _get_int('LOG_INDEX_RETENTION_DAYS', 0),
+        # Timeline prompts are analyzed per time window of this many minutes, merged across files (0 = off)
+        'timeline_window_minutes': _get_int('TIMELINE_WINDOW_MINUTES', 15),
+        # Prompts of a run: 'simple' (3 quick prompts), 'detailed' (the 6 detailed prompts) or 'all';
+        # prompts building on other prompts get their answers, each cut to PROMPT_UPSTREAM_MAX_TOKENS
+        'prompt_set': os.getenv('PROMPT_SET', 'simple').strip().lower(),
+        'upstream_max_tokens': _get_int('PROMPT_UPSTREAM_MAX_TOKENS', 1500),
+        'temperature': _get_float('OPENAI_TEMPERATURE', 0.1),
+        # Stream responses, which also records each request's time to first token
+        'stream_responses': _get_bool('OPENAI_STREAM', True),
+        # Send the first prompt alone so the shared log prefix is in the provider's prompt cache
+        # before the other prompts are sent (concurrent requests cannot reuse each other's prefix)
+        'prompt_cache_warmup': _get_bool('PROMPT_CACHE_WARMUP', False),
+        # Response cache: 'on', 'off' or 'refresh' (ignore cached answers but store new ones)
+        'cache_mode': os.getenv('RESPONSE_CACHE', 'on').strip().lower(),
+        'cache_folder': os.getenv('RESPONSE_CACHE_FOLDER', os.path.join(os.path.dirname(__file__), '../cache')),
+        'cache_max_mb': _get_int('RESPONSE_CACHE_MAX_MB', 100),
+        'cache_ttl_hours': _get_float('RESPONSE_CACHE_TTL_HOURS', 168),
+        # Every finished request is appended to <runs folder>/<run id>.ndjson (empty = off);
+        # --resume sets 'resume' and 'run_id' to skip requests a run already finished
+        'runs_folder': os.getenv('RESULTS_RUNS_FOLDER', os.path.join(os.path.dirname(__file__), '../results/runs')),
+        'run_id': None,
+        'resume': False,
+        # Stage timings and counters, written after every run as a Prometheus textfile
+        # (wowza_analyzer.prom) and an OTLP/JSON trace (trace_<run id>.json); 'profile' is set by --profile
+        'metrics_enabled': _get_bool('METRICS_ENABLED', True),
+        'metrics_folder': os.getenv('METRICS_FOLDER', os.path.join(os.path.dirname(__file__), '../results/metrics')),
+        'profile': None,
+        # Incremental mode: only analyze lines added since the last run
+        'incremental': _get_bool('INCREMENTAL_MODE', False),
+        'incremental_state_file': os.getenv('INCREMENTAL_STATE_FILE', os.path.join(os.path.dirname(__file__), '../state/incremental_state.json')),
+        'incremental_history': _get_int('INCREMENTAL_HISTORY_WINDOWS', 4),
+        # Watch mode: inotify where available ('auto'), or 'poll'; a burst of writes is analyzed
+        # once no change is seen for the debounce time, or after the max wait at the latest
+        'watch_backend': os.getenv('WATCH_BACKEND', 'auto').strip().lower(),
+        'watch_poll_seconds': _get_float('WATCH_POLL_SECONDS', 2.0),
+        'watch_debounce_seconds': _get_float('WATCH_DEBOUNCE_SECONDS', 5.0),
+        'watch_max_wait_seconds': _get_float('WATCH_MAX_WAIT_SECONDS', 60.0),
+        # Fleet mode: JSON manifest of servers and their log folders; servers are analyzed in
+        # FLEET_SERVER_WORKERS threads sharing one rate limiter and FLEET_MAX_CONCURRENCY requests
+        # in flight, split fairly between servers (FLEET_SERVER_MAX_CONCURRENCY caps one server, 0 = no cap)
+        'fleet_manifest': os.getenv('FLEET_MANIFEST') or None,
+        'fleet_max_concurrency': _get_int('FLEET_MAX_CONCURRENCY', 16),
+        'fleet_server_max_concurrency': _get_int('FLEET_SERVER_MAX_CONCURRENCY', 0),
+        'fleet_server_workers': _get_int('FLEET_SERVER_WORKERS', 8),
+        # Per-run budget checked before any request is sent (0 = unlimited);
+        # BUDGET_ACTION: 'abort', 'downsample' (keep every n-th line) or 'summary'
+        'max_run_cost_usd': _get_float('MAX_RUN_COST_USD', 0.0),
+        'max_run_tokens': _get_int('MAX_RUN_TOKENS', 0),
+        'budget_action': os.getenv('BUDGET_ACTION', 'abort').strip().lower(),
+        'plan_output_tokens': _get_int('PLAN_OUTPUT_TOKENS', 1000),
+        # Batch mode: submit all requests as one Batch API job (cheaper, results within 24h)
+        'batch_mode': _get_bool('OPENAI_BATCH_MODE', False),
+        'batch_folder': os.getenv('OPENAI_BATCH_FOLDER', os.path.join(os.path.dirname(__file__), '../batches')),
+        'batch_poll_seconds': _get_float('OPENAI_BATCH_POLL_SECONDS', 30.0),
+        'batch_timeout_hours': _get_float('OPENAI_BATCH_TIMEOUT_HOURS', 24.0)
     }
     
     return config
 
-def check_config():
+def check_config(logs_folders=None):
     """
     Check if configuration is complete and valid.
+    Args: logs_folders - folders that must exist (default: the configured logs folder)
     Returns: True if OK, False if something is missing
     """
     config = get_config()
@@ -29,9 +172,10 @@ def check_config():
         print("ERROR: Missing OPENAI_API_KEY in .env file")
         return False
     
-    if not os.path.exists(config['logs_folder']):
-        print(f"ERROR: Logs folder does not exist: {config['logs_folder']}")
-        return False
+    for logs_folder in logs_folders or [config['logs_folder']]:
+        if not os.path.exists(logs_folder):
+            print(f"ERROR: Logs folder does not exist: {logs_folder}")
+            return False
     
     print("SUCCESS: Configuration is valid!")
     return True
@@ -0,0 +1,277 @@
+"""
+Fleet mode: analyze the logs of many Wowza servers in one run
+
+A manifest lists the servers (origins, edges, ...) and their log folders.
+Every server is analyzed like a single-server run, in a pool of worker
+threads, but all requests go through one RequestScheduler: one rate limiter
+for the account and one global limit of requests in flight, handed out
+fairly between the servers (see rate_limiter.FairSlots). A server with many
+log shards or slow responses cannot starve the others, and the run takes
+about as long as the API throughput allows instead of the sum of per-server
+runs. Each server gets its own results; a fleet rollup compares them.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from metrics import count, span
+from pricing import calculate_cost
+from rate_limiter import FairSlots, RequestScheduler
+from result_sink import new_run_id
+
+# Subfolder of the results, runs, batch and state folders with one folder per server
+FLEET_FOLDER = "fleet"
+
+_SERVER_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+
+def load_manifest(path):
+    """
+    Read a fleet manifest.
+
+    The manifest is a JSON file:
+        {"servers": [{"name": "origin-1", "logs_folder": "/var/log/wowza/origin-1", "role": "origin"}, ...]}
+    Relative log folders are relative to the manifest file; "role" is optional.
+
+    Args:
+        path (str): Manifest file
+
+    Returns:
+        list: Servers as dicts with 'name', 'logs_folder' and 'role'
+
+    Raises:
+        ValueError: The manifest cannot be read or is invalid
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read fleet manifest {path}: {e}") from e
+
+    entries = manifest.get("servers") if isinstance(manifest, dict) else manifest
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Fleet manifest {path} has no servers")
+    base = Path(path).resolve().parent
+    servers = []
+    names = set()
+    for entry in entries:
+        name = entry.get("name") if isinstance(entry, dict) else None
+        if not name or not _SERVER_NAME.fullmatch(str(name)):
+            raise ValueError(f"Invalid server name in fleet manifest: {name!r} (letters, digits, '.', '_' and '-')")
+        if name in names:
+            raise ValueError(f"Server {name} is listed twice in the fleet manifest")
+        if not entry.get("logs_folder"):
+            raise ValueError(f"Server {name} has no logs_folder in the fleet manifest")
+        names.add(name)
+        servers.append({
+            "name": name,
+            "logs_folder": str(base / entry["logs_folder"]),
+            "role": entry.get("role")
+        })
+    return servers
+
+
+def server_config(config, server, parallel_servers):
+    """
+    Configuration of one server's analysis within a fleet run.
+
+    Read positions, log indexes, run files and batch files are kept per
+    server; the response cache is shared. Local parse and decompress workers are split
+    between the servers analyzed at the same time.
+
+    Args:
+        config (dict): Configuration from get_config()
+        server (dict): Server from load_manifest()
+        parallel_servers (int): Number of servers analyzed at the same time
+
+    Returns:
+        dict: Configuration for analyze_logs()
+    """
+    def per_server(path):
+        return os.path.join(path, FLEET_FOLDER, server['name']) if path else path
+
+    state_file = config['incremental_state_file']
+    index_file = config['log_index_file']
+    return dict(
+        config,
+        logs_folder=server['logs_folder'],
+        runs_folder=per_server(config['runs_folder']),
+        batch_folder=per_server(config['batch_folder']),
+        incremental_state_file=os.path.join(per_server(os.path.dirname(state_file)), os.path.basename(state_file)),
+        log_index_file=os.path.join(per_server(os.path.dirname(index_file)), os.path.basename(index_file)),
+        # The fair slots limit the fleet; one server may use all of them when the others are idle
+        max_concurrency=config['fleet_server_max_concurrency'] or config['fleet_max_concurrency'],
+        log_parse_workers=max(1, config['log_parse_workers'] // parallel_servers),
+        log_decompress_workers=max(1, config['log_decompress_workers'] // parallel_servers)
+    )
+
+
+def summarize_server(server, results, seconds, error=None):
+    """
+    One server's line of the fleet rollup.
+
+    Args:
+        server (dict): Server from load_manifest()
+        results (dict): Results of analyze_logs(), or None when nothing was analyzed
+        seconds (float): Wall time of the server's analysis
+        error (Exception): Error that stopped the analysis, if any
+
+    Returns:
+        dict: Status, log volume, prompts, tokens and cost of the server
+    """
+    summary = {"role": server['role'], "logs_folder": server['logs_folder'], "wall_seconds": round(seconds, 2)}
+    if error is not None:
+        summary.update(status="error", error=str(error))
+        return summary
+    if not results:
+        summary["status"] = "no_results"
+        return summary
+
+    analyses = results["analysis_results"]
+    succeeded = sum(1 for analysis in analyses.values() if analysis.get("status") == "success")
+    token_summary = results["token_summary"]
+    summary.update(
+        status="success" if succeeded == len(analyses) else "partial" if succeeded else "error",
+        prompts_succeeded=succeeded,
+        prompts=len(analyses),
+        files=results["logs_info"].get("files", 0),
+        lines=results["logs_info"].get("lines", 0),
+        total_tokens=token_summary["total_tokens"],
+        cost_usd=token_summary["cost_breakdown"]["total_cost_usd"]
+    )
+    log_errors = (results.get("log_summary") or {}).get("total_errors")
+    if log_errors is not None:
+        summary["log_errors"] = log_errors
+    return summary
+
+
+def build_rollup(server_summaries, server_results, config):
+    """
+    Combine the per-server results into fleet totals.
+
+    Args:
+        server_summaries (dict): Server name -> summarize_server() output
+        server_results (dict): Server name -> results of analyze_logs()
+        config (dict): Configuration from get_config()
+
+    Returns:
+        dict: Per-prompt success counts across servers and fleet token totals
+    """
+    prompts = {}
+    totals = {"total_prompt_tokens": 0, "total_cached_tokens": 0, "total_completion_tokens": 0,
+              "total_tokens": 0, "cache_hits": 0, "resumed": 0}
+    for results in server_results.values():
+        for prompt_name, analysis in results["analysis_results"].items():
+            outcome = prompts.setdefault(prompt_name, {"succeeded": 0, "failed": 0})
+            outcome["succeeded" if analysis.get("status") == "success" else "failed"] += 1
+        for key in totals:
+            totals[key] += results["token_summary"].get(key, 0)
+    totals["cost_breakdown"] = calculate_cost(
+        totals["total_prompt_tokens"], totals["total_completion_tokens"], config['model'],
+        config['batch_mode'], totals["total_cached_tokens"]
+    )
+    statuses = [summary["status"] for summary in server_summaries.values()]
+    return {
+        "servers_succeeded": statuses.count("success"),
+        "servers_partial": statuses.count("partial"),
+        "servers_failed": statuses.count("error"),
+        "prompts": prompts,
+        "token_summary": totals
+    }
+
+
+def analyze_server(server, config, scheduler, cache=None):
+    """Analyze one server of the fleet; returns (results, summarize_server() output)."""
+    from ai_analyzer import analyze_logs
+
+    start = time.time()
+    print(f"\n[{server['name']}] Analyzing {server['logs_folder']}")
+    try:
+        with span("fleet_server", server=server['name']):
+            results = analyze_logs(server['logs_folder'], config, scheduler=scheduler, cache=cache)
+    except Exception as e:
+        # One broken server must not stop the rest of the fleet
+        logging.exception("Fleet: analysis of server %s failed", server['name'])
+        return None, summarize_server(server, None, time.time() - start, e)
+    if results:
+        results["server"] = {"name": server['name'], "role": server['role'], "logs_folder": server['logs_folder']}
+    return results, summarize_server(server, results, time.time() - start)
+
+
+def analyze_fleet(servers, config, on_server_results=None):
+    """
+    Analyze every server of a fleet, sharing one rate limiter and request limit.
+
+    Up to config['fleet_server_workers'] servers are read and analyzed at the
+    same time. Their requests wait for one of config['fleet_max_concurrency']
+    fair slots; the next free slot goes to the server with the fewest requests
+    in flight.
+
+    Args:
+        servers (list): Servers from load_manifest()
+        config (dict): Configuration from get_config()
+        on_server_results (callable): Called as on_server_results(server, results) as soon
+            as a server is done (in completion order), e.g. to save its results
+
+    Returns:
+        dict: Fleet rollup with one summary per server
+    """
+    start = time.time()
+    slots = FairSlots(config['fleet_max_concurrency'], config['fleet_server_max_concurrency'])
+    scheduler = RequestScheduler.from_config(config, slots)
+    # One response cache for all servers: its size limit is for the whole cache folder
+    from ai_analyzer import create_response_cache
+    cache = create_response_cache(config)
+    parallel_servers = max(1, min(config['fleet_server_workers'], len(servers)))
+    if config['run_id'] is None and not config['resume']:
+        # All servers write their run file under the same run ID
+        config = dict(config, run_id=new_run_id())
+    print(f"Fleet: {len(servers)} servers, {parallel_servers} analyzed at a time, "
+          f"max {slots.limit} requests in flight across the fleet")
+
+    server_summaries = {}
+    server_results = {}
+    with span("fleet", servers=len(servers)), \
+            ThreadPoolExecutor(max_workers=parallel_servers, thread_name_prefix="fleet") as executor:
+        # Each thread runs in a copy of the current context, so its spans are children of the fleet span
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run, analyze_server, server,
+                server_config(config, server, parallel_servers), scheduler.for_tenant(server['name']), cache
+            ): server
+            for server in servers
+        }
+        for future in as_completed(futures):
+            server = futures[future]
+            results, summary = future.result()
+            server_summaries[server['name']] = summary
+            count("fleet_servers_analyzed")
+            print(f"[{server['name']}] Done: {summary['status']} ({summary['wall_seconds']}s)")
+            if results:
+                server_results[server['name']] = results
+                if on_server_results is not None:
+                    on_server_results(server, results)
+
+    slot_stats = slots.stats()
+    for name, summary in server_summaries.items():
+        summary.update(slot_stats["tenants"].get(name, {"requests": 0, "queue_wait_seconds": 0.0}))
+    fleet_results = {
+        "analysis_mode": "fleet",
+        "run_id": config['run_id'],
+        "wall_seconds": round(time.time() - start, 2),
+        "scheduler": {
+            "max_concurrency": slots.limit,
+            "server_max_concurrency": slots.tenant_limit,
+            "parallel_servers": parallel_servers,
+            "peak_in_flight": slot_stats["peak_in_flight"]
+        },
+        "servers": {server['name']: server_summaries[server['name']] for server in servers}
+    }
+    fleet_results.update(build_rollup(server_summaries, server_results, config))
+    return fleet_results
@@ -0,0 +1,269 @@
+"""
+Incremental (tail) mode: remember how far each log file was read between runs
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from log_reader import MAX_LINE_BYTES
+
+# Leading bytes hashed to recognise a log file again after rotation compressed it
+HEAD_BYTES = 4096
+
+
+def _line_hash(raw_line):
+    return hashlib.sha1(raw_line).hexdigest()
+
+
+def _read_head(path):
+    with open(path, "rb") as f:
+        return f.read(HEAD_BYTES)
+
+
+def _read_line_before(path, offset):
+    """Return the raw line that ends exactly at offset (including its newline)."""
+    start = max(0, offset - MAX_LINE_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(offset - start)
+    if not data.endswith(b"\n"):
+        return None
+    previous = data.rfind(b"\n", 0, len(data) - 1)
+    return data[previous + 1:]
+
+
+class IncrementalState:
+    """
+    Per-file read positions persisted between runs.
+
+    For every log file the state keeps its device/inode, size, the byte offset
+    of the last complete line read and a hash of that line. On the next run a
+    file is read from its offset only if it is still the same file: a changed
+    inode, a file smaller than the offset (truncation) or a different last line
+    means the file was rotated or rewritten, and it is read from the start.
+    Files renamed by rotation are recognised by their inode and keep their offset.
+
+    Compressed archives are read completely once. An archive made by rotation
+    from a log file read earlier is recognised by the hash of its first bytes
+    and continues after the last line read from the original file.
+
+    The state also keeps a short history of summaries of earlier windows.
+    """
+
+    def __init__(self, path, history_size=4):
+        self.path = path
+        self.history_size = history_size
+        self.head_bytes = HEAD_BYTES
+        self.previous_files = {}
+        self.files = {}
+        self.windows = []
+        self.load()
+
+    def load(self):
+        """Load the state file, starting empty if it does not exist or is unreadable."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring unreadable incremental state %s: %s", self.path, e)
+            return
+        # Positions from the last run are looked up in previous_files; files seen in
+        # this run are recorded in files, so deleted files drop out on save
+        self.previous_files = data.get("files", {})
+        self.windows = data.get("windows", [])
+
+    def save(self):
+        """
+        Write the state file atomically.
+
+        A run that read no file through the state (retrieval payloads come from
+        the log index) keeps the positions of the earlier runs.
+        """
+        files = self.files or self.previous_files
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"files": files, "windows": self.windows}, f, indent=2)
+        os.replace(temp_path, self.path)
+        # A long-running process (watch mode) continues its next run from the positions just saved
+        self.previous_files = files
+        self.files = {}
+
+    def _find_entry(self, key, info):
+        entry = self.previous_files.get(key)
+        if entry is not None and entry["inode"] == info.st_ino and entry["device"] == info.st_dev:
+            return entry
+        # The file may have been renamed by log rotation: look it up by inode
+        for other_key, other in self.previous_files.items():
+            if other_key != key and other["inode"] == info.st_ino and other["device"] == info.st_dev:
+                logging.info("Log file %s was renamed to %s, continuing from offset %s", other_key, key, other["offset"])
+                return other
+        return None
+
+    def _valid_offset(self, path, info, entry):
+        """Return the recorded offset of a file if it is still the same file, else 0."""
+        offset = 0
+        if entry is not None and entry["offset"]:
+            if info.st_size < entry["offset"]:
+                logging.info("Log file %s was truncated, reading from the start", path)
+            else:
+                last_line = _read_line_before(path, entry["offset"])
+                if last_line is not None and _line_hash(last_line) == entry["last_line_hash"]:
+                    offset = entry["offset"]
+                else:
+                    logging.info("Log file %s was rewritten, reading from the start", path)
+        return offset
+
+    def peek_offset(self, path):
+        """
+        Return the offset resume_offset() would start from, without recording anything.
+
+        Used by extra passes over the same logs in one run (e.g. time windows),
+        which must not move the read positions.
+
+        Args:
+            path (Path): Log file
+
+        Returns:
+            int: Offset after the last line read in a previous run, or 0
+        """
+        info = os.stat(path)
+        return self._valid_offset(path, info, self._find_entry(str(path), info))
+
+    def resume_offset(self, path):
+        """
+        Return the byte offset to start reading a file from.
+
+        Args:
+            path (Path): Log file
+
+        Returns:
+            int: Offset after the last line read in a previous run, or 0
+        """
+        key = str(path)
+        info = os.stat(path)
+        entry = self._find_entry(key, info)
+        offset = self._valid_offset(path, info, entry)
+
+        head = _read_head(path)
+        self.files[key] = {
+            "device": info.st_dev,
+            "inode": info.st_ino,
+            "size": info.st_size,
+            "offset": offset,
+            "last_line_hash": entry["last_line_hash"] if entry is not None and offset else None,
+            "head_len": len(head),
+            "head_hash": _line_hash(head)
+        }
+        return offset
+
+    def advance(self, path, offset, raw_line):
+        """
+        Record that a file has been read up to offset.
+
+        Args:
+            path (Path): Log file
+            offset (int): Byte offset after raw_line
+            raw_line (bytes): Last complete line read
+        """
+        entry = self.files[str(path)]
+        entry["offset"] = offset
+        entry["last_line_hash"] = _line_hash(raw_line)
+
+    def line_matches(self, raw_line, last_line_hash):
+        """Check a line against the last_line_hash recorded for a read position."""
+        return last_line_hash is not None and _line_hash(raw_line) == last_line_hash
+
+    def archive_seen(self, path):
+        """
+        Check whether a compressed archive was read completely in an earlier run.
+
+        Args:
+            path (Path): Archive
+
+        Returns:
+            bool: True if the archive can be skipped
+        """
+        key = str(path)
+        info = os.stat(path)
+        entry = self._find_entry(key, info)
+        if entry is not None and entry.get("archive") and entry["size"] == info.st_size and entry["offset"] == info.st_size:
+            self.files[key] = dict(entry)
+            return True
+        return False
+
+    def archive_resume(self, path, head):
+        """
+        Find where to continue reading an archive that has not been read yet.
+
+        Args:
+            path (Path): Archive
+            head (bytes): First decompressed bytes of the archive
+
+        Returns:
+            tuple: (decompressed offset to continue from, hash of the line ending there);
+                (0, None) to read the whole archive
+        """
+        info = os.stat(path)
+        self.files[str(path)] = {
+            "device": info.st_dev,
+            "inode": info.st_ino,
+            "size": info.st_size,
+            "offset": 0,
+            "last_line_hash": None,
+            "archive": True
+        }
+        for other_key, other in self.previous_files.items():
+            head_len = other.get("head_len")
+            if other.get("archive") or not head_len or not other["offset"] or len(head) < head_len:
+                continue
+            if _line_hash(head[:head_len]) == other["head_hash"]:
+                logging.info("Archive %s is the rotated %s, continuing from offset %s", path, other_key, other["offset"])
+                return other["offset"], other["last_line_hash"]
+        return 0, None
+
+    def archive_done(self, path):
+        """Record that an archive has been read completely."""
+        entry = self.files[str(path)]
+        entry["offset"] = entry["size"]
+
+    def add_window(self, lines, summary=None):
+        """
+        Append a compact summary of the window just analyzed to the rolling history.
+
+        Args:
+            lines (int): Number of new lines in the window
+            summary (dict): Optional LogAggregator summary of the window
+        """
+        window = {"analyzed_at": time.strftime("%Y-%m-%d %H:%M:%S"), "lines": lines}
+        if summary is not None:
+            window["total_errors"] = summary.get("total_errors", 0)
+            window["time_range"] = summary.get("time_range")
+            window["severity_distribution"] = summary.get("severity_distribution", {})
+            window["top_messages"] = summary.get("top_messages", [])[:3]
+        self.windows = (self.windows + [window])[-self.history_size:] if self.history_size else []
+
+
+def format_history_block(windows):
+    """
+    Render the rolling summary of earlier windows for the prompts.
+
+    Args:
+        windows (list): IncrementalState.windows
+
+    Returns:
+        str: Prompt text, or an empty string when there is no history
+    """
+    if not windows:
+        return ""
+    return (
+        "\n\nEARLIER WINDOWS (already analyzed, for context only):\n"
+        + "\n".join(json.dumps(window, separators=(",", ":"), ensure_ascii=False) for window in windows)
+    )
@@ -0,0 +1,148 @@
+"""
+Relevance pre-filter: keep problem lines and their context before log text reaches the model
+"""
+
+import re
+from collections import deque
+
+from chunking import CHARS_PER_TOKEN
+from log_parser import WowzaLogParser
+
+
+class LineFilter:
+    """
+    Streaming grep-style filter over log lines.
+
+    Keeps lines whose severity is in severities or that match one of the
+    regex patterns (case-insensitive), plus context lines before and after
+    each kept line. Directive lines (#Fields etc.) are always kept so the
+    remaining W3C records can still be read.
+    """
+
+    def __init__(self, severities=(), patterns=(), context=0):
+        self.severities = frozenset(severity.upper() for severity in severities)
+        self.patterns = tuple(patterns)
+        self.context = max(0, context)
+        self.pattern = re.compile("|".join(f"(?:{pattern})" for pattern in self.patterns), re.IGNORECASE) if self.patterns else None
+
+    @property
+    def key(self):
+        """Hashable description of the filter; prompts with equal keys can share one payload."""
+        return (tuple(sorted(self.severities)), self.patterns, self.context)
+
+    def describe(self):
+        """Short human-readable description of the filter."""
+        parts = []
+        if self.severities:
+            parts.append("/".join(sorted(self.severities)))
+        if self.patterns:
+            parts.append(f"{len(self.patterns)} pattern(s)")
+        return f"{' + '.join(parts) or 'nothing'} with {self.context} line(s) of context"
+
+    def _is_relevant(self, parser, line):
+        if self.pattern is not None and self.pattern.search(line):
+            return True
+        if not self.severities:
+            return False
+        parsed = parser.parse_values(line)
+        if parsed is None:
+            return False
+        schema, values = parsed
+        position = schema.index.get("x-severity")
+        return position is not None and values[position] in self.severities
+
+    def filter(self, lines, stats=None):
+        """
+        Filter a stream of log lines.
+
+        Args:
+            lines (iterable): Stream of log lines
+            stats (dict): Optional dict updated with lines_in/lines_kept/lines_removed
+                and characters_removed/tokens_removed as the stream is consumed
+
+        Yields:
+            str: Kept log line
+        """
+        if stats is None:
+            stats = {}
+        stats.update(lines_in=0, lines_kept=0, lines_removed=0, characters_removed=0, tokens_removed=0)
+        parser = WowzaLogParser()
+        before = deque(maxlen=self.context)
+        after = 0
+        for line in lines:
+            stats["lines_in"] += 1
+            if line.startswith("#"):
+                # Keep directives and let the parser follow #Fields changes
+                parser.parse_values(line)
+                stats["lines_kept"] += 1
+                yield line
+                continue
+            if self._is_relevant(parser, line):
+                while before:
+                    stats["lines_kept"] += 1
+                    yield before.popleft()
+                stats["lines_kept"] += 1
+                after = self.context
+                yield line
+            elif after:
+                after -= 1
+                stats["lines_kept"] += 1
+                yield line
+            else:
+                if len(before) == self.context:
+                    # The oldest line leaves the context window (with no context, the line itself)
+                    self._remove(before[0] if self.context else line, stats)
+                if self.context:
+                    before.append(line)
+        for line in before:
+            self._remove(line, stats)
+
+    @staticmethod
+    def _remove(line, stats):
+        stats["lines_removed"] += 1
+        stats["characters_removed"] += len(line) + 1
+        stats["tokens_removed"] = stats["characters_removed"] // CHARS_PER_TOKEN
+
+
+def build_line_filter(spec, config):
+    """
+    Build the filter of one prompt from its declaration in WowzaAnalysisPrompts.get_prompt_filters().
+
+    Args:
+        spec (dict | None): {'severities': ..., 'patterns': ...}; severities default to
+            config['log_filter_severities']. None sends all lines.
+        config (dict): Configuration from get_config()
+
+    Returns:
+        LineFilter | None: Filter, or None when the prompt gets every line
+    """
+    if spec is None or not config['log_filter_enabled']:
+        return None
+    severities = spec.get('severities')
+    return LineFilter(
+        config['log_filter_severities'] if severities is None else severities,
+        spec.get('patterns', ()),
+        config['log_filter_context']
+    )
+
+
+def group_prompts_by_filter(prompts, filters, config):
+    """
+    Group prompts that share the same filter, so each group is read and sent once.
+
+    Args:
+        prompts (dict): Prompt name -> prompt text
+        filters (dict): Prompt name -> filter declaration (see build_line_filter)
+        config (dict): Configuration from get_config()
+
+    Returns:
+        list: (LineFilter or None, {prompt name: prompt text}) in prompt order
+    """
+    groups = {}
+    for prompt_name, prompt_text in prompts.items():
+        line_filter = build_line_filter(filters.get(prompt_name), config)
+        key = line_filter.key if line_filter is not None else None
+        if key not in groups:
+            groups[key] = (line_filter, {})
+        groups[key][1][prompt_name] = prompt_text
+    return list(groups.values())
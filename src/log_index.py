@@ -0,0 +1,341 @@
+"""
+On-disk full-text index of parsed log lines (SQLite FTS5) for retrieval payloads
+
+Every parsed line is stored once with its timestamp, severity, category,
+stream and a short message (category, event and comment), and its message is
+indexed with FTS5. The index keeps its
+own read positions (an IncrementalState next to the database), so each run
+only parses and indexes the lines added since the last run, also when the
+run itself analyzes all lines.
+
+In retrieval mode every prompt declares a query (WowzaAnalysisPrompts.
+get_prompt_queries): search terms ranked by BM25 and/or severities ranked by
+severity and frequency. Repeated messages are returned once with their count
+and first/last time seen, until the prompt's token budget is full.
+"""
+
+import logging
+import os
+import sqlite3
+from pathlib import Path
+
+from aggregator import normalize_message
+from chunking import CHARS_PER_TOKEN
+from incremental import IncrementalState
+from log_parser import parse_batches
+from log_reader import iter_log_lines
+
+# Longest message kept per line; longer comments are cut
+MAX_MESSAGE_CHARACTERS = 500
+
+_SEVERITY_ORDER = "CASE severity WHEN 'CRITICAL' THEN 0 WHEN 'ERROR' THEN 1 WHEN 'WARN' THEN 2 ELSE 3 END"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY, ts TEXT, severity TEXT, category TEXT, stream TEXT, key TEXT, message TEXT
+);
+CREATE INDEX IF NOT EXISTS lines_severity ON lines (severity);
+CREATE INDEX IF NOT EXISTS lines_ts ON lines (ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5(message, content='lines', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS lines_insert AFTER INSERT ON lines BEGIN
+    INSERT INTO lines_fts (rowid, message) VALUES (new.id, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS lines_delete AFTER DELETE ON lines BEGIN
+    INSERT INTO lines_fts (lines_fts, rowid, message) VALUES ('delete', old.id, old.message);
+END;
+"""
+
+
+def fts5_available():
+    """Return True if the sqlite3 module of this Python was built with FTS5."""
+    try:
+        connection = sqlite3.connect(":memory:")
+        try:
+            connection.execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        finally:
+            connection.close()
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def build_match_expression(terms):
+    """
+    Turn search terms into an FTS5 query: any of the terms, a trailing * matches a prefix.
+
+    Args:
+        terms (tuple): Words or phrases, e.g. ('codec', 'keyframe*', 'sps')
+
+    Returns:
+        str: FTS5 MATCH expression
+    """
+    parts = []
+    for term in terms:
+        prefix = term.endswith("*")
+        word = term.rstrip("*").replace('"', '""')
+        parts.append(f'"{word}"' + ("*" if prefix else ""))
+    return " OR ".join(parts)
+
+
+class LogIndex:
+    """
+    Full-text index of the log lines of one logs folder.
+
+    The index is bound to the folder it was built from; opening it for
+    another folder starts a new index.
+    """
+
+    def __init__(self, path, logs_folder):
+        self.path = str(path)
+        self.logs_folder = os.path.realpath(logs_folder)
+        self.state_file = self.path + ".state.json"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+        indexed_folder = self.get_meta("logs_folder")
+        if indexed_folder is not None and indexed_folder != self.logs_folder:
+            logging.info("Log index %s was built for %s, rebuilding for %s", self.path, indexed_folder, self.logs_folder)
+            self.reset()
+        self.set_meta("logs_folder", self.logs_folder)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_meta(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, key, value):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def reset(self):
+        """Drop every indexed line and the read positions."""
+        with self.connection:
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS lines_fts; DROP TABLE IF EXISTS lines; DELETE FROM meta;"
+            )
+        self.connection.executescript(_SCHEMA)
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+    def analyzed_id(self, name):
+        """Last line ID analyzed by the incremental runs keeping their state in file name (0 = none)."""
+        return int(self.get_meta(f"analyzed:{os.path.abspath(name)}", 0))
+
+    def mark_analyzed(self, name, last_id):
+        """Record that the incremental runs keeping their state in file name analyzed up to last_id."""
+        self.set_meta(f"analyzed:{os.path.abspath(name)}", last_id)
+
+    def last_id(self):
+        """ID of the newest indexed line (0 when the index is empty)."""
+        return self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM lines").fetchone()[0]
+
+    def add_lines(self, lines, stats=None):
+        """
+        Parse a stream of log lines and add them to the index in one transaction.
+
+        Args:
+            lines (iterable): Stream of log lines
+            stats (dict): Optional dict updated with parser counters
+
+        Returns:
+            int: Lines added
+        """
+        added = 0
+        with self.connection:
+            for batch in parse_batches(lines, stats=stats):
+                rows = []
+                for date, time_value, severity, category, event, stream, comment in zip(
+                        batch.column("date"), batch.column("time"), batch.column("x-severity"),
+                        batch.column("x-category"), batch.column("x-event"), batch.column("x-sname"),
+                        batch.column("x-comment")):
+                    # Stream names are not searched: 'event_hevc' is not a codec problem
+                    message = " ".join(value for value in (category, event, comment) if value)
+                    if not message:
+                        continue
+                    timestamp = f"{date} {time_value}" if date and time_value else date
+                    key = normalize_message(f"{severity} {message}")
+                    rows.append((timestamp, severity, category, stream, key, message[:MAX_MESSAGE_CHARACTERS]))
+                self.connection.executemany(
+                    "INSERT INTO lines (ts, severity, category, stream, key, message) VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+                added += len(rows)
+        return added
+
+    def update(self, config, stats=None):
+        """
+        Index the lines added to the logs folder since the last update.
+
+        Args:
+            config (dict): Configuration from get_config()
+            stats (dict): Optional dict updated with files/lines/bytes_read counters
+
+        Returns:
+            int: Lines added
+        """
+        state = IncrementalState(self.state_file, history_size=0)
+        lines = iter_log_lines(
+            Path(self.logs_folder),
+            buffer_size=config['log_read_buffer_kb'] * 1024,
+            use_mmap=config['log_use_mmap'],
+            stats=stats,
+            state=state,
+            decompress_workers=config['log_decompress_workers']
+        )
+        added = self.add_lines(lines)
+        # Positions are saved after the lines are committed: a crash in between re-indexes
+        # a few lines, which retrieval merges with the earlier copies
+        state.save()
+        if config['log_index_retention_days'] > 0:
+            self.prune(config['log_index_retention_days'])
+        return added
+
+    def prune(self, days):
+        """Delete lines more than days older than the newest indexed line."""
+        newest = self.connection.execute("SELECT MAX(ts) FROM lines").fetchone()[0]
+        if newest is None:
+            return 0
+        with self.connection:
+            deleted = self.connection.execute(
+                "DELETE FROM lines WHERE ts < datetime(?, ?)", (newest, f"-{days} days")
+            ).rowcount
+        if deleted:
+            logging.info("Log index: removed %s lines older than %s days", deleted, days)
+        return deleted
+
+    def overview(self, first_id=1):
+        """
+        Line count, time range and severity counts of the lines from first_id on.
+
+        Returns:
+            dict: 'lines', 'start', 'end' and 'severities'
+        """
+        lines, start, end = self.connection.execute(
+            "SELECT COUNT(*), MIN(ts), MAX(ts) FROM lines WHERE id >= ?", (first_id,)
+        ).fetchone()
+        severities = self.connection.execute(
+            "SELECT COALESCE(severity, 'UNKNOWN'), COUNT(*) FROM lines WHERE id >= ? GROUP BY severity ORDER BY 2 DESC",
+            (first_id,)
+        ).fetchall()
+        return {"lines": lines, "start": start, "end": end, "severities": dict(severities)}
+
+    def _ranked(self, terms, severities, first_id):
+        """Yield (key, hits, first seen, last seen, severity, message, streams, a stream) groups, best first."""
+        columns = ("lines.key, COUNT(*) AS hits, MIN(lines.ts), MAX(lines.ts), lines.severity, lines.message, "
+                   "COUNT(DISTINCT lines.stream), MAX(lines.stream)")
+        if terms:
+            yield from self.connection.execute(
+                f"SELECT {columns}, MIN(lines_fts.rank) AS score FROM lines_fts JOIN lines ON lines.id = lines_fts.rowid "
+                "WHERE lines_fts MATCH ? AND lines_fts.rowid >= ? GROUP BY lines.key ORDER BY score, hits DESC",
+                (build_match_expression(terms), first_id)
+            )
+        if severities:
+            marks = ", ".join("?" for _ in severities)
+            yield from self.connection.execute(
+                f"SELECT {columns} FROM lines WHERE severity IN ({marks}) AND id >= ? "
+                f"GROUP BY key ORDER BY {_SEVERITY_ORDER}, hits DESC",
+                (*severities, first_id)
+            )
+        if not terms and not severities:
+            yield from self.connection.execute(
+                f"SELECT {columns} FROM lines WHERE id >= ? GROUP BY key ORDER BY hits DESC", (first_id,)
+            )
+
+    def retrieve(self, terms=(), severities=(), max_tokens=4000, first_id=1):
+        """
+        Retrieve the most relevant distinct messages for one prompt.
+
+        Lines matching the search terms come first, ranked by BM25, then lines
+        at the given severities, most severe and most frequent first. Without
+        terms and severities the most frequent messages are returned. Lines
+        with the same normalized message are returned once, with their count.
+
+        Args:
+            terms (tuple): Search terms (see build_match_expression)
+            severities (tuple): Severities to retrieve
+            max_tokens (int): Token budget of the returned lines
+            first_id (int): Only lines from this ID on (incremental runs)
+
+        Returns:
+            tuple: (list of rendered lines, dict with 'distinct', 'matched' and 'returned' counts)
+        """
+        budget = max_tokens * CHARS_PER_TOKEN
+        seen = set()
+        rendered = []
+        matched = 0
+        for key, hits, first, last, severity, message, streams, stream, *_ in self._ranked(terms, severities, first_id):
+            if key in seen:
+                continue
+            seen.add(key)
+            matched += hits
+            if budget <= 0:
+                continue
+            seen_at = (first or "-") if first == last else f"{first}..{last}"
+            line = f"{'x' + str(hits) + ' ' if hits > 1 else ''}{seen_at} {severity or '-'} {message}"
+            if streams > 1:
+                line += f" ({streams} streams)"
+            elif stream:
+                line += f" (stream {stream})"
+            if len(line) + 1 > budget:
+                budget = 0
+                continue
+            budget -= len(line) + 1
+            rendered.append(line)
+        return rendered, {"distinct": len(seen), "matched": matched, "returned": len(rendered)}
+
+
+def describe_query(query, severities):
+    """Short human-readable description of a retrieval query."""
+    parts = []
+    if query and query.get('terms'):
+        parts.append(f"{len(query['terms'])} search term(s)")
+    if severities:
+        parts.append("/".join(severities))
+    return " + ".join(parts) or "most frequent messages"
+
+
+def build_retrieval_payload(index, queries, config, first_id=1):
+    """
+    Build the context of every prompt from the index.
+
+    Args:
+        index (LogIndex): Updated log index
+        queries (dict): Prompt name -> {'terms': ..., 'severities': ...}; severities default
+            to config['log_filter_severities']. None retrieves the most frequent messages.
+        config (dict): Configuration from get_config()
+        first_id (int): Only lines from this ID on (incremental runs)
+
+    Returns:
+        tuple: (prompt name -> context text, overview of the indexed lines,
+            prompt name -> retrieval counts)
+    """
+    overview = index.overview(first_id)
+    severities = ", ".join(f"{severity} {count:,}" for severity, count in overview["severities"].items())
+    header = (f"LOG INDEX: {overview['lines']:,} lines, {overview['start'] or '-'} to {overview['end'] or '-'} "
+              f"(severities: {severities or 'none'})")
+    contexts = {}
+    reports = {}
+    for prompt_name, query in queries.items():
+        terms = tuple(query.get('terms', ())) if query else ()
+        severities = ()
+        if query is not None:
+            severities = tuple(config['log_filter_severities'] if query.get('severities') is None else query['severities'])
+        lines, report = index.retrieve(terms, severities, config['retrieval_max_tokens'], first_id)
+        description = describe_query(query, severities)
+        contexts[prompt_name] = (
+            f"{header}\n\nRETRIEVED LOG MESSAGES ({description}): {report['returned']} of {report['distinct']} "
+            f"distinct messages ({report['matched']:,} lines), most relevant first. Repeated messages are shown "
+            f"once as xN with the first and last time seen.\n" + "\n".join(lines)
+        )
+        reports[prompt_name] = dict(report, query=description)
+    return contexts, overview, reports
@@ -0,0 +1,313 @@
+"""
+Wowza W3C extended log format parser
+"""
+
+import re
+import sys
+
+# Default field list of Wowza Streaming Engine access logs, used until a #Fields header is seen
+WOWZA_DEFAULT_FIELDS = (
+    "date", "time", "tz", "x-event", "x-category", "x-severity", "x-status",
+    "x-ctx", "x-comment", "x-vhost", "x-app", "x-appinst", "x-duration",
+    "s-ip", "s-port", "s-uri", "c-ip", "c-proto", "c-referrer", "c-user-agent",
+    "c-client-id", "cs-bytes", "sc-bytes", "x-stream-id", "x-spos",
+    "cs-stream-bytes", "sc-stream-bytes", "x-sname", "x-sname-query",
+    "x-file-name", "x-file-ext", "x-file-size", "x-file-length", "x-suri",
+    "x-suri-stem", "x-suri-query", "cs-uri-stem", "cs-uri-query"
+)
+
+# Schema for lines that are not W3C records (plain text logs)
+PLAIN_FIELDS = ("x-severity", "x-comment")
+
+# Low-cardinality fields whose values are interned so repeated values share one string
+HOT_FIELDS = frozenset((
+    "date", "tz", "x-event", "x-category", "x-severity", "x-status", "x-vhost",
+    "x-app", "x-appinst", "s-ip", "s-port", "c-proto", "x-sname", "x-file-ext"
+))
+
+# Wowza writes "-" for empty values
+EMPTY_VALUE = "-"
+
+_SEVERITY_PATTERN = re.compile(r"\b(CRITICAL|FATAL|ERROR|WARN(?:ING)?|INFO|DEBUG)\b", re.IGNORECASE)
+_SEVERITY_NAMES = {"fatal": "CRITICAL", "warning": "WARN"}
+
+
+def detect_severity(text):
+    """
+    Find the severity keyword in a plain text log line.
+
+    Args:
+        text (str): Log line
+
+    Returns:
+        str | None: CRITICAL, ERROR, WARN, INFO or DEBUG, or None if not found
+    """
+    match = _SEVERITY_PATTERN.search(text)
+    if not match:
+        return None
+    word = match.group(1).lower()
+    return _SEVERITY_NAMES.get(word, word.upper())
+
+
+class FileStart(str):
+    """
+    First line of a log file in a stream of lines read from several files.
+
+    It behaves like any other line; parsers start over with the default
+    fields on it, so a #Fields header only applies to its own file.
+    """
+
+    __slots__ = ()
+
+
+class FieldSchema:
+    """Field names of a log file, shared by all records parsed under the same #Fields header"""
+
+    __slots__ = ("names", "index", "hot")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.index = {name: position for position, name in enumerate(self.names)}
+        self.hot = tuple(position for position, name in enumerate(self.names) if name in HOT_FIELDS)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class LogRecord:
+    """One parsed log line: a tuple of values plus a reference to its shared schema"""
+
+    __slots__ = ("schema", "values")
+
+    def __init__(self, schema, values):
+        self.schema = schema
+        self.values = values
+
+    def get(self, name, default=None):
+        """Return the value of a field, or default if the field is missing or empty."""
+        position = self.schema.index.get(name)
+        if position is None:
+            return default
+        value = self.values[position]
+        return default if value is None else value
+
+    def __getitem__(self, name):
+        return self.values[self.schema.index[name]]
+
+    def to_dict(self):
+        """Return the record as a {field: value} dictionary."""
+        return dict(zip(self.schema.names, self.values))
+
+    @property
+    def timestamp(self):
+        """'date time' string, or None if the record has no date"""
+        date = self.get("date")
+        if date is None:
+            return None
+        time_value = self.get("time")
+        return f"{date} {time_value}" if time_value else date
+
+    @property
+    def severity(self):
+        return self.get("x-severity")
+
+    @property
+    def category(self):
+        return self.get("x-category")
+
+    @property
+    def event(self):
+        return self.get("x-event")
+
+    @property
+    def context(self):
+        return self.get("x-ctx")
+
+    @property
+    def comment(self):
+        return self.get("x-comment")
+
+    @property
+    def client_id(self):
+        return self.get("c-client-id")
+
+    @property
+    def stream_id(self):
+        return self.get("x-stream-id")
+
+    def __repr__(self):
+        return f"LogRecord({self.to_dict()!r})"
+
+
+class RecordBatch:
+    """Column-oriented block of records sharing one schema: one list of values per field"""
+
+    __slots__ = ("schema", "columns", "size")
+
+    def __init__(self, schema, rows):
+        self.schema = schema
+        self.size = len(rows)
+        if rows:
+            self.columns = [list(column) for column in zip(*rows)]
+        else:
+            self.columns = [[] for _ in schema.names]
+
+    def column(self, name):
+        """Return the values of one field, or a list of None if the field is not in the schema."""
+        position = self.schema.index.get(name)
+        if position is None:
+            return [None] * self.size
+        return self.columns[position]
+
+    def records(self):
+        """Iterate the batch as LogRecord objects."""
+        for values in zip(*self.columns):
+            yield LogRecord(self.schema, values)
+
+    def __len__(self):
+        return self.size
+
+
+class WowzaLogParser:
+    """
+    Streaming parser for Wowza W3C extended logs.
+
+    Reads #Fields headers as they appear (each log file starts with its own)
+    and turns data lines into compact records. Lines that are not W3C records
+    are kept as plain records with a detected severity, so plain text logs
+    still work. The header is forgotten at the start of every file (FileStart
+    lines), so a plain text file read after a W3C file is still plain text.
+    """
+
+    def __init__(self, fields=None):
+        self.default_schema = FieldSchema(fields or WOWZA_DEFAULT_FIELDS)
+        self.plain_schema = FieldSchema(PLAIN_FIELDS)
+        self.schema = self.default_schema
+        self.header_seen = False
+        self.stats = {"records": 0, "plain_lines": 0, "directives": 0, "blank_lines": 0}
+
+    def start_file(self):
+        """Forget the #Fields header of the previous file."""
+        self.schema = self.default_schema
+        self.header_seen = False
+
+    def _handle_directive(self, line):
+        self.stats["directives"] += 1
+        if line.startswith("#Fields:"):
+            names = line[len("#Fields:"):].split()
+            if names:
+                self.schema = FieldSchema(names)
+                self.header_seen = True
+
+    def parse_values(self, line):
+        """
+        Split one line into a values tuple for the current schema.
+
+        Args:
+            line (str): Log line without trailing newline
+
+        Returns:
+            tuple: (schema, values), or None for directives and blank lines
+        """
+        if line.__class__ is FileStart:
+            self.start_file()
+        if not line or line.isspace():
+            self.stats["blank_lines"] += 1
+            return None
+        if line[0] == "#":
+            self._handle_directive(line)
+            return None
+
+        schema = self.schema
+        parts = line.split("\t")
+        # Under a #Fields header a record has exactly its fields; without one the
+        # default fields are assumed for lines with at least half of them
+        if len(parts) != len(schema) if self.header_seen else len(parts) <= len(schema) // 2:
+            # Not a W3C record: keep the text with its severity
+            self.stats["plain_lines"] += 1
+            severity = detect_severity(line)
+            return self.plain_schema, (sys.intern(severity) if severity else None, line)
+
+        width = len(schema)
+        if len(parts) < width:
+            parts.extend([EMPTY_VALUE] * (width - len(parts)))
+        elif len(parts) > width:
+            # Extra tabs belong to the last field
+            parts[width - 1:] = ["\t".join(parts[width - 1:])]
+
+        for position in schema.hot:
+            parts[position] = sys.intern(parts[position])
+        values = tuple(None if value == EMPTY_VALUE else value for value in parts)
+        self.stats["records"] += 1
+        return schema, values
+
+    def parse_line(self, line):
+        """
+        Parse one line into a LogRecord.
+
+        Args:
+            line (str): Log line without trailing newline
+
+        Returns:
+            LogRecord | None: Parsed record, or None for directives and blank lines
+        """
+        parsed = self.parse_values(line)
+        if parsed is None:
+            return None
+        return LogRecord(*parsed)
+
+
+def parse_records(lines, fields=None, stats=None):
+    """
+    Parse a stream of log lines into records.
+
+    Args:
+        lines (iterable): Stream of log lines
+        fields (tuple): Field names to use until a #Fields header is seen
+        stats (dict): Optional dict updated with parser counters
+
+    Yields:
+        LogRecord: Parsed record
+    """
+    parser = WowzaLogParser(fields)
+    for line in lines:
+        parsed = parser.parse_values(line)
+        if parsed is not None:
+            yield LogRecord(*parsed)
+    if stats is not None:
+        stats.update(parser.stats)
+
+
+def parse_batches(lines, batch_size=10000, fields=None, stats=None):
+    """
+    Parse a stream of log lines into column-oriented batches.
+
+    A batch is emitted when it is full or when the schema changes, so every
+    batch has a single schema.
+
+    Args:
+        lines (iterable): Stream of log lines
+        batch_size (int): Maximum number of records per batch
+        fields (tuple): Field names to use until a #Fields header is seen
+        stats (dict): Optional dict updated with parser counters
+
+    Yields:
+        RecordBatch: Batch of parsed records
+    """
+    parser = WowzaLogParser(fields)
+    schema = None
+    rows = []
+    for line in lines:
+        parsed = parser.parse_values(line)
+        if parsed is None:
+            continue
+        if parsed[0] is not schema or len(rows) >= batch_size:
+            if rows:
+                yield RecordBatch(schema, rows)
+            schema = parsed[0]
+            rows = []
+        rows.append(parsed[1])
+    if rows:
+        yield RecordBatch(schema, rows)
+    if stats is not None:
+        stats.update(parser.stats)
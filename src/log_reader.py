@@ -0,0 +1,515 @@
+"""
+Streaming Wowza log ingestion
+"""
+
+import bz2
+import gzip
+import itertools
+import logging
+import lzma
+import mmap
+import queue
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from log_parser import FileStart
+
+# File patterns picked up from the logs folder
+LOG_PATTERNS = ("*.log", "*.txt")
+
+# Compressed (rotated) logs, decompressed as a stream while reading
+ARCHIVE_PATTERNS = ("*.gz", "*.bz2", "*.xz", "*.zip")
+
+# Compression by file extension, and by leading magic bytes for files without one
+ARCHIVE_EXTENSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".zip": "zip"}
+ARCHIVE_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"PK\x03\x04", "zip")
+)
+
+# Errors raised by corrupt or truncated archives
+ARCHIVE_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError, zipfile.BadZipFile)
+
+# Decompressed blocks buffered ahead per archive being prefetched
+PREFETCH_BLOCKS = 4
+
+# Assumed compression ratio of log text when the uncompressed size is not stored in the archive
+ASSUMED_COMPRESSION_RATIO = 10
+
+# Lines longer than this are cut so a single corrupt line cannot blow up memory
+MAX_LINE_BYTES = 64 * 1024
+
+
+def find_log_files(log_dir):
+    """
+    Find all log files in the directory and its subdirectories.
+
+    Args:
+        log_dir (Path): Directory containing log files
+
+    Returns:
+        list: Paths of log files, in discovery order
+    """
+    files = []
+    for pattern in LOG_PATTERNS + ARCHIVE_PATTERNS:
+        files.extend(path for path in Path(log_dir).rglob(pattern) if path.is_file())
+    return files
+
+
+def detect_compression(path):
+    """
+    Detect whether a log file is compressed, by extension or magic bytes.
+
+    Args:
+        path (Path): Log file
+
+    Returns:
+        str | None: 'gzip', 'bz2', 'xz', 'zip', or None for plain text
+    """
+    kind = ARCHIVE_EXTENSIONS.get(Path(path).suffix.lower())
+    if kind is not None:
+        return kind
+    with open(path, "rb") as f:
+        magic = f.read(8)
+    for prefix, kind in ARCHIVE_MAGIC:
+        if magic.startswith(prefix):
+            return kind
+    return None
+
+
+def estimate_uncompressed_size(path, kind=None):
+    """
+    Estimate the decompressed size of a log file without decompressing it.
+
+    gzip stores the size (modulo 4 GiB) in its trailer and zip in its
+    directory; bz2 and xz sizes are estimated from a typical ratio for logs.
+
+    Args:
+        path (Path): Log file
+        kind (str): Compression from detect_compression(), detected if not given
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    kind = detect_compression(path) if kind is None else kind
+    size = Path(path).stat().st_size
+    try:
+        if kind == "gzip" and size >= 4:
+            with open(path, "rb") as f:
+                f.seek(-4, 2)
+                trailer_size = struct.unpack("<I", f.read(4))[0]
+            # The trailer wraps at 4 GiB; a size below the compressed size means it did
+            return trailer_size if trailer_size >= size else size * ASSUMED_COMPRESSION_RATIO
+        if kind == "zip":
+            with zipfile.ZipFile(path) as archive:
+                return sum(member.file_size for member in archive.infolist() if not member.is_dir())
+    except ARCHIVE_ERRORS:
+        pass
+    if kind is None:
+        return size
+    return size * ASSUMED_COMPRESSION_RATIO
+
+
+def _iter_buffered_lines(path, buffer_size, start=0):
+    """Yield (raw line, offset after the line) from a file using a buffered binary reader."""
+    with open(path, "rb", buffering=buffer_size) as f:
+        if start:
+            f.seek(start)
+        while True:
+            line = f.readline(MAX_LINE_BYTES)
+            if not line:
+                return
+            if not line.endswith(b"\n") and len(line) == MAX_LINE_BYTES:
+                # Skip the rest of an over-long line
+                while True:
+                    rest = f.readline(MAX_LINE_BYTES)
+                    if not rest:
+                        break
+                    if rest.endswith(b"\n"):
+                        line += b"\n"
+                        break
+            yield line, f.tell()
+
+
+def _iter_mmap_lines(path, start=0):
+    """Yield (raw line, offset after the line) from a file through a read-only memory map."""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        with mm:
+            size = mm.size()
+            while start < size:
+                end = mm.find(b"\n", start)
+                end = size if end == -1 else end + 1
+                if end - start > MAX_LINE_BYTES:
+                    # Cut over-long lines but keep their line ending
+                    line = mm[start:start + MAX_LINE_BYTES - 1] + mm[end - 1:end]
+                else:
+                    line = mm[start:end]
+                yield line, end
+                start = end
+
+
+def _iter_archive_blocks(path, kind, block_size):
+    """Yield decompressed blocks of an archive; zip members are concatenated in order."""
+    if kind == "zip":
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                with archive.open(member) as f:
+                    last = b"\n"
+                    while True:
+                        block = f.read(block_size)
+                        if not block:
+                            break
+                        last = block
+                        yield block
+                # Keep the last line of one member apart from the first line of the next
+                if not last.endswith(b"\n"):
+                    yield b"\n"
+        return
+    opener = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}[kind]
+    with opener(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+_END = object()
+
+
+class _PrefetchedBlocks:
+    """
+    Block iterator fed by a worker thread that stays at most max_blocks ahead.
+
+    zlib, bz2 and lzma release the GIL while decompressing, so several
+    archives can be decompressed on different cores while lines are split
+    and parsed on the main thread.
+    """
+
+    def __init__(self, blocks, executor, max_blocks=PREFETCH_BLOCKS):
+        self.buffer = queue.Queue(max_blocks)
+        self.stop = threading.Event()
+        self.done = False
+        executor.submit(self._produce, blocks)
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, blocks):
+        try:
+            for block in blocks:
+                if not self._put(block):
+                    return
+            self._put(_END)
+        except Exception as e:
+            # Handed to the reader, which raises it
+            self._put(e)
+        finally:
+            blocks.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.done:
+            raise StopIteration
+        item = self.buffer.get()
+        if item is _END:
+            self.done = True
+            raise StopIteration
+        if isinstance(item, Exception):
+            self.done = True
+            raise item
+        return item
+
+    def close(self):
+        """Stop the worker, e.g. when the reader stops early."""
+        self.done = True
+        self.stop.set()
+
+
+def _iter_block_lines(blocks):
+    """Split decompressed blocks into (raw line, decompressed offset after the line)."""
+    pending = b""
+    offset = 0
+    cut = None
+    for block in blocks:
+        data = pending + block if pending else block
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end == -1:
+                break
+            if cut is not None:
+                # End of an over-long line: emit its head with the line ending
+                line = cut + b"\n"
+                cut = None
+            else:
+                line = data[start:end + 1]
+                if len(line) > MAX_LINE_BYTES:
+                    line = line[:MAX_LINE_BYTES - 1] + b"\n"
+            offset += end + 1 - start
+            yield line, offset
+            start = end + 1
+        pending = data[start:]
+        if len(pending) > MAX_LINE_BYTES:
+            # Cut over-long lines instead of buffering them
+            if cut is None:
+                cut = pending[:MAX_LINE_BYTES - 1]
+            offset += len(pending)
+            pending = b""
+    if cut is not None or pending:
+        offset += len(pending)
+        yield (cut if cut is not None else pending), offset
+
+
+def _iter_archive_lines(path, kind, blocks, block_size, state=None):
+    """
+    Yield (raw line, offset) from an archive.
+
+    In incremental mode an archive that is a compressed copy of a log file
+    read earlier (log rotation) continues after the last line read from it,
+    headed by the #Fields line of the archive with an offset of None.
+    """
+    if state is None:
+        yield from _iter_block_lines(blocks)
+        return
+
+    # Look at the start of the data to recognise a rotated log file
+    head_blocks = []
+    head = b""
+    for block in blocks:
+        head_blocks.append(block)
+        head += block
+        if len(head) >= state.head_bytes:
+            break
+    skip_to, last_line_hash = state.archive_resume(path, head[:state.head_bytes])
+    lines = _iter_block_lines(_chain_blocks(head_blocks, blocks))
+    if skip_to:
+        header = _leading_header_of(head.splitlines(keepends=True))
+        if header is not None:
+            yield header, None
+        for raw, offset in lines:
+            if offset < skip_to:
+                continue
+            if offset > skip_to or not state.line_matches(raw, last_line_hash):
+                logging.info("Archive %s does not match the earlier read position, reading from the start", path)
+                lines = _iter_block_lines(_iter_archive_blocks(path, kind, block_size))
+            break
+    yield from lines
+
+
+def _chain_blocks(head_blocks, blocks):
+    for block in head_blocks:
+        yield block
+    for block in blocks:
+        yield block
+
+
+def _leading_header_of(raw_lines):
+    """Return the last #Fields line of the directive block that raw_lines start with, or None."""
+    header = None
+    for raw in raw_lines:
+        if not raw.startswith(b"#"):
+            break
+        if raw.startswith(b"#Fields:"):
+            header = raw
+    return header
+
+
+def leading_header(path, buffer_size=1024 * 1024):
+    """
+    Return the #Fields line at the top of a plain log file, or None.
+
+    A read that starts in the middle of a file (an incremental run, a byte
+    range) parses its lines with this header.
+
+    Args:
+        path (Path): Log file
+        buffer_size (int): Read buffer size in bytes
+
+    Returns:
+        bytes | None: Raw #Fields line including its line ending
+    """
+    return _leading_header_of(raw for raw, _ in _iter_buffered_lines(path, buffer_size))
+
+
+def iter_file_lines(path, kind=None, buffer_size=1024 * 1024, use_mmap=False, start=0):
+    """
+    Stream the raw lines of one log file or archive.
+
+    Args:
+        path (Path): Log file
+        kind (str): Compression from detect_compression(), None for plain text
+        buffer_size (int): Read buffer size in bytes
+        use_mmap (bool): Read plain files through mmap instead of buffered reads
+        start (int): Byte offset to start from (plain files only)
+
+    Yields:
+        bytes: Raw line including its line ending
+    """
+    if kind is not None:
+        raw_lines = _iter_block_lines(_iter_archive_blocks(path, kind, buffer_size))
+    elif use_mmap:
+        raw_lines = _iter_mmap_lines(path, start)
+    else:
+        raw_lines = _iter_buffered_lines(path, buffer_size, start)
+    for raw, _ in raw_lines:
+        yield raw
+
+
+def iter_log_lines(log_dir, buffer_size=1024 * 1024, use_mmap=False, stats=None, state=None, decompress_workers=2):
+    """
+    Stream lines from every log file without loading whole files into memory.
+
+    Compressed files (.gz, .bz2, .xz, .zip, or detected by magic bytes) are
+    decompressed as a stream; up to decompress_workers of them are decompressed
+    ahead in parallel on worker threads while earlier files are being read.
+
+    Args:
+        log_dir (Path): Directory containing log files
+        buffer_size (int): Read buffer size in bytes
+        use_mmap (bool): Read files through mmap instead of buffered reads
+        stats (dict): Optional dict updated with files/lines/bytes_read counters
+        state (IncrementalState): If given, only lines added since the last run are read,
+            and the state is advanced as lines are consumed
+        decompress_workers (int): Archives decompressed in parallel
+
+    Yields:
+        str: Decoded log line without the trailing newline; the first line read from
+            each file is a log_parser.FileStart. A file read from the middle starts with
+            its #Fields line (not counted in stats), so its records keep their fields
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("files", 0)
+    stats.setdefault("lines", 0)
+    stats.setdefault("bytes_read", 0)
+
+    files = []
+    for path in find_log_files(log_dir):
+        try:
+            files.append((path, detect_compression(path)))
+        except OSError as e:
+            logging.warning("Skipping unreadable log file %s: %s", path, e)
+    kinds = dict(files)
+    archives = [path for path, kind in files if kind is not None]
+    executor = ThreadPoolExecutor(max_workers=max(1, decompress_workers)) if archives else None
+    prefetched = {}
+    current_blocks = None
+    next_archive = 0
+
+    try:
+        for path, kind in files:
+            stats["files"] += 1
+            try:
+                if kind is None:
+                    start = state.resume_offset(path) if state is not None else 0
+                    raw_lines = _iter_mmap_lines(path, start) if use_mmap else _iter_buffered_lines(path, buffer_size, start)
+                    header = leading_header(path, buffer_size) if start else None
+                    if header is not None:
+                        raw_lines = itertools.chain([(header, None)], raw_lines)
+                else:
+                    # Start decompressing this archive and the next few in the background
+                    while next_archive < len(archives) and len(prefetched) < max(1, decompress_workers):
+                        upcoming = archives[next_archive]
+                        next_archive += 1
+                        if state is not None and state.archive_seen(upcoming):
+                            continue
+                        prefetched[upcoming] = _PrefetchedBlocks(
+                            _iter_archive_blocks(upcoming, kinds[upcoming], buffer_size), executor
+                        )
+                    current_blocks = prefetched.pop(path, None)
+                    if current_blocks is None:
+                        # Already read completely in an earlier incremental run
+                        continue
+                    stats["archives"] = stats.get("archives", 0) + 1
+                    raw_lines = _iter_archive_lines(path, kind, current_blocks, buffer_size, state)
+                first = True
+                for raw, offset in raw_lines:
+                    if offset is None:
+                        # The #Fields line of a file read from the middle: parsed, not counted
+                        line = FileStart(raw.decode("utf-8", errors="ignore").rstrip("\r\n"))
+                        first = False
+                        yield line
+                        continue
+                    if state is not None and kind is None:
+                        if not raw.endswith(b"\n"):
+                            # Line still being written; pick it up on the next run
+                            break
+                        state.advance(path, offset, raw)
+                    stats["lines"] += 1
+                    stats["bytes_read"] += len(raw)
+                    line = raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+                    if first:
+                        # Parsers forget the previous file's #Fields header here
+                        line = FileStart(line)
+                        first = False
+                    yield line
+                if state is not None and kind is not None:
+                    state.archive_done(path)
+            except ARCHIVE_ERRORS as e:
+                logging.warning("Skipping unreadable log file %s: %s", path, e)
+            finally:
+                if current_blocks is not None:
+                    current_blocks.close()
+                    current_blocks = None
+    finally:
+        for blocks in prefetched.values():
+            blocks.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def collect_log_text(lines, max_bytes, stats=None):
+    """
+    Join streamed lines into one text block, stopping at the memory ceiling.
+
+    Args:
+        lines (iterable): Stream of log lines
+        max_bytes (int): Maximum UTF-8 encoded size of the returned text (0 = unlimited)
+        stats (dict): Optional dict updated with characters/truncated fields
+
+    Returns:
+        str: Log text, at most max_bytes bytes long once encoded
+    """
+    if stats is None:
+        stats = {}
+
+    parts = []
+    size = 0
+    truncated = False
+    for line in lines:
+        # The limit is in bytes: non-ASCII characters take more than one
+        line_size = len(line.encode("utf-8")) + 1
+        if max_bytes and size + line_size > max_bytes:
+            truncated = True
+            break
+        parts.append(line)
+        size += line_size
+
+    text = "\n".join(parts)
+    stats["total_characters"] = len(text)
+    stats["truncated"] = truncated
+    if truncated:
+        logging.warning("Log input exceeded memory limit of %s bytes, remaining lines were skipped", max_bytes)
+    return text
@@ -0,0 +1,250 @@
+"""
+Streaming log template mining (Drain-style) to collapse repetitive log lines
+"""
+
+import json
+from collections import OrderedDict
+
+from aggregator import LogAggregator, format_summary_block
+from log_parser import PLAIN_FIELDS, parse_batches
+
+# Placeholder for variable parts of a template
+WILDCARD = "<*>"
+
+# Fields combined into the message that is mined for W3C records (IPs, byte counts and timestamps are left out)
+MESSAGE_FIELDS = ("x-severity", "x-category", "x-event", "x-ctx", "x-comment")
+
+
+def _is_variable(token):
+    """Tokens containing digits (IDs, IPs, sizes, times) are treated as parameters up front."""
+    return any(char.isdigit() for char in token)
+
+
+class LogCluster:
+    """One template: its tokens, occurrence count, first/last timestamps and example parameter values"""
+
+    __slots__ = ("cluster_id", "tokens", "count", "first_seen", "last_seen", "examples", "leaf")
+
+    def __init__(self, cluster_id, tokens, leaf):
+        self.cluster_id = cluster_id
+        self.tokens = tokens
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.examples = {}
+        self.leaf = leaf
+
+    @property
+    def template(self):
+        return " ".join(self.tokens)
+
+    def to_dict(self):
+        return {
+            "template": self.template,
+            "count": self.count,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "examples": {str(position): values for position, values in sorted(self.examples.items())}
+        }
+
+
+class TemplateMiner:
+    """
+    Incremental Drain-style template miner.
+
+    Lines are routed through a fixed-depth prefix tree (token count, then the
+    first few tokens) to a small list of candidate templates, and join the
+    most similar one or start a new one. The number of templates is capped;
+    when the cap is reached the least recently used template is evicted, so
+    memory stays bounded on arbitrarily large inputs.
+    """
+
+    def __init__(self, similarity=0.5, depth=4, max_children=100, max_clusters=1000, max_examples=3):
+        self.similarity = similarity
+        self.depth = depth
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self.max_examples = max_examples
+        self.root = {}
+        self.clusters = OrderedDict()
+        self.next_id = 1
+        self.stats = {"lines": 0, "templates_created": 0, "templates_evicted": 0, "evicted_lines": 0}
+
+    def _leaf_for(self, tokens):
+        """Find or create the leaf list of clusters for a token sequence."""
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth]:
+            key = WILDCARD if _is_variable(token) else token
+            if key not in node:
+                if len(node) >= self.max_children:
+                    key = WILDCARD
+                node = node.setdefault(key, {})
+            else:
+                node = node[key]
+        return node.setdefault(None, [])
+
+    def _best_match(self, leaf, tokens):
+        best = None
+        best_score = (-1.0, -1)
+        for cluster_id in leaf:
+            cluster = self.clusters[cluster_id]
+            same = 0
+            wildcards = 0
+            for template_token, token in zip(cluster.tokens, tokens):
+                if template_token == WILDCARD:
+                    wildcards += 1
+                elif template_token == token:
+                    same += 1
+            # Most matching tokens wins, ties go to the more general template
+            score = ((same + wildcards) / len(tokens), wildcards)
+            if score > best_score:
+                best, best_score = cluster, score
+        if best is not None and best_score[0] >= self.similarity:
+            return best
+        return None
+
+    def _evict(self):
+        _, cluster = self.clusters.popitem(last=False)
+        cluster.leaf.remove(cluster.cluster_id)
+        self.stats["templates_evicted"] += 1
+        self.stats["evicted_lines"] += cluster.count
+
+    def add(self, message, timestamp=None):
+        """
+        Add one log message to the template table.
+
+        Args:
+            message (str): Log message
+            timestamp (str): Optional 'date time' of the line
+
+        Returns:
+            LogCluster | None: Template the message was assigned to (None for empty messages)
+        """
+        tokens = message.split()
+        if not tokens:
+            return None
+        self.stats["lines"] += 1
+
+        leaf = self._leaf_for(tokens)
+        cluster = self._best_match(leaf, tokens)
+        if cluster is None:
+            template = [WILDCARD if _is_variable(token) else token for token in tokens]
+            cluster = LogCluster(self.next_id, template, leaf)
+            self.next_id += 1
+            self.clusters[cluster.cluster_id] = cluster
+            leaf.append(cluster.cluster_id)
+            self.stats["templates_created"] += 1
+            if len(self.clusters) > self.max_clusters:
+                self._evict()
+        else:
+            cluster.tokens = [
+                template_token if template_token == token else WILDCARD
+                for template_token, token in zip(cluster.tokens, tokens)
+            ]
+            self.clusters.move_to_end(cluster.cluster_id)
+
+        cluster.count += 1
+        if timestamp:
+            if cluster.first_seen is None or timestamp < cluster.first_seen:
+                cluster.first_seen = timestamp
+            if cluster.last_seen is None or timestamp > cluster.last_seen:
+                cluster.last_seen = timestamp
+        for position, (template_token, token) in enumerate(zip(cluster.tokens, tokens)):
+            if template_token == WILDCARD:
+                values = cluster.examples.setdefault(position, [])
+                if len(values) < self.max_examples and token not in values:
+                    values.append(token)
+        return cluster
+
+    def templates(self, top_n=None):
+        """
+        Return the templates ordered by occurrence count.
+
+        Args:
+            top_n (int): Maximum number of templates returned (None = all)
+
+        Returns:
+            list: Template dictionaries
+        """
+        ordered = sorted(self.clusters.values(), key=lambda cluster: cluster.count, reverse=True)
+        if top_n is not None:
+            ordered = ordered[:top_n]
+        return [cluster.to_dict() for cluster in ordered]
+
+
+def record_message(schema, values):
+    """
+    Build the text mined for one parsed record.
+
+    Args:
+        schema (FieldSchema): Record schema
+        values (tuple): Record values
+
+    Returns:
+        str: Message text
+    """
+    if schema.names == PLAIN_FIELDS:
+        return values[-1]
+    parts = []
+    for name in MESSAGE_FIELDS:
+        position = schema.index.get(name)
+        if position is not None and values[position] is not None:
+            parts.append(values[position])
+    return " ".join(parts)
+
+
+def format_template_block(templates, total_lines):
+    """
+    Render the template table as the compact text block used in prompts.
+
+    Args:
+        templates (list): Output of TemplateMiner.templates()
+        total_lines (int): Number of lines mined
+
+    Returns:
+        str: Prompt text
+    """
+    rows = [
+        json.dumps(template, separators=(",", ":"), ensure_ascii=False)
+        for template in templates
+    ]
+    return (
+        f"LOG TEMPLATES ({len(templates)} most frequent of {total_lines} lines; {WILDCARD} marks variable values, "
+        "examples lists sample values by token position):\n" + "\n".join(rows)
+    )
+
+
+def build_template_payload(lines, max_templates=100, top_n=5, miner=None, stats=None):
+    """
+    Mine templates and statistics from a log stream in one pass.
+
+    Args:
+        lines (iterable): Stream of log lines
+        max_templates (int): Number of templates included in the payload
+        top_n (int): Number of entries kept in top-N statistics lists
+        miner (TemplateMiner): Miner to use (a new one by default)
+        stats (dict): Optional dict updated with parser and miner counters
+
+    Returns:
+        tuple: (payload text, summary dict, template list)
+    """
+    if miner is None:
+        miner = TemplateMiner()
+    aggregator = LogAggregator()
+    for batch in parse_batches(lines, stats=stats):
+        aggregator.add_batch(batch)
+        schema = batch.schema
+        dates = batch.column("date")
+        times = batch.column("time")
+        for values, date, time_value in zip(zip(*batch.columns), dates, times):
+            timestamp = f"{date} {time_value}" if date and time_value else None
+            miner.add(record_message(schema, values), timestamp)
+
+    if stats is not None:
+        stats["templates"] = len(miner.clusters)
+        stats["templates_evicted"] = miner.stats["templates_evicted"]
+
+    summary = aggregator.summary(top_n)
+    templates = miner.templates(max_templates)
+    payload = format_summary_block(summary) + "\n\n" + format_template_block(templates, miner.stats["lines"])
+    return payload, summary, templates
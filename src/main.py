@@ -1,16 +1,162 @@
 import os
+import sys
 import json
+import logging
+import argparse
 from datetime import datetime
+from pathlib import Path
 
-# Import custom modules
+# Import custom modules (heavy ones, like the OpenAI client, are imported by the commands that need them)
 from config import get_config, check_config
-from ai_analyzer import analyze_logs
+from metrics import export_metrics, profiling, span
 
+COMMANDS = ("analyze", "plan", "watch", "report", "fleet")
 
-def main():
+
+def parse_args(argv=None):
+    """
+    Parse the command and its options.
+    
+    Commands: analyze (default), plan, watch, report and fleet. Options given
+    without a command run an analysis, and the old --plan and --watch flags
+    still select those commands.
+    
+    Args:
+        argv (list): Arguments, defaults to sys.argv
+        
+    Returns:
+        argparse.Namespace: Parsed options; args.command is the command name
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "analyze")
+    
+    cache_options = argparse.ArgumentParser(add_help=False)
+    cache_group = cache_options.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true",
+                             help="Bypass the response cache (do not read or write cached answers)")
+    cache_group.add_argument("--refresh-cache", action="store_true",
+                             help="Ignore cached answers and replace them with fresh ones")
+    incremental_options = argparse.ArgumentParser(add_help=False)
+    incremental_options.add_argument("--incremental", action="store_true",
+                                     help="Only analyze log lines added since the last incremental run")
+    batch_options = argparse.ArgumentParser(add_help=False)
+    batch_options.add_argument("--batch", action="store_true",
+                               help="Submit all requests as one OpenAI Batch API job and wait for it (batch pricing)")
+    resume_options = argparse.ArgumentParser(add_help=False)
+    resume_options.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                                help="Continue an interrupted run (the latest one if RUN_ID is not given): "
+                                     "requests it already finished are not sent again")
+    profile_options = argparse.ArgumentParser(add_help=False)
+    profile_options.add_argument("--profile", nargs="?", const="cprofile", choices=("cprofile", "sample"),
+                                 help="Profile the run with cProfile (default) or a sampling profiler; "
+                                      "the profile is written to the metrics folder")
+    
+    parser = argparse.ArgumentParser(description="Wowza Log Analyzer - Complete Analysis")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    analyze = commands.add_parser("analyze", help="Analyze the logs folder once (default command)",
+                                  parents=[cache_options, incremental_options, batch_options, resume_options, profile_options])
+    # Flags from before commands existed
+    analyze.add_argument("--plan", action="store_true", help=argparse.SUPPRESS)
+    analyze.add_argument("--watch", action="store_true", help=argparse.SUPPRESS)
+    commands.add_parser("plan", help="Only print the projected tokens and cost of a run; nothing is sent to OpenAI",
+                        parents=[incremental_options, batch_options])
+    commands.add_parser("watch", help="Keep running and analyze new log lines as they are written",
+                        parents=[cache_options, batch_options, profile_options])
+    report = commands.add_parser("report", help="Print the summary of a saved results file; nothing is sent to OpenAI")
+    report.add_argument("file", nargs="?", help="Results file (default: the latest one in the results folder)")
+    fleet = commands.add_parser("fleet", help="Analyze the logs of every server in a fleet manifest",
+                                parents=[cache_options, incremental_options, batch_options, resume_options, profile_options])
+    fleet.add_argument("manifest", nargs="?", help="Fleet manifest (default: FLEET_MANIFEST)")
+    
+    args = parser.parse_args(argv)
+    if args.command == "analyze" and args.plan:
+        args.command = "plan"
+    elif args.command == "analyze" and args.watch:
+        args.command = "watch"
+    return args
+
+
+def apply_options(config, args):
+    """
+    Apply command line options to the configuration.
+    
+    Args:
+        config (dict): Configuration from get_config()
+        args (argparse.Namespace): Options from parse_args()
+    """
+    if getattr(args, "no_cache", False):
+        config['cache_mode'] = 'off'
+    elif getattr(args, "refresh_cache", False):
+        config['cache_mode'] = 'refresh'
+    if getattr(args, "incremental", False):
+        config['incremental'] = True
+    if getattr(args, "batch", False):
+        config['batch_mode'] = True
+    if getattr(args, "resume", None):
+        config['resume'] = True
+        config['run_id'] = None if args.resume == "latest" else args.resume
+    if getattr(args, "profile", None):
+        config['profile'] = args.profile
+
+
+def setup_logging(config, verbose=True):
+    """
+    Set up logging for the command; nothing is configured at import time.
+    
+    Args:
+        config (dict): Configuration from get_config()
+        verbose (bool): Log at ANALYZER_LOG_LEVEL to the console and ANALYZER_LOG_FILE (analysis
+            commands); otherwise only warnings are shown, on the console (local commands)
+    """
+    handlers = [logging.StreamHandler()]
+    if verbose and config['log_file']:
+        handlers.append(logging.FileHandler(config['log_file']))
+    logging.basicConfig(
+        level=getattr(logging, config['log_level'], logging.INFO) if verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
+
+
+def main(argv=None):
     """
     Main program - Simple and straightforward approach.
     """
+    args = parse_args(argv)
+    config = get_config()
+    apply_options(config, args)
+    setup_logging(config, verbose=args.command in ("analyze", "watch", "fleet"))
+    
+    if args.command == "plan":
+        # Dry run: needs no API key and does not import the OpenAI client
+        from planner import plan_logs
+        plan_logs(config)
+        return
+    
+    if args.command == "report":
+        report_results(args.file, config['results_folder'])
+        return
+    
+    if args.command == "fleet":
+        print("Wowza Log Analyzer - Fleet Analysis")
+        from fleet import load_manifest
+        manifest = args.manifest or config['fleet_manifest']
+        if not manifest:
+            print("ERROR: No fleet manifest given (argument or FLEET_MANIFEST)")
+            return
+        try:
+            servers = load_manifest(manifest)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return
+        print("\nChecking configuration...")
+        if not check_config([server['logs_folder'] for server in servers]):
+            return
+        with profiling(config['profile'], config['metrics_folder']):
+            run_fleet(config, servers)
+        return
+    
     print("Wowza Log Analyzer - Complete Analysis")
 
     # Check configuration
@@ -18,22 +164,51 @@ def main():
     if not check_config():
         return
     
-    config = get_config()
+    with profiling(config['profile'], config['metrics_folder']):
+        if args.command == "watch":
+            from watcher import watch_logs
+            
+            def on_results(results):
+                save_results(results, config['results_folder'])
+                show_summary(results)
+                export_metrics(config, results.get("run_id"))
+            
+            watch_logs(config, on_results)
+            return
+        
+        run_analysis(config)
+
+
+def run_analysis(config):
+    """
+    Analyze the logs folder once, save and summarize the results, and export the run metrics.
+    
+    Args:
+        config (dict): Configuration from get_config()
+    """
+    from ai_analyzer import analyze_logs
     
     # Run complete analysis (all prompts)
     print("\nStarting complete analysis...")
     print("Running all prompts (simple + detailed)...")
     
-    results = analyze_logs(config['logs_folder'])
+    with span("run", mode=config['log_payload_mode']):
+        results = analyze_logs(config['logs_folder'], config)
+        
+        if results:
+            # Save results
+            print("\nSaving results...")
+            save_results(results, config['results_folder'])
+    
+    export_metrics(config, results.get("run_id") if results else None)
     
     if not results:
-        print("ERROR: Analysis failed!")
+        if config['incremental']:
+            print("No new results to save.")
+        else:
+            print("ERROR: Analysis failed!")
         return
     
-    # Save results
-    print("\nSaving results...")
-    save_results(results, config['results_folder'])
-    
     # Display summary
     print("\nAnalysis Summary:")
     show_summary(results)
@@ -41,28 +216,56 @@ def main():
     print("\nCompleted! Check 'results' folder for details.")
 
 
-def save_results(results, results_folder):
+def run_fleet(config, servers):
+    """
+    Analyze every server of a fleet; each server's results are saved as soon as it is done,
+    followed by the fleet rollup.
+    
+    Args:
+        config (dict): Configuration from get_config()
+        servers (list): Servers from fleet.load_manifest()
+    """
+    from fleet import FLEET_FOLDER, analyze_fleet
+    
+    fleet_folder = os.path.join(config['results_folder'], FLEET_FOLDER)
+    
+    def on_server_results(server, results):
+        save_results(results, os.path.join(fleet_folder, server['name']))
+    
+    print(f"\nStarting fleet analysis ({len(servers)} servers)...")
+    with span("run", mode=config['log_payload_mode']):
+        fleet_results = analyze_fleet(servers, config, on_server_results)
+        print("\nSaving fleet rollup...")
+        save_results(fleet_results, fleet_folder, mode="fleet")
+    export_metrics(config, fleet_results.get("run_id"))
+    
+    print("\nFleet Summary:")
+    show_fleet_summary(fleet_results)
+
+
+def save_results(results, results_folder, mode="complete"):
     """
     Save results to JSON file.
     
     Args:
         results (dict): Analysis results
         results_folder (str): Directory to save results
+        mode (str): 'complete' (one logs folder) or 'fleet' (fleet rollup), part of the file name
     """
     os.makedirs(results_folder, exist_ok=True)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"wowza_analysis_complete_{timestamp}.json"
+    filename = f"wowza_analysis_{mode}_{timestamp}.json"
     filepath = os.path.join(results_folder, filename)
     
     final_data = {
         "timestamp": datetime.now().isoformat(),
-        "mode": "complete",
+        "mode": mode,
         "results": results
     }
     
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
+        with span("save_results"), open(filepath, 'w', encoding='utf-8') as f:
             json.dump(final_data, f, indent=4, ensure_ascii=False, sort_keys=True)
         print(f"  Saved: {filename}")
         print(f"  Location: {filepath}")
@@ -70,6 +273,82 @@ def save_results(results, results_folder):
         print(f"  ERROR saving file: {e}")
 
 
+def report_results(path, results_folder):
+    """
+    Print the summary of a saved results file without running an analysis.
+    
+    Args:
+        path (str): Results file, or None for the latest one in results_folder
+        results_folder (str): Directory with saved results
+        
+    Returns:
+        bool: True if a results file was found and read
+    """
+    if path is None:
+        files = sorted(Path(results_folder).glob("wowza_analysis_complete_*.json"))
+        if not files:
+            print(f"No results found in {results_folder}")
+            return False
+        path = files[-1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ERROR reading results file {path}: {e}")
+        return False
+    
+    results = data.get("results", {})
+    print(f"Results: {path} ({data.get('timestamp', 'unknown time')})")
+    if results.get("run_id"):
+        print(f"  Run ID: {results['run_id']}")
+    for prompt_name, analysis in results.get("analysis_results", {}).items():
+        details = [analysis.get("status", "unknown"), f"{analysis.get('latency_seconds', 0)}s"]
+        if analysis.get("time_to_first_token_seconds") is not None:
+            details.append(f"first token {analysis['time_to_first_token_seconds']}s")
+        if analysis.get("cache_hit"):
+            details.append("cache hit")
+        if analysis.get("resumed"):
+            details.append("resumed")
+        if analysis.get("error"):
+            details.append(str(analysis["error"]))
+        print(f"  {prompt_name}: {', '.join(details)}")
+    cost = results.get("token_summary", {}).get("cost_breakdown", {})
+    if cost:
+        print(f"  Cost USD: ${cost.get('total_cost_usd', 0)} ({cost.get('model_used', 'unknown model')})")
+    show_summary(results)
+    return True
+
+
+def show_fleet_summary(fleet_results):
+    """
+    Display one line per server and the fleet totals.
+    
+    Args:
+        fleet_results (dict): Fleet rollup from fleet.analyze_fleet()
+    """
+    for name, server in fleet_results["servers"].items():
+        details = [server["status"]]
+        if "prompts" in server:
+            details.append(f"{server['prompts_succeeded']}/{server['prompts']} prompts")
+            details.append(f"{server['total_tokens']:,} tokens")
+            details.append(f"${server['cost_usd']}")
+        if server.get("log_errors"):
+            details.append(f"{server['log_errors']} log errors")
+        details.append(f"{server['wall_seconds']}s, queued {server['queue_wait_seconds']}s")
+        if server.get("error"):
+            details.append(server["error"])
+        print(f"  {name}: {', '.join(details)}")
+    
+    token_summary = fleet_results["token_summary"]
+    print(f"  Servers: {fleet_results['servers_succeeded']}/{len(fleet_results['servers'])} fully analyzed"
+          + (f", {fleet_results['servers_partial']} partial" if fleet_results['servers_partial'] else "")
+          + (f", {fleet_results['servers_failed']} failed" if fleet_results['servers_failed'] else ""))
+    print(f"  Total tokens used: {token_summary['total_tokens']:,}")
+    print(f"  Cost USD: ${token_summary['cost_breakdown']['total_cost_usd']}")
+    print(f"  Wall time: {fleet_results['wall_seconds']}s "
+          f"(peak {fleet_results['scheduler']['peak_in_flight']} of {fleet_results['scheduler']['max_concurrency']} requests in flight)")
+
+
 def show_summary(results):
     """
     Display simple summary of analysis results.
@@ -90,9 +369,18 @@ def show_summary(results):
         success_count = sum(1 for a in analyses.values() if a.get("status") == "success")
         
         # Display token usage
-        total_tokens = sum(a.get("tokens_used", 0) for a in analyses.values() if a.get("tokens_used"))
+        token_summary = results.get("token_summary", {})
+        total_tokens = token_summary.get("total_tokens", 0)
         if total_tokens > 0:
             print(f"  Total tokens used: {total_tokens}")
+        cached_tokens = token_summary.get("total_cached_tokens", 0)
+        if cached_tokens > 0:
+            print(f"  Input tokens from prompt cache: {cached_tokens}")
+        
+        # Display cache usage (cache hits cost nothing)
+        cache_hits = token_summary.get("cache_hits", 0)
+        if cache_hits:
+            print(f"  Cache hits: {cache_hits}/{total_count} (served locally, $0)")
     else:
         # Simple analysis results
         analyses = [k for k in results.keys() if not k.startswith("error")]
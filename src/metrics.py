@@ -0,0 +1,310 @@
+"""
+Run instrumentation: timed spans per stage, counters, and their export
+
+Spans and counters are collected in one process-wide registry. After a run
+they are written as a Prometheus textfile (for node_exporter's textfile
+collector) and as an OpenTelemetry (OTLP/JSON) trace file. A run can also be
+profiled with cProfile or a sampling profiler (--profile).
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+SERVICE_NAME = "wowza-log-analyzer"
+METRIC_PREFIX = "wowza_analyzer"
+PROMETHEUS_FILE = "wowza_analyzer.prom"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _random_id(size):
+    """Random hex ID of size bytes (OTLP trace IDs are 16 bytes, span IDs 8)."""
+    return os.urandom(size).hex()
+
+
+class Span:
+    """One timed stage of a run; child spans point to their parent"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name, parent_id, attributes):
+        self.name = name
+        self.span_id = _random_id(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+
+    @property
+    def seconds(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes):
+        """Add attributes to the span (e.g. status or token counts known only at the end)."""
+        self.attributes.update(attributes)
+
+
+class Metrics:
+    """
+    Registry of finished spans, per-stage totals and counters.
+
+    Counters and stage totals are cumulative for the life of the process
+    (Prometheus counters); finished spans are kept until they are exported.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.trace_id = _random_id(16)
+        self.spans = []
+        self.counters = Counter()
+        self.stage_seconds = Counter()
+        self.stage_calls = Counter()
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a stage. Spans opened inside (also in asyncio tasks started inside) become its children.
+
+        Args:
+            name (str): Stage name, e.g. 'build_payload'
+            **attributes: Span attributes, e.g. prompt='main_errors'
+
+        Yields:
+            Span: The open span
+        """
+        parent = _current_span.get()
+        current = Span(name, parent.span_id if parent is not None else None, attributes)
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            current.end_ns = time.time_ns()
+            with self.lock:
+                self.spans.append(current)
+                self.stage_seconds[name] += current.seconds
+                self.stage_calls[name] += 1
+
+    def add(self, name, amount=1):
+        """Increase a counter, e.g. add('tokens_sent', 1200)."""
+        if amount:
+            with self.lock:
+                self.counters[name] += amount
+
+    def stage_summary(self):
+        """Return {stage: {'seconds': total, 'calls': n}} of all finished spans."""
+        with self.lock:
+            return {
+                name: {"seconds": round(seconds, 4), "calls": self.stage_calls[name]}
+                for name, seconds in sorted(self.stage_seconds.items())
+            }
+
+    def format_prometheus(self):
+        """Counters and stage totals in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds_total Time spent in each stage",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds_total counter",
+        ]
+        with self.lock:
+            stage_seconds = sorted(self.stage_seconds.items())
+            stage_calls = dict(self.stage_calls)
+            counters = sorted(self.counters.items())
+        for name, seconds in stage_seconds:
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}')
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_calls_total Number of times each stage ran",
+            f"# TYPE {METRIC_PREFIX}_stage_calls_total counter",
+        ]
+        for name, _ in stage_seconds:
+            lines.append(f'{METRIC_PREFIX}_stage_calls_total{{stage="{name}"}} {stage_calls[name]}')
+        for name, value in counters:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        lines.append(f"# TYPE {METRIC_PREFIX}_last_export_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_last_export_timestamp_seconds {time.time():.3f}")
+        return "\n".join(lines) + "\n"
+
+    def format_trace(self, spans):
+        """Spans as an OTLP/JSON ExportTraceServiceRequest."""
+        def attribute(key, value):
+            if isinstance(value, bool):
+                typed = {"boolValue": value}
+            elif isinstance(value, int):
+                typed = {"intValue": str(value)}
+            elif isinstance(value, float):
+                typed = {"doubleValue": value}
+            else:
+                typed = {"stringValue": str(value)}
+            return {"key": key, "value": typed}
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": METRIC_PREFIX},
+                    "spans": [
+                        dict({
+                            "traceId": self.trace_id,
+                            "spanId": span.span_id,
+                            "name": span.name,
+                            "kind": 1,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [attribute(key, value) for key, value in span.attributes.items()],
+                            "status": {"code": 2, "message": span.attributes["error"]} if "error" in span.attributes else {}
+                        }, **({"parentSpanId": span.parent_id} if span.parent_id else {}))
+                        for span in sorted(spans, key=lambda item: item.start_ns)
+                    ]
+                }]
+            }]
+        }
+
+    def export(self, folder, run_id):
+        """
+        Write the Prometheus textfile and the trace of the spans finished since the last export.
+
+        Args:
+            folder (str): Output folder
+            run_id (str): Name of the trace file (trace_<run_id>.json)
+
+        Returns:
+            tuple: (Prometheus file path, trace file path)
+        """
+        os.makedirs(folder, exist_ok=True)
+        with self.lock:
+            spans, self.spans = self.spans, []
+        prometheus_path = Path(folder) / PROMETHEUS_FILE
+        # Written to a temporary file and renamed, so the collector never reads a partial file
+        temporary = prometheus_path.with_suffix(".prom.tmp")
+        temporary.write_text(self.format_prometheus(), encoding="utf-8")
+        os.replace(temporary, prometheus_path)
+        trace_path = Path(folder) / f"trace_{run_id}.json"
+        trace_path.write_text(json.dumps(self.format_trace(spans)), encoding="utf-8")
+        # Next run (watch mode) gets its own trace
+        self.trace_id = _random_id(16)
+        return prometheus_path, trace_path
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry."""
+    return _metrics
+
+
+def span(name, **attributes):
+    """Time a stage in the process-wide registry (see Metrics.span)."""
+    return _metrics.span(name, **attributes)
+
+
+def count(name, amount=1):
+    """Increase a counter in the process-wide registry."""
+    _metrics.add(name, amount)
+
+
+def export_metrics(config, run_id=None):
+    """
+    Export the collected metrics to config['metrics_folder'] (no-op when METRICS_ENABLED is off).
+
+    Args:
+        config (dict): Configuration from get_config()
+        run_id (str): Name of the trace file, defaults to the current time
+    """
+    if not config['metrics_enabled']:
+        return
+    try:
+        prometheus_path, trace_path = _metrics.export(config['metrics_folder'], run_id or time.strftime("%Y%m%d_%H%M%S"))
+        logging.info("Metrics written to %s and %s", prometheus_path, trace_path)
+    except OSError as e:
+        logging.warning("Could not write metrics: %s", e)
+
+
+class SamplingProfiler:
+    """Samples the main thread's stack on a CPU-time timer; writes collapsed stacks for flame graphs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, samples in self.samples.most_common():
+                f.write(f"{stack} {samples}\n")
+
+
+@contextlib.contextmanager
+def profiling(mode, folder):
+    """
+    Profile the enclosed code.
+
+    'cprofile' writes profile_<time>.prof (open with pstats or snakeviz) and
+    prints the top functions by cumulative time; 'sample' samples the stack
+    every 5 ms of CPU time and writes profile_<time>.folded (input for
+    flamegraph.pl or speedscope). Worker processes are not profiled.
+
+    Args:
+        mode (str): None, 'cprofile' or 'sample'
+        folder (str): Output folder
+    """
+    if not mode:
+        yield
+        return
+    os.makedirs(folder, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    if mode == "sample":
+        if not hasattr(signal, "setitimer"):
+            print("  Sampling profiler needs setitimer (not available on this platform), profiling disabled")
+            yield
+            return
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = Path(folder) / f"profile_{stamp}.folded"
+            profiler.write(path)
+            print(f"\nProfile ({sum(profiler.samples.values())} samples): {path}")
+        return
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = Path(folder) / f"profile_{stamp}.prof"
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(20)
+        print(f"\nProfile: {path}\n{report.getvalue()}")
@@ -0,0 +1,155 @@
+"""
+Run-scoped OpenAI clients with keep-alive connection pooling
+
+openai and httpx are imported when the first client is created, not at import.
+"""
+
+import asyncio
+
+
+def _build_limits(config):
+    """Connection pool limits from configuration."""
+    import httpx
+    return httpx.Limits(
+        max_connections=config['max_connections'],
+        max_keepalive_connections=config['max_keepalive_connections'],
+        keepalive_expiry=config['keepalive_expiry']
+    )
+
+
+def _build_timeout(config):
+    """Request timeout from configuration (OPENAI_TIMEOUT, with a separate connect timeout)."""
+    import httpx
+    return httpx.Timeout(config['timeout'], connect=config['connect_timeout'])
+
+
+def create_client(config, max_retries=0):
+    """
+    Create one OpenAI client to be shared by every request in a run.
+
+    The underlying HTTP client keeps connections (and TLS sessions) alive
+    between requests, so only the first request pays for connection setup.
+    Prompt requests are retried by the RequestScheduler, so the SDK's own
+    retries are off unless max_retries is given.
+
+    Args:
+        config (dict): Configuration from get_config()
+        max_retries (int): Retries done by the SDK itself
+
+    Returns:
+        openai.OpenAI: Client; call close() when the run is finished
+    """
+    import httpx
+    import openai
+    timeout = _build_timeout(config)
+    http_client = httpx.Client(limits=_build_limits(config), timeout=timeout)
+    return openai.OpenAI(
+        api_key=config['api_key'],
+        base_url=config['base_url'],
+        timeout=timeout,
+        max_retries=max_retries,
+        http_client=http_client
+    )
+
+
+def create_async_client(config, max_retries=0):
+    """
+    Create one AsyncOpenAI client to be shared by every request in a run.
+
+    Args:
+        config (dict): Configuration from get_config()
+        max_retries (int): Retries done by the SDK itself
+
+    Returns:
+        openai.AsyncOpenAI: Client; await close() when the run is finished
+    """
+    import httpx
+    import openai
+    timeout = _build_timeout(config)
+    http_client = httpx.AsyncClient(limits=_build_limits(config), timeout=timeout)
+    return openai.AsyncOpenAI(
+        api_key=config['api_key'],
+        base_url=config['base_url'],
+        timeout=timeout,
+        max_retries=max_retries,
+        http_client=http_client
+    )
+
+
+class LazyClient:
+    """
+    Client that is only created when a request is sent.
+
+    A run whose requests are all answered from the response cache (or resumed)
+    then never imports openai or opens a connection.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+
+    def __getattr__(self, name):
+        if self._client is None:
+            self._client = self._factory()
+        return getattr(self._client, name)
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+
+class LazyAsyncClient(LazyClient):
+    """Async version of LazyClient; await close() when the run is finished."""
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+
+
+class ClientSession:
+    """
+    The clients and event loop shared by the runs of one session.
+
+    A single analysis opens its own session; watch mode keeps one for all its
+    cycles, so connections stay open from one cycle to the next. The async
+    client is bound to the event loop it first ran on, which is why every
+    coroutine of the session runs on the session's loop (see run()).
+
+    Usage:
+        with ClientSession(config) as session:
+            results = session.run(run_prompts_async(session.async_client, prompts, logs_content, config))
+    """
+
+    def __init__(self, config):
+        self.client = LazyClient(lambda: create_client(config))
+        self.async_client = LazyAsyncClient(lambda: create_async_client(config))
+        # asyncio.Runner (Python 3.11+) creates its loop on the first run
+        self._runner = asyncio.Runner() if hasattr(asyncio, "Runner") else None
+        self._loop = None
+
+    def run(self, coroutine):
+        """Run a coroutine to completion on the session's event loop."""
+        if self._runner is not None:
+            return self._runner.run(coroutine)
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    def close(self):
+        """Close the clients and the event loop."""
+        try:
+            self.client.close()
+            if self.async_client._client is not None:
+                self.run(self.async_client.close())
+        finally:
+            if self._runner is not None:
+                self._runner.close()
+            elif self._loop is not None:
+                self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+                self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,224 @@
+"""
+Parallel log ingestion: parse and aggregate log files on a process pool
+
+Every worker reads one file, one archive or one byte range of a large file,
+and sends back only a LogAggregator and a LogSampler (counters and a few
+sample rows), never log text. The main process merges the parts in file
+order, so the result is the same as a single sequential pass.
+"""
+
+import itertools
+import logging
+import os
+from pathlib import Path
+
+from aggregator import LogAggregator, LogSampler
+from log_parser import FileStart, parse_batches
+from log_reader import (ARCHIVE_ERRORS, MAX_LINE_BYTES, detect_compression, find_log_files,
+                        leading_header, _iter_archive_blocks, _iter_block_lines, _iter_buffered_lines,
+                        _iter_mmap_lines)
+
+# Reader and parser counters added up over all parts
+PART_COUNTERS = ("lines", "bytes_read", "records", "plain_lines", "directives", "blank_lines")
+
+
+class LogPart:
+    """A unit of work: a whole log file or archive, or the byte range [start, end) of a plain file"""
+
+    __slots__ = ("path", "kind", "start", "end", "size")
+
+    def __init__(self, path, kind, start=0, end=None, size=0):
+        self.path = path
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.size = size
+
+
+def plan_parts(log_dir, split_bytes):
+    """
+    Split the log files into parts for the worker processes.
+
+    Plain files larger than split_bytes are cut into byte ranges of about
+    split_bytes; archives cannot be entered in the middle and stay whole.
+
+    Args:
+        log_dir (Path): Directory containing log files
+        split_bytes (int): Target size of a byte range (0 = never split files)
+
+    Returns:
+        list: LogPart objects in file order
+    """
+    parts = []
+    for path in find_log_files(log_dir):
+        try:
+            kind = detect_compression(path)
+            size = os.stat(path).st_size
+        except OSError as e:
+            logging.warning("Skipping unreadable log file %s: %s", path, e)
+            continue
+        if kind is not None or not split_bytes or size <= split_bytes:
+            parts.append(LogPart(path, kind, size=size))
+            continue
+        for start in range(0, size, split_bytes):
+            end = start + split_bytes
+            parts.append(LogPart(path, None, start, end if end < size else None, min(end, size) - start))
+    return parts
+
+
+def _aligned_start(path, start):
+    """Return the offset of the first line that starts at or after start."""
+    if not start:
+        return 0
+    with open(path, "rb") as f:
+        f.seek(start - 1)
+        # Finish the line that the previous range started
+        while True:
+            rest = f.readline(MAX_LINE_BYTES)
+            if not rest or rest.endswith(b"\n"):
+                return f.tell()
+
+
+def _iter_part_lines(part, buffer_size, use_mmap):
+    """Yield the raw lines of a part: the lines of its file that start inside its byte range."""
+    if part.kind is not None:
+        yield from (raw for raw, _ in _iter_block_lines(_iter_archive_blocks(part.path, part.kind, buffer_size)))
+        return
+    start = _aligned_start(part.path, part.start)
+    raw_lines = _iter_mmap_lines(part.path, start) if use_mmap else _iter_buffered_lines(part.path, buffer_size, start)
+    for raw, offset in raw_lines:
+        if part.end is not None and start >= part.end:
+            return
+        yield raw
+        start = offset
+
+
+def _first_file_line(lines):
+    """Yield the lines, the first one marked as log_parser.FileStart."""
+    for line in lines:
+        yield FileStart(line)
+        break
+    yield from lines
+
+
+def ingest_part(part, buffer_size=1024 * 1024, use_mmap=False, sample_lines=200):
+    """
+    Parse and aggregate one part; runs in a worker process.
+
+    The part starts over with the default fields, like the sequential stream
+    does at each file. A byte range after the start of its file is parsed with
+    the #Fields header found at the top of the file, until it reaches a header
+    of its own.
+
+    Args:
+        part (LogPart): File, archive or byte range to read
+        buffer_size (int): Read buffer size in bytes
+        use_mmap (bool): Read plain files through mmap instead of buffered reads
+        sample_lines (int): Maximum number of sample rows kept
+
+    Returns:
+        tuple: (LogAggregator, LogSampler, counters dict)
+    """
+    aggregator = LogAggregator()
+    sampler = LogSampler(sample_lines)
+    stats = {"lines": 0, "bytes_read": 0}
+
+    def lines():
+        try:
+            for raw in _iter_part_lines(part, buffer_size, use_mmap):
+                stats["lines"] += 1
+                stats["bytes_read"] += len(raw)
+                yield raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+        except ARCHIVE_ERRORS as e:
+            logging.warning("Skipping unreadable log file %s: %s", part.path, e)
+
+    stream = lines()
+    header = None
+    if part.start:
+        try:
+            header = leading_header(part.path, buffer_size)
+        except OSError as e:
+            logging.warning("Skipping unreadable log file %s: %s", part.path, e)
+            return aggregator, sampler, stats
+        if header is not None:
+            stream = itertools.chain([FileStart(header.decode("utf-8", errors="ignore").rstrip("\r\n"))], stream)
+    if header is None:
+        stream = _first_file_line(stream)
+
+    parser_stats = {}
+    for batch in parse_batches(stream, stats=parser_stats):
+        aggregator.add_batch(batch)
+        sampler.add_batch(batch)
+    if header is not None:
+        # The borrowed header is not a line of this range
+        parser_stats["directives"] -= 1
+    stats.update(parser_stats)
+    return aggregator, sampler, stats
+
+
+def _process_context():
+    """
+    Start method of the worker processes: forkserver where available, spawn otherwise.
+
+    Forking copies the whole process, but only the calling thread; a lock held
+    by another thread (fleet servers, decompression prefetch, HTTP clients)
+    at that moment stays locked forever in the child.
+    """
+    import multiprocessing
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def aggregate_logs_parallel(log_dir, workers, split_bytes, buffer_size=1024 * 1024, use_mmap=False,
+                            sample_lines=200, stats=None):
+    """
+    Parse and aggregate all log files on a pool of worker processes.
+
+    Parts are handed out largest first so one big archive does not finish
+    last, and merged back in file order.
+
+    Args:
+        log_dir (Path): Directory containing log files
+        workers (int): Number of worker processes
+        split_bytes (int): Target size of a byte range of a large plain file
+        buffer_size (int): Read buffer size in bytes
+        use_mmap (bool): Read plain files through mmap instead of buffered reads
+        sample_lines (int): Maximum number of sample rows kept
+        stats (dict): Optional dict updated with files/archives/lines/bytes_read
+            and parser counters
+
+    Returns:
+        tuple: (LogAggregator, LogSampler)
+    """
+    if stats is None:
+        stats = {}
+    parts = plan_parts(Path(log_dir), split_bytes)
+    stats["files"] = len({part.path for part in parts})
+    archives = sum(1 for part in parts if part.kind is not None)
+    if archives:
+        stats["archives"] = archives
+    for name in PART_COUNTERS:
+        stats.setdefault(name, 0)
+
+    if workers <= 1 or len(parts) <= 1:
+        results = [ingest_part(part, buffer_size, use_mmap, sample_lines) for part in parts]
+    else:
+        # Imported here: multiprocessing is only needed when there is more than one part
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(parts)), mp_context=_process_context()) as executor:
+            order = sorted(range(len(parts)), key=lambda index: -parts[index].size)
+            futures = {
+                index: executor.submit(ingest_part, parts[index], buffer_size, use_mmap, sample_lines)
+                for index in order
+            }
+            results = [futures[index].result() for index in range(len(parts))]
+    stats["workers"] = min(workers, len(parts)) if parts else 0
+
+    aggregator = LogAggregator()
+    sampler = LogSampler(sample_lines)
+    for part_aggregator, part_sampler, part_stats in results:
+        aggregator.merge(part_aggregator)
+        sampler.merge(part_sampler)
+        for name in PART_COUNTERS:
+            stats[name] += part_stats.get(name, 0)
+    return aggregator, sampler
@@ -0,0 +1,232 @@
+"""
+Assembly of the log payload sent to the prompts
+"""
+
+import itertools
+from collections import Counter
+from pathlib import Path
+
+from log_parser import detect_severity
+from log_reader import iter_log_lines, collect_log_text
+from chunking import iter_chunks
+from aggregator import build_summary_payload, format_summary_payload
+from log_templates import TemplateMiner, build_template_payload
+from log_index import LogIndex, build_retrieval_payload
+from parallel_ingest import aggregate_logs_parallel
+from time_windows import iter_time_windows
+
+
+class LogPayload:
+    """
+    Log data prepared for the prompts.
+
+    content holds the text sent with every prompt. When the raw logs are too
+    big for one request, chunks is a stream of chunks (starting with content)
+    to be analyzed one by one and merged. Retrieval payloads are different for
+    every prompt: contexts maps each prompt to its text and content is empty.
+    """
+
+    def __init__(self, content, chunks=None, info=None, summary=None, templates=None, contexts=None):
+        self.content = content
+        self.chunks = chunks
+        self.contexts = contexts
+        self.info = info if info is not None else {}
+        self.summary = summary
+        self.templates = templates
+
+
+def count_severities(lines, counts):
+    """
+    Pass a stream of raw lines through, counting the severity of every log line.
+
+    Raw payloads are not parsed; this gives them the severity counts that the
+    other payload modes get from parsing, complete once the stream is read.
+
+    Args:
+        lines (iterable): Stream of log lines
+        counts (Counter): Severity -> number of lines, updated as lines go by
+
+    Yields:
+        str: The same lines
+    """
+    for line in lines:
+        if line and not line.startswith("#"):
+            counts[detect_severity(line) or "UNKNOWN"] += 1
+        yield line
+
+
+def build_log_payload(logs_folder, config, state=None, sample_step=1, line_filter=None, prompt_queries=None):
+    """
+    Stream the log files and build the payload for the configured LOG_PAYLOAD_MODE.
+
+    Only local work is done here (reading, parsing, counting); nothing is sent
+    over the network.
+
+    Args:
+        logs_folder (str): Path to directory containing log files
+        config (dict): Configuration from get_config()
+        state (IncrementalState): If given, only lines added since the last run are read
+        sample_step (int): Keep only every sample_step-th line (1 = all lines)
+        line_filter (LineFilter): Pre-filter applied to raw payloads; its counters are
+            added to payload.info['filter'] as the lines are consumed
+        prompt_queries (dict): Prompt name -> retrieval query of the prompts of a
+            retrieval payload (see WowzaAnalysisPrompts.get_prompt_queries)
+
+    Returns:
+        LogPayload: Prepared payload; payload.info holds the read statistics and, in
+            every mode, the severity counts of the lines read ('severities')
+    """
+    logs_info = {}
+    if config['log_payload_mode'] == 'retrieval':
+        # Index the lines added since the last run, then search the whole index for each prompt
+        with LogIndex(config['log_index_file'], logs_folder) as index:
+            logs_info['lines_indexed'] = index.update(config, stats=logs_info)
+            # Incremental runs only see the lines indexed since their last successful run
+            first_id = index.analyzed_id(state.path) + 1 if state is not None else 1
+            contexts, overview, reports = build_retrieval_payload(index, prompt_queries or {}, config, first_id)
+            logs_info['index'] = {"file": index.path, "lines": overview['lines'], "last_id": index.last_id(),
+                                  "retrieval": reports}
+        logs_info['lines'] = overview['lines']
+        logs_info['severities'] = overview['severities']
+        logs_info['total_characters'] = sum(len(context) for context in contexts.values())
+        logs_info['truncated'] = False
+        return LogPayload("", info=logs_info, contexts=contexts)
+
+    if config['log_payload_mode'] == 'summary' and state is None and config['log_parse_workers'] > 1:
+        # Parse files, and byte ranges of large files, on a process pool and merge the partial counts
+        aggregator, sampler = aggregate_logs_parallel(
+            Path(logs_folder),
+            workers=config['log_parse_workers'],
+            split_bytes=config['log_split_mb'] * 1024 * 1024,
+            buffer_size=config['log_read_buffer_kb'] * 1024,
+            use_mmap=config['log_use_mmap'],
+            sample_lines=config['log_sample_lines'],
+            stats=logs_info
+        )
+        content, log_summary = format_summary_payload(aggregator, sampler, config['summary_top_n'])
+        logs_info['severities'] = log_summary['severity_distribution']
+        logs_info['total_characters'] = len(content)
+        logs_info['truncated'] = False
+        return LogPayload(content, info=logs_info, summary=log_summary)
+
+    # Stream logs from disk, keeping at most the configured amount in memory
+    lines = iter_log_lines(
+        Path(logs_folder),
+        buffer_size=config['log_read_buffer_kb'] * 1024,
+        use_mmap=config['log_use_mmap'],
+        stats=logs_info,
+        state=state,
+        decompress_workers=config['log_decompress_workers']
+    )
+    if sample_step > 1:
+        # Downsampled to fit the run budget: keep an evenly spaced subset of lines
+        lines = itertools.islice(lines, 0, None, sample_step)
+        logs_info['sample_step'] = sample_step
+
+    if config['log_payload_mode'] == 'summary':
+        # Count locally and send statistics plus a small sample instead of raw logs
+        content, log_summary = build_summary_payload(
+            lines,
+            sample_lines=config['log_sample_lines'],
+            top_n=config['summary_top_n'],
+            stats=logs_info
+        )
+        logs_info['severities'] = log_summary['severity_distribution']
+        logs_info['total_characters'] = len(content)
+        logs_info['truncated'] = False
+        return LogPayload(content, info=logs_info, summary=log_summary)
+
+    if config['log_payload_mode'] == 'templates':
+        # Collapse repetitive lines into templates with counts and example values
+        miner = TemplateMiner(
+            similarity=config['template_similarity'],
+            max_clusters=config['template_max_clusters']
+        )
+        content, log_summary, log_templates = build_template_payload(
+            lines,
+            max_templates=config['log_max_templates'],
+            top_n=config['summary_top_n'],
+            miner=miner,
+            stats=logs_info
+        )
+        logs_info['severities'] = log_summary['severity_distribution']
+        logs_info['total_characters'] = len(content)
+        logs_info['truncated'] = False
+        return LogPayload(content, info=logs_info, summary=log_summary, templates=log_templates)
+
+    logs_info['severities'] = Counter()
+    lines = count_severities(lines, logs_info['severities'])
+    if line_filter is not None:
+        # Only relevant lines (and their context) reach the model
+        logs_info['filter'] = {"description": line_filter.describe()}
+        lines = line_filter.filter(lines, stats=logs_info['filter'])
+
+    if config['chunking_enabled']:
+        chunks = iter_chunks(lines, config['chunk_max_tokens'], stats=logs_info)
+        content = next(chunks, "")
+        second_chunk = next(chunks, None)
+        if second_chunk is None:
+            logs_info['truncated'] = False
+            return LogPayload(content, info=logs_info)
+        # Too big for one request: analyze chunk by chunk and merge (map-reduce)
+        return LogPayload(content, chunks=itertools.chain([content, second_chunk], chunks), info=logs_info)
+
+    content = collect_log_text(lines, config['log_memory_limit_mb'] * 1024 * 1024, stats=logs_info)
+    return LogPayload(content, info=logs_info)
+
+
+def iter_window_payloads(logs_folder, config, state=None, windows=None):
+    """
+    Build one payload per time window, for prompts analyzed window by window.
+
+    Each window is rendered in the configured LOG_PAYLOAD_MODE: its raw lines,
+    or statistics plus a sample or templates computed over the window only
+    (retrieval mode uses statistics, as a window has no query of its own).
+    With chunking enabled, a raw window larger than one chunk is split into
+    parts, one payload each, and its info() gets the number of 'parts' so
+    their answers can be merged back per window. Without chunking, a raw
+    window is cut at the memory limit and its info() records 'truncated' and
+    the number of 'lines_dropped'.
+
+    Args:
+        logs_folder (str): Path to directory containing log files
+        config (dict): Configuration from get_config()
+        state (IncrementalState): If given, only lines added since the last run are read
+        windows (list): Optional list appended with each window's info() as it is built
+
+    Yields:
+        str: Payload text of one window (or one part of it), headed by its time range
+    """
+    for window in iter_time_windows(
+        Path(logs_folder),
+        window_minutes=config['timeline_window_minutes'],
+        buffer_size=config['log_read_buffer_kb'] * 1024,
+        use_mmap=config['log_use_mmap'],
+        state=state
+    ):
+        info = window.info()
+        if config['log_payload_mode'] in ('summary', 'retrieval'):
+            content, _ = build_summary_payload(window.lines, sample_lines=config['log_sample_lines'], top_n=config['summary_top_n'])
+            parts = [content]
+        elif config['log_payload_mode'] == 'templates':
+            miner = TemplateMiner(similarity=config['template_similarity'], max_clusters=config['template_max_clusters'])
+            content, _, _ = build_template_payload(window.lines, max_templates=config['log_max_templates'],
+                                                   top_n=config['summary_top_n'], miner=miner)
+            parts = [content]
+        elif config['chunking_enabled']:
+            parts = list(iter_chunks(window.lines, config['chunk_max_tokens']))
+            if len(parts) > 1:
+                # Too big for one request: the parts are analyzed one by one and merged per window
+                info['parts'] = len(parts)
+        else:
+            stats = {}
+            content = collect_log_text(window.lines, config['log_memory_limit_mb'] * 1024 * 1024, stats=stats)
+            parts = [content]
+            if stats['truncated']:
+                info['truncated'] = True
+                info['lines_dropped'] = len(window.lines) - (content.count("\n") + 1 if content else 0)
+        if windows is not None:
+            windows.append(info)
+        for number, part in enumerate(parts, start=1):
+            heading = f"part {number} of {len(parts)}, " if len(parts) > 1 else ""
+            yield f"TIME WINDOW: {window.label} ({heading}{window.records} records)\n{part}"
@@ -0,0 +1,319 @@
+"""
+Pre-flight token and cost planning with per-run budget enforcement
+
+Nothing in this module talks to the network or imports the OpenAI client, so
+a plan can be printed without an API key.
+"""
+
+import logging
+import math
+import os
+from pathlib import Path
+
+from chunking import CHARS_PER_TOKEN, estimate_tokens
+from incremental import IncrementalState, format_history_block
+from log_index import fts5_available
+from log_reader import ARCHIVE_ERRORS, detect_compression, estimate_uncompressed_size, find_log_files
+from payload import build_log_payload
+from pricing import calculate_cost
+from prompt_graph import LOGS, estimate_input_characters, resolve_inputs
+from prompts import WowzaAnalysisPrompts, build_full_prompt
+
+# Budget actions: stop the run, keep every n-th line, or send statistics instead of raw logs
+BUDGET_ACTIONS = ("abort", "downsample", "summary")
+
+# Largest line sampling step tried when downsampling
+MAX_SAMPLE_STEP = 1000
+
+
+def estimate_raw_characters(logs_folder, state=None):
+    """
+    Estimate the raw log text to be read from file sizes alone (no file is read).
+
+    Compressed archives count with their uncompressed size where the archive
+    records it, and with a typical compression ratio otherwise.
+
+    Args:
+        logs_folder (str): Path to directory containing log files
+        state (IncrementalState): If given, only bytes after the last read position count
+
+    Returns:
+        tuple: (number of files, estimated characters)
+    """
+    files = 0
+    total = 0
+    for path in find_log_files(Path(logs_folder)):
+        try:
+            kind = detect_compression(path)
+            if kind is not None:
+                # Archives are counted in full unless already read in an earlier run
+                if state is None or not state.archive_seen(path):
+                    total += estimate_uncompressed_size(path, kind)
+            else:
+                size = os.stat(path).st_size
+                start = state.resume_offset(path) if state is not None else 0
+                total += max(0, size - start)
+        except ARCHIVE_ERRORS as e:
+            logging.warning("Skipping unreadable log file %s: %s", path, e)
+            continue
+        files += 1
+    return files, total
+
+
+def split_shards(total_characters, config):
+    """
+    Split raw log text into the request-sized shards the analysis would send.
+
+    Args:
+        total_characters (int): Raw log characters
+        config (dict): Configuration from get_config()
+
+    Returns:
+        list: Characters per request
+    """
+    if not config['chunking_enabled']:
+        return [min(total_characters, config['log_memory_limit_mb'] * 1024 * 1024)]
+    chunk_characters = max(1, config['chunk_max_tokens'] * CHARS_PER_TOKEN)
+    shards = [chunk_characters] * (total_characters // chunk_characters)
+    if total_characters % chunk_characters or not shards:
+        shards.append(total_characters % chunk_characters)
+    return shards
+
+
+def plan_run(prompts, shard_sizes, config):
+    """
+    Project tokens and cost of sending every prompt over every shard.
+
+    Input tokens are estimated offline from the text length; output tokens
+    are assumed to be config['plan_output_tokens'] per request. Prompts that
+    build on other prompts' answers are one request each, over the compact
+    upstream answers. The response cache is ignored, so the projection is an
+    upper bound.
+
+    Args:
+        prompts (dict): Prompt name -> prompt text
+        shard_sizes (list): Characters of log data per request
+        config (dict): Configuration from get_config()
+
+    Returns:
+        dict: Plan with per-prompt and total estimates
+    """
+    data_tokens = sum((size + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN for size in shard_sizes)
+    inputs = resolve_inputs(prompts, WowzaAnalysisPrompts.get_prompt_inputs())
+    plan_prompts = {}
+    total_requests = 0
+    total_input = 0
+    total_output = 0
+    for prompt_name, prompt_text in prompts.items():
+        if inputs[prompt_name] == (LOGS,):
+            requests = len(shard_sizes)
+            # Prompt wrapper and instructions are repeated in every request
+            input_tokens = requests * estimate_tokens(build_full_prompt(prompt_text, "")) + data_tokens
+        else:
+            requests = 1
+            input_tokens = estimate_tokens(build_full_prompt(prompt_text, "")) \
+                + estimate_input_characters(inputs[prompt_name], config) // CHARS_PER_TOKEN
+        output_tokens = requests * config['plan_output_tokens']
+        cost = calculate_cost(input_tokens, output_tokens, config['model'], config['batch_mode'])
+        plan_prompts[prompt_name] = {
+            "requests": requests,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": cost['total_cost_usd']
+        }
+        total_requests += requests
+        total_input += input_tokens
+        total_output += output_tokens
+
+    total_cost = calculate_cost(total_input, total_output, config['model'], config['batch_mode'])
+    return {
+        "model": config['model'],
+        "payload_mode": config['log_payload_mode'],
+        "shards": len(shard_sizes),
+        "log_characters": sum(shard_sizes),
+        "prompts": plan_prompts,
+        "total": {
+            "requests": total_requests,
+            "input_tokens": total_input,
+            "output_tokens": total_output,
+            "tokens": total_input + total_output,
+            "cost_usd": total_cost['total_cost_usd']
+        }
+    }
+
+
+def budget_overruns(plan, config):
+    """
+    Compare a plan with the configured per-run budget.
+
+    Args:
+        plan (dict): Output of plan_run()
+        config (dict): Configuration from get_config()
+
+    Returns:
+        list: Human-readable budget violations (empty when within budget)
+    """
+    problems = []
+    total = plan['total']
+    if config['max_run_cost_usd'] and total['cost_usd'] > config['max_run_cost_usd']:
+        problems.append(f"projected cost ${total['cost_usd']} exceeds budget ${config['max_run_cost_usd']}")
+    if config['max_run_tokens'] and total['tokens'] > config['max_run_tokens']:
+        problems.append(f"projected {total['tokens']:,} tokens exceed budget of {config['max_run_tokens']:,}")
+    return problems
+
+
+def downsample_plan(prompts, total_characters, config):
+    """
+    Find the smallest line sampling step that brings a raw run within budget.
+
+    Args:
+        prompts (dict): Prompt name -> prompt text
+        total_characters (int): Raw log characters before sampling
+        config (dict): Configuration from get_config()
+
+    Returns:
+        tuple: (sampling step, plan of the sampled run), or (None, None) if no step fits
+    """
+    step = 2
+    while step <= MAX_SAMPLE_STEP:
+        plan = plan_run(prompts, split_shards(total_characters // step, config), config)
+        if not budget_overruns(plan, config):
+            plan['sample_step'] = step
+            return step, plan
+        # Grow roughly in proportion to the remaining overrun
+        ratio = max(
+            plan['total']['cost_usd'] / config['max_run_cost_usd'] if config['max_run_cost_usd'] else 1.0,
+            plan['total']['tokens'] / config['max_run_tokens'] if config['max_run_tokens'] else 1.0
+        )
+        step = max(step + 1, math.ceil(step * ratio))
+    return None, None
+
+
+def preflight(logs_folder, prompts, config, state=None):
+    """
+    Plan a raw-log run from file sizes and decide what to do about the budget.
+
+    Args:
+        logs_folder (str): Path to directory containing log files
+        prompts (dict): Prompt name -> prompt text
+        config (dict): Configuration from get_config()
+        state (IncrementalState): Incremental state, if any
+
+    Returns:
+        tuple: (action, plan, sample_step) where action is None (within budget),
+            'abort', 'summary' or 'downsample'
+    """
+    files, total_characters = estimate_raw_characters(logs_folder, state)
+    plan = plan_run(prompts, split_shards(total_characters, config), config)
+    plan['files'] = files
+    problems = budget_overruns(plan, config)
+    plan['budget_problems'] = problems
+    if not problems:
+        return None, plan, 1
+
+    action = config['budget_action'] if config['budget_action'] in BUDGET_ACTIONS else "abort"
+    if action == "downsample":
+        step, sampled_plan = downsample_plan(prompts, total_characters, config)
+        if step is None:
+            return "abort", plan, 1
+        sampled_plan['files'] = files
+        sampled_plan['budget_problems'] = problems
+        return "downsample", sampled_plan, step
+    return action, plan, 1
+
+
+def format_plan(plan, config):
+    """
+    Render a plan as a text table.
+
+    Args:
+        plan (dict): Output of plan_run()
+        config (dict): Configuration from get_config()
+
+    Returns:
+        str: Table text
+    """
+    header = f"{'Prompt':<24} {'Requests':>8} {'Input tokens':>14} {'Output tokens':>14} {'Cost USD':>10}"
+    lines = [
+        f"Plan: model {plan['model']}, payload {plan['payload_mode']}, "
+        f"{plan['log_characters']:,} log characters in {plan['shards']} request(s) per prompt"
+        + (f", sampling 1 in {plan['sample_step']} lines" if plan.get('sample_step') else ""),
+        header,
+        "-" * len(header)
+    ]
+    for prompt_name, row in plan['prompts'].items():
+        lines.append(f"{prompt_name:<24} {row['requests']:>8} {row['input_tokens']:>14,} {row['output_tokens']:>14,} {row['cost_usd']:>10.6f}")
+    total = plan['total']
+    lines.append("-" * len(header))
+    lines.append(f"{'TOTAL':<24} {total['requests']:>8} {total['input_tokens']:>14,} {total['output_tokens']:>14,} {total['cost_usd']:>10.6f}")
+
+    budget = []
+    if config['max_run_cost_usd']:
+        budget.append(f"${config['max_run_cost_usd']}")
+    if config['max_run_tokens']:
+        budget.append(f"{config['max_run_tokens']:,} tokens")
+    if budget:
+        verdict = "; ".join(budget_overruns(plan, config)) or "within budget"
+        lines.append(f"Budget: {' / '.join(budget)} per run ({config['budget_action']}) - {verdict}")
+    return "\n".join(lines)
+
+
+def plan_logs(config):
+    """
+    Dry run: print the projected tokens and cost of a run without sending anything.
+
+    Raw payloads are planned from file sizes only. Summary, template and
+    retrieval payloads are built locally first (retrieval updates the log
+    index), since their size is only known after the logs are parsed.
+
+    Args:
+        config (dict): Configuration from get_config()
+
+    Returns:
+        dict | None: Plan, or None when there are no logs
+    """
+    logs_folder = config['logs_folder']
+    if not os.path.exists(logs_folder):
+        print(f"ERROR: Logs folder does not exist: {logs_folder}")
+        return None
+
+    prompts = WowzaAnalysisPrompts.get_active_prompts(config['prompt_set'])
+    if config['log_payload_mode'] == 'retrieval' and not fts5_available():
+        print("The SQLite library of this Python has no FTS5, the run would use summary mode instead of retrieval.")
+        config = dict(config, log_payload_mode='summary')
+    state = None
+    if config['incremental']:
+        # Read-only: the state is never saved by a dry run
+        state = IncrementalState(config['incremental_state_file'], history_size=config['incremental_history'])
+
+    if config['log_payload_mode'] == 'raw':
+        action, plan, _ = preflight(logs_folder, prompts, config, state)
+        if not plan['log_characters']:
+            print("No log data to analyze, nothing would be sent.")
+            return plan
+        if action == "summary":
+            print(format_plan(plan, config))
+            print("\nOver budget: the run would switch to summary mode.")
+            config = dict(config, log_payload_mode='summary')
+        else:
+            print(format_plan(plan, config))
+            if action == "abort":
+                print("\nOver budget: the run would be aborted.")
+            elif action == "downsample":
+                print(f"\nOver budget: the run would analyze 1 in {plan['sample_step']} log lines.")
+            return plan
+
+    prompt_queries = None
+    if config['log_payload_mode'] == 'retrieval':
+        queries = WowzaAnalysisPrompts.get_prompt_queries()
+        prompt_queries = {name: queries.get(name) for name in prompts}
+    payload = build_log_payload(logs_folder, config, state, prompt_queries=prompt_queries)
+    size = max(map(len, payload.contexts.values()), default=0) if payload.contexts is not None else len(payload.content)
+    if state is not None:
+        size += len(format_history_block(state.windows))
+    plan = plan_run(prompts, [size], config)
+    plan['files'] = payload.info.get('files', 0)
+    print(format_plan(plan, config))
+    if budget_overruns(plan, config):
+        print("\nOver budget: the run would be aborted.")
+    return plan
@@ -0,0 +1,69 @@
+"""
+Model pricing and cost calculation
+"""
+
+from batch import BATCH_PRICE_FACTOR
+
+# OpenAI pricing (USD per 1M tokens)
+MODEL_PRICING = {
+    "gpt-4o-mini": {
+        "input": 0.15,         # $0.15 per 1M input tokens
+        "cached_input": 0.075, # $0.075 per 1M cached input tokens
+        "output": 0.60         # $0.60 per 1M output tokens
+    },
+    "gpt-4o": {
+        "input": 2.50,         # $2.50 per 1M input tokens
+        "cached_input": 1.25,  # $1.25 per 1M cached input tokens
+        "output": 10.00        # $10.00 per 1M output tokens
+    },
+    "gpt-5": {
+        "input": 1.25,         # $1.25 per 1M input tokens
+        "cached_input": 0.125, # $0.125 per 1M cached input tokens
+        "output": 10.00        # $10.00 per 1M output tokens
+    }
+}
+
+
+def calculate_cost(prompt_tokens, completion_tokens, model, batch=False, cached_tokens=0):
+    """
+    Calculate cost based on token usage.
+    
+    Args:
+        prompt_tokens (int): Number of input tokens
+        completion_tokens (int): Number of output tokens
+        model (str): Model name
+        batch (bool): Use Batch API pricing (50% discount)
+        cached_tokens (int): Input tokens served from the provider's prompt cache
+            (included in prompt_tokens, billed at the cached input price)
+        
+    Returns:
+        dict: Cost breakdown information
+    """
+    # Use model from config, fallback to gpt-4o-mini (cheapest)
+    model_key = model if model in MODEL_PRICING else "gpt-4o-mini"
+    
+    # Batch API requests are billed at a discount
+    price_factor = BATCH_PRICE_FACTOR if batch else 1.0
+    model_pricing = {kind: price * price_factor for kind, price in MODEL_PRICING[model_key].items()}
+    
+    # Calculate cost based on 1M tokens; cached input is billed at its own rate
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    uncached_input_cost = ((prompt_tokens - cached_tokens) / 1_000_000) * model_pricing["input"]
+    cached_input_cost = (cached_tokens / 1_000_000) * model_pricing["cached_input"]
+    input_cost = uncached_input_cost + cached_input_cost
+    output_cost = (completion_tokens / 1_000_000) * model_pricing["output"]
+    total_cost = input_cost + output_cost
+    cache_savings = (cached_tokens / 1_000_000) * (model_pricing["input"] - model_pricing["cached_input"])
+    
+    cost = {
+        "model_used": model,
+        "pricing_per_1m_tokens": model_pricing,
+        "input_cost_usd": round(input_cost, 6),
+        "cached_input_cost_usd": round(cached_input_cost, 6),
+        "output_cost_usd": round(output_cost, 6),
+        "total_cost_usd": round(total_cost, 6),
+        "prompt_cache_savings_usd": round(cache_savings, 6)
+    }
+    if batch:
+        cost["pricing_tier"] = "batch"
+    return cost
@@ -0,0 +1,176 @@
+"""
+Prompt dependency graph: prompts that build on the findings of other prompts
+
+Every prompt declares its inputs (WowzaAnalysisPrompts.get_prompt_inputs()):
+'logs' (the log payload of the run), or any mix of 'aggregates' (local
+statistics of the logs) and names of other prompts whose JSON answers it
+reads. Prompts reading the logs are sent first, as before. Derived prompts
+run in stages once their upstream prompts are done, the prompts of a stage in
+parallel, and receive a compact copy of the upstream answers instead of the
+logs, so they cost a fraction of a full-log request.
+"""
+
+import json
+
+from aggregator import format_summary_block
+from chunking import CHARS_PER_TOKEN, parse_json_answer
+
+LOGS = "logs"
+AGGREGATES = "aggregates"
+
+# Size assumed for the local statistics block when planning (it depends on the logs)
+AGGREGATES_CHARACTERS = 4000
+
+# List lengths tried, from longest to shortest, when shrinking an answer to its budget
+_LIST_LIMITS = (None, 10, 5, 3, 1)
+_MAX_STRING = 300
+
+
+def resolve_inputs(prompts, declared):
+    """
+    Resolve the inputs of the prompts of a run.
+
+    Upstream prompts that are not part of the run are dropped; a prompt left
+    without any of its upstream prompts reads the logs instead.
+
+    Args:
+        prompts (dict): Prompt name -> prompt text of the run
+        declared (dict): Prompt name -> declared inputs; prompts not listed read the logs
+
+    Returns:
+        dict: Prompt name -> tuple of inputs
+
+    Raises:
+        ValueError: A prompt combines 'logs' with other inputs
+    """
+    resolved = {}
+    for prompt_name in prompts:
+        sources = tuple(declared.get(prompt_name) or (LOGS,))
+        if LOGS in sources and len(sources) > 1:
+            raise ValueError(f"Prompt {prompt_name}: '{LOGS}' cannot be combined with other inputs")
+        upstream = [source for source in sources if source not in (LOGS, AGGREGATES)]
+        kept = tuple(source for source in sources if source in (LOGS, AGGREGATES) or source in prompts)
+        if upstream and not any(source in prompts for source in upstream):
+            kept = (LOGS,)
+        resolved[prompt_name] = kept
+    return resolved
+
+
+def plan_stages(prompts, inputs):
+    """
+    Order the prompts of a run by their dependencies.
+
+    Args:
+        prompts (dict): Prompt name -> prompt text
+        inputs (dict): Output of resolve_inputs()
+
+    Returns:
+        tuple: (prompts reading the logs, list of stages of derived prompts); every
+            stage is a dict of prompts whose upstream prompts are all in earlier stages
+
+    Raises:
+        ValueError: The prompt inputs form a cycle
+    """
+    log_prompts = {name: text for name, text in prompts.items() if inputs[name] == (LOGS,)}
+    done = set(log_prompts)
+    remaining = {name: text for name, text in prompts.items() if name not in done}
+    stages = []
+    while remaining:
+        stage = {
+            name: text for name, text in remaining.items()
+            if all(source in done for source in inputs[name] if source != AGGREGATES)
+        }
+        if not stage:
+            raise ValueError(f"Prompt inputs form a cycle: {', '.join(remaining)}")
+        stages.append(stage)
+        done.update(stage)
+        remaining = {name: text for name, text in remaining.items() if name not in stage}
+    return log_prompts, stages
+
+
+def _shrink(value, limit):
+    if isinstance(value, dict):
+        return {key: _shrink(item, limit) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [_shrink(item, limit) for item in (value if limit is None else value[:limit])]
+        if limit is not None and len(value) > limit:
+            items.append(f"... {len(value) - limit} more")
+        return items
+    if isinstance(value, str) and limit is not None and len(value) > _MAX_STRING:
+        return value[:_MAX_STRING] + "..."
+    return value
+
+
+def compact_answer(answer, max_characters):
+    """
+    Shorten a prompt's answer to at most max_characters for a downstream prompt.
+
+    JSON answers are re-serialized without whitespace and, if still too long,
+    their lists are cut to their first items; text answers are cut at the end.
+
+    Args:
+        answer (str): Answer of the upstream prompt
+        max_characters (int): Size budget
+
+    Returns:
+        str: Compact answer
+    """
+    parsed = parse_json_answer(answer)
+    if parsed is None:
+        text = " ".join(str(answer or "").split())
+    else:
+        for limit in _LIST_LIMITS:
+            text = json.dumps(_shrink(parsed, limit), separators=(",", ":"), ensure_ascii=False)
+            if len(text) <= max_characters:
+                return text
+    return text if len(text) <= max_characters else text[:max(0, max_characters - 3)] + "..."
+
+
+def build_derived_input(sources, results, aggregates, max_tokens):
+    """
+    Build the text a derived prompt receives in place of the logs.
+
+    Args:
+        sources (tuple): Inputs of the prompt, from resolve_inputs()
+        results (dict): Prompt name -> result of the prompts run so far
+        aggregates (dict): Local log statistics (LogAggregator.summary()), or None
+        max_tokens (int): Budget of each upstream answer
+
+    Returns:
+        tuple: (input text, names of the upstream prompts that succeeded)
+    """
+    sections = []
+    used = []
+    if AGGREGATES in sources and aggregates is not None:
+        sections.append(format_summary_block(aggregates))
+    findings = []
+    for source in sources:
+        if source == AGGREGATES:
+            continue
+        result = results.get(source) or {}
+        if result.get("status") == "success":
+            findings.append(f"[{source}]\n{compact_answer(result.get('answer'), max_tokens * CHARS_PER_TOKEN)}")
+            used.append(source)
+        else:
+            findings.append(f"[{source}]\nNot available (this analysis failed)")
+    if findings:
+        sections.append("FINDINGS OF EARLIER ANALYSES OF THESE LOGS (JSON, long lists shortened):\n" + "\n\n".join(findings))
+    return "\n\n".join(sections), used
+
+
+def estimate_input_characters(sources, config):
+    """
+    Estimate the size of a derived prompt's input for planning.
+
+    Args:
+        sources (tuple): Inputs of the prompt, from resolve_inputs()
+        config (dict): Configuration from get_config()
+
+    Returns:
+        int: Estimated characters
+    """
+    upstream_tokens = min(config['upstream_max_tokens'], config['plan_output_tokens'])
+    return sum(
+        AGGREGATES_CHARACTERS if source == AGGREGATES else upstream_tokens * CHARS_PER_TOKEN
+        for source in sources
+    )
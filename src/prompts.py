@@ -2,6 +2,63 @@
 Wowza Log Analysis Prompts
 """
 
+def build_full_prompt(prompt_text, logs_content):
+    """
+    Combine a prompt template with the log data into the text sent to OpenAI.
+    
+    The log data comes first and the prompt instructions last, so every prompt
+    sent over the same logs starts with an identical prefix and the provider's
+    prompt cache can serve it after the first request.
+    
+    Args:
+        prompt_text (str): Prompt instructions
+        logs_content (str): Log data
+        
+    Returns:
+        str: Complete prompt
+    """
+    return f"""{build_shared_prefix(logs_content)}ANALYSIS TASK:
+{prompt_text}
+
+Please analyze the log data above and return JSON results according to the format requested.
+Provide clear and detailed analysis.
+"""
+
+
+def build_shared_prefix(logs_content):
+    """
+    Build the part of the prompt that is identical for every prompt over the same logs.
+    
+    Args:
+        logs_content (str): Log data
+        
+    Returns:
+        str: Prompt prefix
+    """
+    return f"""You are analyzing Wowza Streaming Engine logs. The log data is given first, followed by the analysis task.
+
+WOWZA LOG DATA:
+{logs_content}
+
+"""
+
+
+# Extra lines kept by the pre-filter of topic prompts, on top of WARN/ERROR/CRITICAL lines
+CODEC_PATTERNS = (r"codec", r"\bh\.?26[45]\b", r"\bhevc\b", r"\bavc\b", r"\baac\b", r"\bopus\b",
+                  r"\bvp[89]\b", r"profile", r"\bsps\b", r"\bpps\b", r"keyframe", r"decoder", r"encoder")
+PERFORMANCE_PATTERNS = (r"buffer", r"bitrate", r"bandwidth", r"latency", r"dropp?ed", r"timeout", r"stall",
+                        r"\bfps\b", r"frame rate", r"\bcpu\b", r"memory")
+TRANSCODING_PATTERNS = (r"transcod", r"\bencode", r"\bdecode", r"\bgpu\b", r"\bnvenc\b", r"quicksync",
+                        r"\brendition", r"ngrp", r"scale")
+
+# Search terms of topic prompts in retrieval mode (full-text index words; a trailing * matches a prefix)
+CODEC_TERMS = ("codec*", "h264", "h265", "hevc", "avc", "aac", "opus", "vp8", "vp9", "profile", "sps", "pps",
+               "keyframe*", "decoder*", "encoder*")
+PERFORMANCE_TERMS = ("buffer*", "bitrate", "bandwidth", "latency", "drop*", "timeout", "stall*", "fps",
+                     "cpu", "memory")
+TRANSCODING_TERMS = ("transcod*", "encod*", "decod*", "gpu", "nvenc", "quicksync", "rendition*", "ngrp", "scal*")
+
+
 class WowzaAnalysisPrompts:
     """Class containing prompt templates for analyzing Wowza logs"""
     
@@ -10,13 +67,86 @@ class WowzaAnalysisPrompts:
         """Return dictionary containing all 6 detailed prompts"""
         return {
             "error_classification": WowzaAnalysisPrompts.error_classification_prompt(),
-            # "codec_issues_analysis": WowzaAnalysisPrompts.codec_issues_prompt(),
-            # "streaming_performance": WowzaAnalysisPrompts.streaming_performance_prompt(),
-            # "transcoding_analysis": WowzaAnalysisPrompts.transcoding_analysis_prompt(),
-            # "timeline_analysis": WowzaAnalysisPrompts.timeline_analysis_prompt(),
-            # "comprehensive_solution": WowzaAnalysisPrompts.comprehensive_solution_prompt()
+            "codec_issues_analysis": WowzaAnalysisPrompts.codec_issues_prompt(),
+            "streaming_performance": WowzaAnalysisPrompts.streaming_performance_prompt(),
+            "transcoding_analysis": WowzaAnalysisPrompts.transcoding_analysis_prompt(),
+            "timeline_analysis": WowzaAnalysisPrompts.timeline_analysis_prompt(),
+            "comprehensive_solution": WowzaAnalysisPrompts.comprehensive_solution_prompt()
+        }
+    
+    @staticmethod
+    def get_active_prompts(prompt_set="simple"):
+        """Return dictionary of the prompts sent in a complete analysis run ('simple', 'detailed' or 'all')"""
+        if prompt_set == "detailed":
+            return WowzaAnalysisPrompts.get_all_prompts()
+        if prompt_set == "all":
+            return {**WowzaAnalysisPrompts.get_simple_prompts(), **WowzaAnalysisPrompts.get_all_prompts()}
+        return {**WowzaAnalysisPrompts.get_simple_prompts()}
+    
+    @staticmethod
+    def get_prompt_inputs():
+        """
+        Return the inputs of prompts that do not read the logs (see prompt_graph).
+        
+        'aggregates' is the local statistics of the logs, any other name the
+        answer of that prompt. Prompts not listed here read the log payload.
+        """
+        return {
+            # Solutions for the issues found by the other detailed prompts, not a sixth pass over the logs
+            "comprehensive_solution": ("aggregates", "error_classification", "codec_issues_analysis",
+                                       "streaming_performance", "transcoding_analysis", "timeline_analysis")
         }
     
+    @staticmethod
+    def get_prompt_filters():
+        """
+        Return the line pre-filter of each prompt for raw log payloads.
+        
+        A filter keeps lines at the configured severities (WARN/ERROR/CRITICAL by
+        default, overridden by 'severities') or matching one of its 'patterns',
+        plus a few lines of context. None sends every line to the prompt.
+        """
+        problems = {}
+        return {
+            "main_errors": problems,
+            "root_causes": problems,
+            "solutions": problems,
+            "error_classification": problems,
+            "codec_issues_analysis": {"patterns": CODEC_PATTERNS},
+            "streaming_performance": {"patterns": PERFORMANCE_PATTERNS},
+            "transcoding_analysis": {"patterns": TRANSCODING_PATTERNS},
+            # Event ordering and the overall picture need the normal traffic as well
+            "timeline_analysis": None,
+            "comprehensive_solution": None
+        }
+    
+    @staticmethod
+    def get_prompt_queries():
+        """
+        Return the query of each prompt for retrieval payloads (see log_index).
+        
+        Lines matching one of the 'terms' come first, ranked by relevance, then
+        lines at the configured severities (WARN/ERROR/CRITICAL by default,
+        overridden by 'severities'). None retrieves the most frequent messages.
+        """
+        problems = {}
+        return {
+            "main_errors": problems,
+            "root_causes": problems,
+            "solutions": problems,
+            "error_classification": problems,
+            "codec_issues_analysis": {"terms": CODEC_TERMS},
+            "streaming_performance": {"terms": PERFORMANCE_TERMS},
+            "transcoding_analysis": {"terms": TRANSCODING_TERMS},
+            # The overall picture needs the normal traffic as well
+            "timeline_analysis": None
+        }
+    
+    @staticmethod
+    def get_windowed_prompts():
+        """Return the names of prompts analyzed per time window and stitched into one timeline"""
+        return ("timeline_analysis",)
+    
     @staticmethod
     def get_simple_prompts():
         """Return dictionary containing 3 basic prompts for quick analysis"""
@@ -0,0 +1,495 @@
+"""
+Rate-limit-aware request scheduling: token-bucket pacing, retries with backoff
+and request slots shared fairly between the servers of a fleet run
+"""
+
+import asyncio
+import contextlib
+import copy
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from metrics import count
+
+# HTTP statuses worth retrying besides rate limits and server errors
+RETRYABLE_STATUS_CODES = (408, 409)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value):
+    """
+    Parse a rate-limit reset header such as '1s', '6m0s' or '20ms'.
+
+    Args:
+        value (str): Header value
+
+    Returns:
+        float | None: Seconds, or None if the value cannot be parsed
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value.strip())
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity per minute.
+
+    Callers reserve capacity up front and the level may go negative; the
+    returned wait is how long the caller has to sleep before its reservation
+    is covered, so concurrent callers are queued in reservation order.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self):
+        return self.capacity / 60.0
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now=None):
+        """
+        Take amount from the bucket.
+
+        Args:
+            amount (float): Units to reserve (capped at the bucket capacity)
+            now (float): Current time.monotonic() value
+
+        Returns:
+            float: Seconds to wait before the reservation is covered
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+    def adjust(self, amount):
+        """Give back (positive) or take (negative) units after the actual cost is known."""
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync_remaining(self, remaining, reset_seconds=None, now=None):
+        """
+        Lower the level to what the server reports as remaining.
+
+        The server sees usage from every process sharing the quota, so its
+        count wins when it is lower than the local estimate.
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if remaining < self.level:
+            self.level = float(remaining)
+            if reset_seconds is not None and remaining <= 0:
+                # Nothing left until the window resets
+                self.level = min(self.level, -reset_seconds * self.rate)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets for one account.
+
+    Limits of 0 are unknown: the matching bucket is created from the
+    x-ratelimit-limit-* response headers of the first response.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.lock = threading.Lock()
+
+    def reserve(self, estimated_tokens):
+        """
+        Reserve one request and its estimated tokens.
+
+        Args:
+            estimated_tokens (int): Estimated tokens of the request
+
+        Returns:
+            float: Seconds to wait before sending
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.reserve(estimated_tokens, now))
+            return wait
+
+    def acquire(self, estimated_tokens):
+        """Block until a request of estimated_tokens may be sent."""
+        wait = self.reserve(estimated_tokens)
+        if wait > 0:
+            logging.debug("Rate limiter: waiting %.2fs", wait)
+            count("rate_limit_wait_seconds", wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, estimated_tokens):
+        """Wait without blocking the event loop until a request of estimated_tokens may be sent."""
+        wait = self.reserve(estimated_tokens)
+        if wait > 0:
+            logging.debug("Rate limiter: waiting %.2fs", wait)
+            count("rate_limit_wait_seconds", wait)
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the real token usage of a request is known."""
+        if self.tokens is None or not actual_tokens:
+            return
+        with self.lock:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def update_from_headers(self, headers):
+        """
+        Learn limits and remaining capacity from x-ratelimit-* response headers.
+
+        Args:
+            headers (Mapping): Response headers
+        """
+        if not headers:
+            return
+        with self.lock:
+            for kind in ("requests", "tokens"):
+                limit = _header_int(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _header_int(headers, f"x-ratelimit-remaining-{kind}")
+                reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                bucket = getattr(self, kind)
+                if bucket is None and limit:
+                    bucket = TokenBucket(limit)
+                    setattr(self, kind, bucket)
+                    logging.info("Rate limiter: learned %s limit of %s per minute", kind, limit)
+                if bucket is not None and remaining is not None:
+                    bucket.sync_remaining(remaining, reset)
+
+
+def is_retryable(error):
+    """
+    Decide whether a failed request is worth retrying.
+
+    Rate limits, timeouts, connection errors and server errors are transient;
+    an exhausted quota (insufficient_quota) and client errors are not.
+    """
+    import openai
+    if isinstance(error, openai.RateLimitError):
+        return getattr(error, "code", None) != "insufficient_quota"
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _retry_after(error):
+    """Server-requested delay in seconds from retry-after-ms / retry-after headers."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class _SlotWaiter:
+    __slots__ = ("tenant", "wake", "since", "granted")
+
+    def __init__(self, tenant, wake):
+        self.tenant = tenant
+        self.wake = wake
+        self.since = time.monotonic()
+        self.granted = False
+
+
+class FairSlots:
+    """
+    Global limit of requests in flight, shared fairly by several tenants
+    (e.g. the servers of a fleet run).
+
+    Requests wait in one queue per tenant. A free slot goes to the waiting
+    tenant with the fewest requests in flight, round robin among equals, so a
+    tenant with many queued requests or slow responses cannot take the slots
+    of the others. tenant_limit optionally caps the slots of one tenant.
+    Works across threads and event loops.
+    """
+
+    def __init__(self, limit, tenant_limit=0):
+        self.limit = max(1, limit)
+        self.tenant_limit = tenant_limit
+        self.lock = threading.Lock()
+        self.in_flight = Counter()
+        self.total_in_flight = 0
+        self.peak_in_flight = 0
+        self.waiting = {}
+        self.grants = 0
+        self.last_grant = {}
+        self.requests = Counter()
+        self.wait_seconds = Counter()
+
+    def _dispatch(self):
+        """Grant free slots to waiting requests (lock held); returns the granted waiters."""
+        granted = []
+        while self.total_in_flight < self.limit:
+            eligible = [
+                tenant for tenant, queue in self.waiting.items()
+                if queue and (not self.tenant_limit or self.in_flight[tenant] < self.tenant_limit)
+            ]
+            if not eligible:
+                break
+            tenant = min(eligible, key=lambda name: (self.in_flight[name], self.last_grant.get(name, 0)))
+            waiter = self.waiting[tenant].popleft()
+            waiter.granted = True
+            self.grants += 1
+            self.last_grant[tenant] = self.grants
+            self.in_flight[tenant] += 1
+            self.total_in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.total_in_flight)
+            self.requests[tenant] += 1
+            self.wait_seconds[tenant] += time.monotonic() - waiter.since
+            granted.append(waiter)
+        return granted
+
+    def _enqueue(self, tenant, wake):
+        waiter = _SlotWaiter(tenant, wake)
+        with self.lock:
+            self.waiting.setdefault(tenant, deque()).append(waiter)
+            granted = self._dispatch()
+        for other in granted:
+            other.wake()
+        return waiter
+
+    def acquire(self, tenant):
+        """Block until tenant may send a request."""
+        event = threading.Event()
+        self._enqueue(tenant, event.set)
+        event.wait()
+
+    async def acquire_async(self, tenant):
+        """Wait without blocking the event loop until tenant may send a request."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(tenant, wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self.lock:
+                granted = waiter.granted
+                if not granted:
+                    self.waiting[tenant].remove(waiter)
+            if granted:
+                self.release(tenant)
+            raise
+
+    def release(self, tenant):
+        """Give back a slot taken with acquire() or acquire_async()."""
+        with self.lock:
+            self.in_flight[tenant] -= 1
+            self.total_in_flight -= 1
+            granted = self._dispatch()
+        for waiter in granted:
+            waiter.wake()
+
+    @contextlib.contextmanager
+    def slot(self, tenant):
+        """Hold a slot for the enclosed request."""
+        self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, tenant):
+        """Async version of slot()."""
+        await self.acquire_async(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def stats(self):
+        """Return {'peak_in_flight': n, 'tenants': {tenant: {'requests': n, 'queue_wait_seconds': s}}}."""
+        with self.lock:
+            return {
+                "peak_in_flight": self.peak_in_flight,
+                "tenants": {
+                    tenant: {"requests": self.requests[tenant], "queue_wait_seconds": round(self.wait_seconds[tenant], 2)}
+                    for tenant in self.requests
+                }
+            }
+
+
+class RequestScheduler:
+    """
+    Sends Responses API requests through a shared RateLimiter and retries
+    transient failures with jittered exponential backoff.
+
+    Retries stop after max_retries attempts or when the next attempt would
+    start after the retry budget (seconds since the first attempt) runs out.
+
+    With slots, every attempt also holds one of the shared FairSlots while it
+    runs, queued under the scheduler's tenant (see for_tenant()). The slot is
+    taken once the rate limiter lets the attempt go, so a request waiting for
+    rate limit capacity does not keep a slot from the other tenants.
+    """
+
+    def __init__(self, limiter=None, max_retries=5, retry_budget=120.0, base_delay=1.0, max_delay=30.0,
+                 slots=None, tenant=None):
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.slots = slots
+        self.tenant = tenant
+        self.retries = 0
+        self.retries_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, slots=None):
+        """Build a scheduler from get_config() values."""
+        return cls(
+            RateLimiter(config['requests_per_minute'], config['tokens_per_minute']),
+            max_retries=config['max_retries'],
+            retry_budget=config['retry_budget_seconds'],
+            base_delay=config['retry_base_delay'],
+            max_delay=config['retry_max_delay'],
+            slots=slots
+        )
+
+    def for_tenant(self, tenant):
+        """Return a scheduler sharing this one's rate limiter and slots whose requests are queued as tenant's."""
+        scheduler = copy.copy(self)
+        scheduler.tenant = tenant
+        scheduler.retries = 0
+        scheduler.retries_lock = threading.Lock()
+        return scheduler
+
+    def _slot(self):
+        return self.slots.slot(self.tenant) if self.slots is not None else contextlib.nullcontext()
+
+    def _slot_async(self):
+        return self.slots.slot_async(self.tenant) if self.slots is not None else contextlib.nullcontext()
+
+    def _next_delay(self, error, attempt, deadline, label):
+        """Return the delay before the next attempt, or None if the error should be raised."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        # Full jitter keeps many clients from retrying in lockstep
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if time.monotonic() + delay > deadline:
+            return None
+        response = getattr(error, "response", None)
+        if response is not None:
+            self.limiter.update_from_headers(response.headers)
+        # Requests of one scheduler are retried from several threads
+        with self.retries_lock:
+            self.retries += 1
+        count("request_retries")
+        count("retry_wait_seconds", delay)
+        logging.warning("Retrying %s in %.1fs (attempt %s of %s): %s", label, delay, attempt + 1, self.max_retries, error)
+        return delay
+
+    def _settle(self, response, estimated_tokens):
+        usage = getattr(response, "usage", None)
+        self.limiter.settle(estimated_tokens, getattr(usage, "total_tokens", 0))
+        return response
+
+    def call(self, send, estimated_tokens, label="request", collect=None):
+        """
+        Send a request, pacing and retrying it.
+
+        Args:
+            send (callable): Performs one attempt and returns a raw response
+                (e.g. client.responses.with_raw_response.create)
+            estimated_tokens (int): Estimated tokens of the request
+            label (str): Name used in log messages
+            collect (callable): Turns the parsed response into the final one, e.g. reads
+                a stream to the end; errors raised while collecting are retried too
+
+        Returns:
+            Parsed response
+        """
+        import openai
+        deadline = time.monotonic() + self.retry_budget
+        attempt = 0
+        while True:
+            # The slot is taken after the rate limiter wait and given back during the backoff sleep
+            self.limiter.acquire(estimated_tokens)
+            with self._slot():
+                try:
+                    raw_response = send()
+                    self.limiter.update_from_headers(raw_response.headers)
+                    response = raw_response.parse()
+                    if collect is not None:
+                        response = collect(response)
+                    return self._settle(response, estimated_tokens)
+                except (openai.OpenAIError, ConnectionError, TimeoutError) as e:
+                    delay = self._next_delay(e, attempt, deadline, label)
+                    if delay is None:
+                        raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, send, estimated_tokens, label="request", collect=None):
+        """
+        Async version of call(); send returns an awaitable raw response and
+        collect, if given, is a coroutine function.
+        """
+        import openai
+        deadline = time.monotonic() + self.retry_budget
+        attempt = 0
+        while True:
+            await self.limiter.acquire_async(estimated_tokens)
+            async with self._slot_async():
+                try:
+                    raw_response = await send()
+                    self.limiter.update_from_headers(raw_response.headers)
+                    response = raw_response.parse()
+                    if collect is not None:
+                        response = await collect(response)
+                    return self._settle(response, estimated_tokens)
+                except (openai.OpenAIError, ConnectionError, TimeoutError) as e:
+                    delay = self._next_delay(e, attempt, deadline, label)
+                    if delay is None:
+                        raise
+            await asyncio.sleep(delay)
+            attempt += 1
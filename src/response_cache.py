@@ -0,0 +1,192 @@
+"""
+Persistent on-disk cache of OpenAI responses
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+def fingerprint_text(text):
+    """
+    Content fingerprint of a log payload.
+
+    Args:
+        text (str): Log text sent to the model
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def make_cache_key(prompt_text, log_fingerprint, model, temperature):
+    """
+    Build the cache key of one request.
+
+    Args:
+        prompt_text (str): Prompt instructions
+        log_fingerprint (str): Fingerprint of the log payload
+        model (str): Model name
+        temperature (float): Sampling temperature
+
+    Returns:
+        str: SHA-256 hex digest identifying the request
+    """
+    material = json.dumps(
+        {"prompt": prompt_text, "logs": log_fingerprint, "model": model, "temperature": temperature},
+        sort_keys=True
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed response cache stored as one JSON file per entry.
+
+    Entries expire after ttl_seconds. When the cache grows past max_bytes the
+    least recently used entries (by file modification time, refreshed on every
+    hit) are deleted. The folder is measured once, on the first write; after
+    that the size is tracked in memory and the folder is only scanned again
+    when the limit is exceeded. The tracked size only counts this instance's
+    writes, so runs sharing a folder at the same time (the servers of a fleet
+    run) share one instance.
+    """
+
+    def __init__(self, folder, max_bytes=100 * 1024 * 1024, ttl_seconds=7 * 24 * 3600, refresh=False):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        # Size of the cache folder in bytes, None until the first write measures it
+        self.total_bytes = None
+        self.lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Cache key from make_cache_key()
+
+        Returns:
+            dict | None: Cached entry, or None on a miss (always None in refresh mode)
+        """
+        if self.refresh:
+            self._count(hit=False)
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            removed = self._remove(path)
+            with self.lock:
+                if self.total_bytes is not None:
+                    self.total_bytes -= removed
+            self._count(hit=False)
+            return None
+
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(path, None)
+        except OSError:
+            pass
+        self._count(hit=True)
+        return entry
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, entry):
+        """
+        Store a response atomically and evict old entries if the cache is too big.
+
+        Args:
+            key (str): Cache key from make_cache_key()
+            entry (dict): JSON-serializable data to cache
+        """
+        path = self._path(key)
+        entry = dict(entry, created_at=time.time())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+                f.flush()
+                size = os.fstat(f.fileno()).st_size
+            replaced = self._size(path)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning("Could not write response cache entry %s: %s", key, e)
+            return
+        if not self.max_bytes:
+            return
+        with self.lock:
+            if self.total_bytes is None:
+                # First write: measure what earlier runs left, including this entry
+                self.total_bytes = self._scan()[1]
+            else:
+                self.total_bytes += size - replaced
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _size(self, path):
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    def _remove(self, path):
+        """Delete an entry file; returns its size, 0 if it could not be deleted."""
+        size = self._size(path)
+        try:
+            os.remove(path)
+        except OSError:
+            return 0
+        return size
+
+    def _scan(self):
+        """Return the (modification time, size, path) of every entry and their total size."""
+        entries = []
+        total = 0
+        for directory, _, files in os.walk(self.folder):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path))
+                total += info.st_size
+        return entries, total
+
+    def _evict(self):
+        """Delete the least recently used entries until the cache fits max_bytes (lock held)."""
+        # Rescanned: other processes sharing the folder may have added or removed entries
+        entries, total = self._scan()
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self.total_bytes = total
@@ -0,0 +1,141 @@
+"""
+Per-request result log: every finished request is appended to an NDJSON file of its run
+
+A run that crashes or is interrupted keeps the results of the requests that
+finished; --resume reads them back and only sends what is missing.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+RUN_FILE_SUFFIX = ".ndjson"
+
+
+def new_run_id():
+    """Return an ID for a new run, based on the current time."""
+    return time.strftime("%Y%m%d_%H%M%S")
+
+
+def latest_run_id(runs_folder):
+    """
+    Find the most recent run in the runs folder.
+
+    Args:
+        runs_folder (str): Folder with one NDJSON file per run
+
+    Returns:
+        str | None: Run ID, or None when there is no earlier run
+    """
+    runs = sorted(Path(runs_folder).glob(f"*{RUN_FILE_SUFFIX}"), key=lambda path: path.stat().st_mtime)
+    return runs[-1].name[:-len(RUN_FILE_SUFFIX)] if runs else None
+
+
+class ResultSink:
+    """
+    Append-only NDJSON file with one line per finished request.
+
+    Each line holds the request label (e.g. 'main_errors [chunk 2]'), the
+    fingerprint of its input (prompt, log data, model, temperature) and the
+    result. A line is written with a single append and synced to disk, so a
+    crash leaves at most one incomplete last line, which is ignored on resume;
+    the first line appended after it starts on a new line.
+    """
+
+    def __init__(self, path, run_id, resume=False):
+        self.path = Path(path)
+        self.run_id = run_id
+        self.completed = {}
+        # The resumed file ends in a line cut short by a crash
+        self.partial_line = False
+        if resume:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self.partial_line = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Line cut short by a crash
+                        continue
+                    if record.get("result", {}).get("status") == "success":
+                        self.completed[(record["label"], record["fingerprint"])] = record["result"]
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logging.warning("Cannot read run results %s: %s", self.path, e)
+
+    def get(self, label, fingerprint):
+        """
+        Return the result saved for a request in the resumed run.
+
+        Args:
+            label (str): Request label
+            fingerprint (str): Fingerprint of the request input
+
+        Returns:
+            dict | None: Saved successful result, or None if the request has to be sent
+        """
+        result = self.completed.get((label, fingerprint))
+        if result is None:
+            return None
+        print(f"  Completed: {label} (resumed from run {self.run_id})")
+        return dict(result, resumed=True)
+
+    def record(self, label, fingerprint, result):
+        """
+        Append a finished request to the run file.
+
+        Args:
+            label (str): Request label
+            fingerprint (str): Fingerprint of the request input
+            result (dict): Per-request result
+        """
+        line = json.dumps(
+            {"run_id": self.run_id, "label": label, "fingerprint": fingerprint, "result": result},
+            ensure_ascii=False
+        ) + "\n"
+        if self.partial_line:
+            # End the cut line first, or this record would be glued to it
+            line = "\n" + line
+            self.partial_line = False
+        os.makedirs(self.path.parent, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def open_result_sink(config):
+    """
+    Open the result file of this run, or of the run being resumed.
+
+    Args:
+        config (dict): Configuration from get_config(); 'resume' and 'run_id' are set by --resume
+
+    Returns:
+        ResultSink | None: Sink, or None when config['runs_folder'] is empty (disabled)
+    """
+    runs_folder = config['runs_folder']
+    if not runs_folder:
+        return None
+    run_id = config['run_id']
+    resume = config['resume']
+    if resume and run_id is None:
+        run_id = latest_run_id(runs_folder)
+        if run_id is None:
+            print("  No earlier run to resume, starting a new run")
+            resume = False
+    if run_id is None:
+        run_id = new_run_id()
+    sink = ResultSink(Path(runs_folder) / f"{run_id}{RUN_FILE_SUFFIX}", run_id, resume)
+    if resume:
+        print(f"  Resuming run {run_id}: {len(sink.completed)} finished requests found")
+    return sink
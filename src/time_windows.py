@@ -0,0 +1,194 @@
+"""
+Time-window sharding: merge log files by timestamp and cut the stream into fixed windows
+"""
+
+import heapq
+import json
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from chunking import merge_values, parse_json_answer
+from log_parser import PLAIN_FIELDS, WowzaLogParser
+from log_reader import ARCHIVE_ERRORS, detect_compression, find_log_files, iter_file_lines, leading_header
+
+
+class TimeWindow:
+    """Lines of one time window, in time order, with #Fields headers where the schema changes"""
+
+    __slots__ = ("start", "end", "lines", "records")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.lines = []
+        self.records = 0
+
+    @property
+    def label(self):
+        return f"{self.start:%Y-%m-%d %H:%M} to {self.end:%Y-%m-%d %H:%M}"
+
+    def info(self):
+        """Window bounds and size, as saved in the results."""
+        return {"start": f"{self.start:%Y-%m-%d %H:%M}", "end": f"{self.end:%Y-%m-%d %H:%M}", "records": self.records}
+
+
+def _window_key(date, time_value, window_minutes):
+    """Return (date, first minute of the window) for a record, or None if its time cannot be read."""
+    try:
+        minute = int(time_value[0:2]) * 60 + int(time_value[3:5])
+    except (TypeError, ValueError):
+        return None
+    return date, minute - minute % window_minutes
+
+
+def iter_timed_lines(path, kind=None, buffer_size=1024 * 1024, use_mmap=False, start=0, window_minutes=15):
+    """
+    Read one log file as (window key, timestamp, schema names, line) tuples.
+
+    Lines without a date and time (plain text lines) get the timestamp of the
+    record before them, so they stay next to it after merging.
+
+    Args:
+        path (Path): Log file
+        kind (str): Compression from detect_compression()
+        buffer_size (int): Read buffer size in bytes
+        use_mmap (bool): Read plain files through mmap instead of buffered reads
+        start (int): Byte offset to start from (plain files only)
+        window_minutes (int): Window size in minutes
+
+    Yields:
+        tuple: (window key, timestamp, schema field names, line)
+    """
+    parser = WowzaLogParser()
+    key = ("", 0)
+    timestamp = ""
+    try:
+        header = leading_header(path, buffer_size) if start else None
+        if header is not None:
+            # Read from the middle: the lines are records of the header at the top of the file
+            parser.parse_values(header.decode("utf-8", errors="ignore").rstrip("\r\n"))
+        for raw in iter_file_lines(path, kind, buffer_size, use_mmap, start):
+            line = raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+            parsed = parser.parse_values(line)
+            if parsed is None:
+                continue
+            schema, values = parsed
+            date_position = schema.index.get("date")
+            time_position = schema.index.get("time")
+            if date_position is not None and time_position is not None:
+                date = values[date_position]
+                time_value = values[time_position]
+                record_key = _window_key(date, time_value, window_minutes) if date else None
+                if record_key is not None:
+                    key = record_key
+                    timestamp = f"{date} {time_value}"
+            yield key, timestamp, schema.names, line
+    except ARCHIVE_ERRORS as e:
+        logging.warning("Skipping unreadable log file %s: %s", path, e)
+
+
+def iter_time_windows(log_dir, window_minutes=15, buffer_size=1024 * 1024, use_mmap=False, state=None):
+    """
+    Merge all log files in time order and cut the result into fixed windows.
+
+    Each file is read in order (Wowza writes them in time order) and the
+    files are combined with a k-way merge, so only one line per file and one
+    window of lines are held in memory. A line older than the current window
+    (an out-of-order file) is put in the current window.
+
+    Args:
+        log_dir (Path): Directory containing log files
+        window_minutes (int): Window size in minutes
+        buffer_size (int): Read buffer size in bytes
+        use_mmap (bool): Read plain files through mmap instead of buffered reads
+        state (IncrementalState): If given, only lines added since the last run are
+            read; the read positions are not changed
+
+    Yields:
+        TimeWindow: Windows in time order (windows without records are skipped)
+    """
+    streams = []
+    for path in find_log_files(Path(log_dir)):
+        try:
+            kind = detect_compression(path)
+            start = 0
+            if state is not None:
+                if kind is not None:
+                    if state.archive_seen(path):
+                        continue
+                else:
+                    start = state.peek_offset(path)
+        except OSError as e:
+            logging.warning("Skipping unreadable log file %s: %s", path, e)
+            continue
+        streams.append(iter_timed_lines(path, kind, buffer_size, use_mmap, start, window_minutes))
+
+    window = None
+    current_key = None
+    names = None
+    for key, timestamp, line_names, line in heapq.merge(*streams, key=lambda item: item[:2]):
+        if current_key is None or key > current_key:
+            if window is not None and window.records:
+                yield window
+            current_key = key
+            names = None
+            date, minute = key
+            try:
+                start = datetime.strptime(date, "%Y-%m-%d") + timedelta(minutes=minute)
+            except ValueError:
+                # Lines before the first timestamp of their file
+                start = datetime.min
+            window = TimeWindow(start, start + timedelta(minutes=window_minutes))
+        if line_names != PLAIN_FIELDS:
+            if line_names != names:
+                window.lines.append("#Fields: " + " ".join(line_names))
+                names = line_names
+            window.records += 1
+        window.lines.append(line)
+    if window is not None and window.records:
+        yield window
+
+
+def stitch_timeline(window_answers):
+    """
+    Stitch per-window answers of a timeline prompt into one timeline.
+
+    JSON answers are merged like chunk results, then the overall start and end
+    times are taken from the first and last windows and every window's own
+    timeline and error clusters are listed in order under 'windows'. Text
+    answers are joined as sections headed by their window.
+
+    Args:
+        window_answers (list): (TimeWindow info dict, answer text) in time order
+
+    Returns:
+        str: Stitched answer
+    """
+    parsed = [parse_json_answer(answer) for _, answer in window_answers]
+    if not parsed or not all(isinstance(value, dict) for value in parsed):
+        return "\n\n".join(
+            f"--- Time window {window['start']} to {window['end']} ---\n{answer.strip()}"
+            for window, answer in window_answers
+        )
+
+    merged = merge_values(None, parsed)
+    timelines = [value.get("timeline") if isinstance(value.get("timeline"), dict) else {} for value in parsed]
+    timeline = merged.get("timeline") if isinstance(merged.get("timeline"), dict) else {}
+    starts = [item.get("start_time") for item in timelines if item.get("start_time")]
+    ends = [item.get("end_time") for item in timelines if item.get("end_time")]
+    timeline["start_time"] = starts[0] if starts else window_answers[0][0]["start"]
+    timeline["end_time"] = ends[-1] if ends else window_answers[-1][0]["end"]
+    timeline["total_duration"] = f"{window_answers[0][0]['start']} to {window_answers[-1][0]['end']}"
+    merged["timeline"] = timeline
+    merged["windows"] = [
+        {
+            "window": f"{window['start']} to {window['end']}",
+            "records": window["records"],
+            "timeline": value.get("timeline"),
+            "error_clusters": (value.get("patterns") or {}).get("error_clusters", [])
+            if isinstance(value.get("patterns"), dict) else []
+        }
+        for (window, _), value in zip(window_answers, parsed)
+    ]
+    return json.dumps(merged, indent=2, ensure_ascii=False)
@@ -0,0 +1,240 @@
+"""
+Watch mode: keep running and analyze new log data as it is written
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import logging
+import os
+import select
+import signal
+import struct
+import time
+from pathlib import Path
+
+from aggregator import ERROR_SEVERITIES
+from incremental import IncrementalState
+from log_reader import ARCHIVE_PATTERNS, LOG_PATTERNS, find_log_files
+
+# inotify(7) event flags
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_log_name(name):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in LOG_PATTERNS + ARCHIVE_PATTERNS)
+
+
+class InotifyWatcher:
+    """Change notifications from the Linux kernel (inotify), for the logs folder and its subfolders"""
+
+    def __init__(self, folder):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {}
+        for path in [Path(folder), *(path for path in Path(folder).rglob("*") if path.is_dir())]:
+            self._add_watch(path)
+
+    def _add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            logging.warning("Cannot watch %s: %s", path, os.strerror(ctypes.get_errno()))
+            return
+        self.folders[wd] = Path(path)
+
+    def wait(self, timeout):
+        """
+        Wait for a log file to be created or written.
+
+        Args:
+            timeout (float): Seconds to wait, None to wait until something changes
+
+        Returns:
+            bool: True if a log file changed, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            changed = False
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_length].rstrip(b"\0").decode("utf-8", errors="ignore")
+                offset += name_length
+                folder = self.folders.get(wd)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and folder is not None:
+                        # New subfolder: watch it and look at the logs already in it
+                        self._add_watch(folder / name)
+                        changed = True
+                elif _is_log_name(name):
+                    changed = True
+            if changed:
+                return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Portable fallback: compares size, modification time and inode of the log files every few seconds"""
+
+    def __init__(self, folder, interval=2.0):
+        self.folder = Path(folder)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for path in find_log_files(self.folder):
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            snapshot[str(path)] = (info.st_ino, info.st_size, info.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout):
+        """
+        Wait for a log file to be created or written.
+
+        Args:
+            timeout (float): Seconds to wait, None to wait until something changes
+
+        Returns:
+            bool: True if a log file changed, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+            snapshot = self._scan()
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                return True
+
+    def close(self):
+        pass
+
+
+def create_watcher(folder, config):
+    """
+    Create the change watcher for the logs folder.
+
+    Args:
+        folder (str): Logs folder
+        config (dict): Configuration from get_config()
+
+    Returns:
+        InotifyWatcher | PollingWatcher: inotify where available (WATCH_BACKEND=auto), polling otherwise
+    """
+    if config['watch_backend'] in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            if config['watch_backend'] == "inotify":
+                raise
+            logging.info("inotify unavailable (%s), polling the logs folder instead", e)
+    return PollingWatcher(folder, config['watch_poll_seconds'])
+
+
+def wait_for_burst(watcher, debounce_seconds, max_wait_seconds):
+    """
+    Block until log data changes, then until the writes settle.
+
+    A burst of writes is collected until no change is seen for
+    debounce_seconds, but never longer than max_wait_seconds, so a log that
+    is written continuously is still analyzed regularly.
+
+    Args:
+        watcher: InotifyWatcher or PollingWatcher
+        debounce_seconds (float): Quiet time that ends a burst
+        max_wait_seconds (float): Longest time a burst is collected
+
+    Returns:
+        float: Seconds the burst was collected for
+    """
+    watcher.wait(None)
+    started = time.monotonic()
+    while True:
+        remaining = max_wait_seconds - (time.monotonic() - started)
+        if remaining <= 0 or not watcher.wait(min(debounce_seconds, remaining)):
+            return time.monotonic() - started
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def watch_logs(config, on_results=None, max_cycles=None):
+    """
+    Analyze the logs folder continuously: new lines are analyzed in windows as they are written.
+
+    The first cycle analyzes everything not yet analyzed (like --incremental);
+    after that each burst of writes becomes one analysis window. Modules,
+    configuration, the incremental read positions and the API clients (with
+    their open connections and event loop) are set up once and kept for the
+    whole session.
+
+    Args:
+        config (dict): Configuration from get_config()
+        on_results (callable): Called with the results of every analyzed window
+        max_cycles (int): Stop after this many analysis cycles (None = run until interrupted)
+    """
+    from ai_analyzer import analyze_logs
+    from openai_client import ClientSession
+
+    logs_folder = config['logs_folder']
+    config = dict(config, incremental=True)
+    state = IncrementalState(config['incremental_state_file'], history_size=config['incremental_history'])
+    watcher = create_watcher(logs_folder, config)
+    session = ClientSession(config)
+    previous_handler = signal.signal(signal.SIGTERM, _stop)
+    print(f"Watching {os.path.abspath(logs_folder)} ({type(watcher).__name__}, "
+          f"debounce {config['watch_debounce_seconds']}s, max wait {config['watch_max_wait_seconds']}s). Press Ctrl+C to stop.")
+
+    cycles = 0
+    try:
+        while max_cycles is None or cycles < max_cycles:
+            if cycles:
+                collected = wait_for_burst(watcher, config['watch_debounce_seconds'], config['watch_max_wait_seconds'])
+                logging.info("Watch: log changes collected for %.1fs", collected)
+            cycles += 1
+            print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Watch cycle {cycles}")
+            results = analyze_logs(logs_folder, config, state=state, session=session)
+            if not results:
+                continue
+            # Severity counts are there in every payload mode, raw included
+            logs_info = results['logs_info']
+            errors = sum(logs_info.get('severities', {}).get(severity, 0) for severity in ERROR_SEVERITIES)
+            if errors:
+                print(f"ALERT: {errors} errors in {logs_info['lines']} new log lines")
+            if on_results is not None:
+                on_results(results)
+    except KeyboardInterrupt:
+        print("\nWatch mode stopped.")
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        session.close()
+        watcher.close()
@@ -0,0 +1,79 @@
+"""
+Shared fixtures: the src and bench modules on the import path, small
+synthetic Wowza logs and a configuration pointing at the mock Responses API.
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from log_parser import WOWZA_DEFAULT_FIELDS  # noqa: E402
+from mock_openai import MockResponsesServer, MockSettings  # noqa: E402
+
+FIELDS_HEADER = "#Fields: " + "\t".join(WOWZA_DEFAULT_FIELDS)
+
+
+def w3c_line(timestamp, severity="INFO", event="play", category="stream", comment="-"):
+    """One tab-separated Wowza access log record with the default fields."""
+    values = {name: "-" for name in WOWZA_DEFAULT_FIELDS}
+    values.update({
+        "date": f"{timestamp:%Y-%m-%d}", "time": f"{timestamp:%H:%M:%S}", "tz": "UTC", "x-event": event,
+        "x-category": category, "x-severity": severity, "x-status": "200", "x-comment": comment,
+        "x-sname": "camera1"
+    })
+    return "\t".join(values[name] for name in WOWZA_DEFAULT_FIELDS)
+
+
+def write_w3c_lines(path, start, count, header=True, step_seconds=10):
+    """Append count records, one every step_seconds from start; returns the time after the last one."""
+    lines = [FIELDS_HEADER] if header else []
+    timestamp = start
+    for index in range(count):
+        severity = "ERROR" if index % 7 == 0 else "INFO"
+        comment = "MediaReaderH264: codec config missing" if severity == "ERROR" else "-"
+        lines.append(w3c_line(timestamp, severity, "comment" if severity == "ERROR" else "play", comment=comment))
+        timestamp += timedelta(seconds=step_seconds)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return timestamp
+
+
+@pytest.fixture
+def log_start():
+    return datetime(2025, 8, 22, 0, 0, 0)
+
+
+@pytest.fixture
+def mock_server():
+    with MockResponsesServer(MockSettings(latency=0.01, jitter=0.0, first_token=0.0, output_tokens=50)) as server:
+        yield server
+
+
+@pytest.fixture
+def config(tmp_path, mock_server):
+    """Configuration for local runs against the mock server, with every file under tmp_path."""
+    from config import get_config
+    config = get_config()
+    config.update(
+        api_key="sk-test",
+        base_url=mock_server.base_url,
+        logs_folder=str(tmp_path / "logs"),
+        results_folder=str(tmp_path / "results"),
+        cache_mode="off",
+        runs_folder="",
+        metrics_enabled=False,
+        incremental_state_file=str(tmp_path / "state" / "incremental_state.json"),
+        log_index_file=str(tmp_path / "state" / "log_index.sqlite"),
+        batch_folder=str(tmp_path / "batches"),
+        batch_poll_seconds=0.05,
+        max_retries=1,
+        log_parse_workers=1
+    )
+    (tmp_path / "logs").mkdir()
+    return config
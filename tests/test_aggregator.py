@@ -0,0 +1,49 @@
+from aggregator import LogAggregator, LogSampler, build_summary_payload
+from conftest import FIELDS_HEADER, w3c_line
+from log_parser import parse_batches
+
+
+def test_summary_counts(log_start):
+    lines = [FIELDS_HEADER] + [
+        w3c_line(log_start.replace(minute=index // 4, second=index % 4 * 10), "ERROR" if index % 5 == 0 else "INFO",
+                 comment=f"stream {index} reconnect failed" if index % 5 == 0 else "-")
+        for index in range(20)
+    ]
+
+    _, summary = build_summary_payload(lines)
+
+    assert summary["total_records"] == 20
+    assert summary["total_errors"] == 4
+    assert summary["severity_distribution"] == {"INFO": 16, "ERROR": 4}
+    assert summary["error_categories"] == {"stream": 4}
+    assert summary["error_category_percentages"] == {"stream": 100.0}
+    # Numbers are collapsed so the same error is counted once
+    assert summary["top_messages"] == [{"message": "[ERROR] stream # reconnect failed", "count": 4}]
+    assert summary["time_range"] == {"start": "2025-08-22 00:00:00", "end": "2025-08-22 00:04:30"}
+    assert summary["rates"]["minutes_with_activity"] == 5
+    assert summary["rates"]["average_lines_per_minute"] == 4.0
+
+
+def test_merged_parts_equal_one_pass(log_start):
+    lines = [FIELDS_HEADER] + [
+        w3c_line(log_start.replace(second=index), "WARN" if index % 3 == 0 else "INFO") for index in range(60)
+    ]
+    batches = list(parse_batches(lines, batch_size=7))
+
+    whole_aggregator, whole_sampler = LogAggregator(), LogSampler(sample_lines=10)
+    for batch in batches:
+        whole_aggregator.add_batch(batch)
+        whole_sampler.add_batch(batch)
+
+    merged_aggregator, merged_sampler = LogAggregator(), LogSampler(sample_lines=10)
+    for part in (batches[:3], batches[3:5], batches[5:]):
+        aggregator, sampler = LogAggregator(), LogSampler(sample_lines=10)
+        for batch in part:
+            aggregator.add_batch(batch)
+            sampler.add_batch(batch)
+        merged_aggregator.merge(aggregator)
+        merged_sampler.merge(sampler)
+
+    assert merged_aggregator.summary() == whole_aggregator.summary()
+    assert merged_sampler.sample() == whole_sampler.sample()
+    assert len(merged_sampler.problems) == 10 and len(merged_sampler.others) == 10
@@ -0,0 +1,39 @@
+import pytest
+
+from ai_analyzer import analyze_logs, run_chunked_prompts_async
+from conftest import write_w3c_lines
+from mock_openai import MockResponsesServer, MockSettings
+from openai_client import ClientSession
+
+
+@pytest.fixture
+def slow_server(config):
+    """Mock server slow enough for requests to overlap; the config points at it."""
+    with MockResponsesServer(MockSettings(latency=0.1, jitter=0.0, first_token=0.0, output_tokens=50)) as server:
+        config['base_url'] = server.base_url
+        yield server
+
+
+def test_prompts_are_sent_concurrently_up_to_the_limit(config, log_start, slow_server):
+    config.update(prompt_set="detailed", timeline_window_minutes=0, async_mode=True, max_concurrency=2)
+    write_w3c_lines(f"{config['logs_folder']}/access.log", log_start, 50)
+
+    results = analyze_logs(config['logs_folder'], config)
+
+    assert slow_server.stats.values["max_in_flight"] == 2
+    for result in results["analysis_results"].values():
+        assert result["status"] == "success"
+        assert {"token_usage", "latency_seconds", "cost_breakdown"} <= result.keys()
+
+
+def test_chunks_are_bounded_by_the_limit_and_kept_in_order(config, slow_server):
+    config.update(max_concurrency=3, prompt_cache_warmup=False)
+    # Each chunk is longer than the one before, so results can be matched to chunks by their input tokens
+    chunks = ["x" * 400 * (index + 1) for index in range(8)]
+
+    with ClientSession(config) as session:
+        results = session.run(run_chunked_prompts_async(session.async_client, {"main_errors": "Find errors"}, iter(chunks), config))
+
+    assert slow_server.stats.values["max_in_flight"] == 3
+    prompt_tokens = [result["token_usage"]["prompt_tokens"] for result in results["main_errors"]]
+    assert prompt_tokens == sorted(prompt_tokens) and len(set(prompt_tokens)) == 8
@@ -0,0 +1,62 @@
+import json
+
+from ai_analyzer import run_prompts_batch
+from batch import (build_request_line, download_batch_results, make_custom_id, parse_custom_id, response_text,
+                   submit_batch, wait_for_batch)
+from openai_client import create_client
+
+
+def test_batch_round_trip_maps_results_to_custom_ids(tmp_path, config, mock_server):
+    shards = ["2025-08-22 00:00:01 ERROR codec config missing", "2025-08-22 00:00:02 WARN slow disk"]
+    custom_ids = [make_custom_id("error_analysis", index, shard) for index, shard in enumerate(shards)]
+    rejected_id = make_custom_id("timeline", 0, shards[0])
+    input_path = tmp_path / "batch_input.jsonl"
+    with open(input_path, "w", encoding="utf-8") as f:
+        for custom_id, shard in zip(custom_ids, shards):
+            f.write(build_request_line(custom_id, f"Analyze:\n{shard}", config))
+        # A request for another endpoint than the batch's is answered in the error file
+        request = json.loads(build_request_line(rejected_id, shards[0], config))
+        f.write(json.dumps(dict(request, url="/v1/chat/completions")) + "\n")
+
+    client = create_client(config)
+    try:
+        batch = submit_batch(client, str(input_path))
+        batch = wait_for_batch(client, batch.id, poll_seconds=0.01, timeout_seconds=5)
+        results = download_batch_results(client, batch)
+    finally:
+        client.close()
+
+    assert batch.status == "completed"
+    assert (batch.request_counts.completed, batch.request_counts.failed) == (2, 1)
+    assert set(results) == set(custom_ids) | {rejected_id}
+    for index, custom_id in enumerate(custom_ids):
+        assert parse_custom_id(custom_id) == ("error_analysis", index)
+        response = results[custom_id]["response"]
+        assert response["status_code"] == 200
+        assert json.loads(response_text(response["body"]))["summary"]["total_errors"] == 3
+    assert results[rejected_id]["response"] is None
+    assert results[rejected_id]["error"]["code"] == "invalid_url"
+    assert mock_server.stats.snapshot()["batch_requests"] == 3
+
+
+def test_run_prompts_batch_returns_results_in_shard_order(config, mock_server):
+    prompts = {"error_analysis": "List the errors.", "timeline": "Describe the timeline."}
+    shards = ["2025-08-22 00:00:01 ERROR codec config missing", "2025-08-22 00:00:02 WARN slow disk"]
+
+    results = run_prompts_batch(prompts, shards, config)
+
+    assert set(results) == set(prompts)
+    for prompt_results in results.values():
+        assert [result["status"] for result in prompt_results] == ["success", "success"]
+        assert all(result["batch_id"] == prompt_results[0]["batch_id"] for result in prompt_results)
+    assert mock_server.stats.snapshot()["batches"] == 1
+
+
+def test_run_prompts_batch_reports_failed_requests(config, mock_server):
+    mock_server.settings.error_rate = 1.0
+
+    results = run_prompts_batch({"error_analysis": "List the errors."}, ["2025-08-22 00:00:01 ERROR disk full"], config)
+
+    [result] = results["error_analysis"]
+    assert result["status"] == "error"
+    assert "Internal server error (mock)" in result["error"]
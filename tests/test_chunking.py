@@ -0,0 +1,35 @@
+import json
+
+from chunking import merge_answers, merge_values
+
+
+def test_merge_values_sums_only_counts():
+    chunks = [
+        {"summary": {"total_errors": 4, "error_categories": {"codec": 3, "server": 1}},
+         "top_errors": [{"error_type": "codec config missing", "count": 3}],
+         "settings": {"keyframe_interval": 2, "max_quality_level": 3},
+         "system_health_score": 80},
+        {"summary": {"total_errors": 2, "error_categories": {"codec": 2}},
+         "top_errors": [{"error_type": "Codec config missing", "count": 2}],
+         "settings": {"keyframe_interval": 4, "max_quality_level": 5},
+         "system_health_score": 60},
+    ]
+    merged = merge_values(None, chunks)
+    assert merged["summary"] == {"total_errors": 6, "error_categories": {"codec": 5, "server": 1}}
+    assert merged["top_errors"] == [{"error_type": "codec config missing", "count": 5}]
+    # A setting is not a count: the first chunk's value is kept, levels keep the highest
+    assert merged["settings"] == {"keyframe_interval": 2, "max_quality_level": 5}
+    assert merged["system_health_score"] == 70
+
+
+def test_merge_answers_of_json_chunks():
+    answers = ['```json\n{"stability_score": 6, "keyframe_interval": 2}\n```', '{"stability_score": 8, "keyframe_interval": 2}']
+    assert json.loads(merge_answers(answers)) == {"stability_score": 7, "keyframe_interval": 2}
+
+
+def test_merge_rule_matches_whole_words_of_the_key():
+    chunks = [{"generated_errors": 3, "separate_streams": 2, "error_rates": 10, "peak_viewers": 5},
+              {"generated_errors": 1, "separate_streams": 4, "error_rates": 20, "peak_viewers": 9}]
+    # The first two keys contain "rate" but not as a word: a count is summed, a plain number kept
+    assert merge_values(None, chunks) == {"generated_errors": 4, "separate_streams": 2, "error_rates": 15,
+                                          "peak_viewers": 9}
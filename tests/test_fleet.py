@@ -0,0 +1,30 @@
+import json
+
+import response_cache
+from conftest import write_w3c_lines
+from fleet import analyze_fleet, load_manifest
+
+
+def test_fleet_servers_share_one_response_cache(config, tmp_path, log_start, monkeypatch):
+    servers = []
+    for name in ("origin-1", "edge-1"):
+        folder = tmp_path / name
+        folder.mkdir()
+        write_w3c_lines(folder / "access.log", log_start, 50)
+        servers.append({"name": name, "logs_folder": str(folder)})
+    manifest = tmp_path / "fleet.json"
+    manifest.write_text(json.dumps({"servers": servers}))
+    config.update(cache_mode="on", cache_folder=str(tmp_path / "cache"), fleet_server_workers=2,
+                  timeline_window_minutes=0)
+
+    caches = []
+    monkeypatch.setattr(response_cache.ResponseCache, "__init__",
+                        lambda self, *args, _init=response_cache.ResponseCache.__init__, **kwargs:
+                        caches.append(self) or _init(self, *args, **kwargs))
+
+    results = analyze_fleet(load_manifest(str(manifest)), config)
+
+    assert results["servers_succeeded"] == 2
+    assert len(caches) == 1
+    # Both servers' entries are counted against the one size limit
+    assert caches[0].total_bytes == sum(path.stat().st_size for path in (tmp_path / "cache").rglob("*.json"))
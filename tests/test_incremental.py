@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from ai_analyzer import analyze_logs
+from conftest import write_w3c_lines
+from incremental import IncrementalState
+from log_index import fts5_available
+
+import pytest
+
+
+def _windowed_records(results):
+    return sum(window["records"] for window in results["analysis_results"]["timeline_analysis"]["windows"]["ranges"])
+
+
+@pytest.mark.skipif(not fts5_available(), reason="SQLite without FTS5")
+def test_retrieval_run_without_new_lines_keeps_read_positions(config, log_start):
+    config.update(log_payload_mode="retrieval", incremental=True, prompt_set="detailed", timeline_window_minutes=15)
+    log_file = f"{config['logs_folder']}/access.log"
+    end = write_w3c_lines(log_file, log_start, 120)
+
+    first = analyze_logs(config['logs_folder'], config)
+    assert _windowed_records(first) == 120
+
+    # Nothing new: the run stops early and must not forget the read positions
+    assert analyze_logs(config['logs_folder'], config) is None
+    assert IncrementalState(config['incremental_state_file']).previous_files
+
+    write_w3c_lines(log_file, end + timedelta(minutes=1), 20, header=False)
+    third = analyze_logs(config['logs_folder'], config)
+    assert third["logs_info"]["lines"] == 20
+    assert _windowed_records(third) == 20
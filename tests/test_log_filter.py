@@ -0,0 +1,37 @@
+from conftest import FIELDS_HEADER, w3c_line
+from log_filter import LineFilter
+
+
+def _lines(log_start, errors, count=20):
+    return [FIELDS_HEADER] + [
+        w3c_line(log_start.replace(second=index), "ERROR" if index in errors else "INFO", comment=f"line{index}")
+        for index in range(count)
+    ]
+
+
+def _kept_indexes(kept):
+    return [int(line.rsplit("line", 1)[1].split("\t")[0]) for line in kept if not line.startswith("#")]
+
+
+def test_context_lines_around_each_match(log_start):
+    lines = _lines(log_start, errors={5, 15})
+    stats = {}
+
+    kept = list(LineFilter(severities=("error",), context=2).filter(lines, stats=stats))
+
+    assert kept[0] == FIELDS_HEADER
+    assert _kept_indexes(kept) == [3, 4, 5, 6, 7, 13, 14, 15, 16, 17]
+    assert stats["lines_in"] == 21
+    assert stats["lines_kept"] == 11
+    assert stats["lines_removed"] == 10
+    assert stats["characters_removed"] == sum(len(line) + 1 for line in lines[1:4] + lines[9:14] + lines[19:])
+
+
+def test_overlapping_context_keeps_each_line_once(log_start):
+    kept = LineFilter(severities=("ERROR",), context=2).filter(_lines(log_start, errors={5, 8}))
+    assert _kept_indexes(kept) == list(range(3, 11))
+
+
+def test_pattern_match_without_context(log_start):
+    kept = LineFilter(patterns=(r"LINE1\d",)).filter(_lines(log_start, errors=set()))
+    assert _kept_indexes(kept) == list(range(10, 20))
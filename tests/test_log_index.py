@@ -0,0 +1,53 @@
+import pytest
+
+from log_index import LogIndex, fts5_available
+
+pytestmark = pytest.mark.skipif(not fts5_available(), reason="SQLite without FTS5")
+
+
+def rows(index):
+    return index.connection.execute("SELECT ts, severity, category, message FROM lines ORDER BY id").fetchall()
+
+
+def test_appended_lines_are_indexed_with_the_file_header(config, tmp_path):
+    log_file = tmp_path / "logs" / "access.log"
+    log_file.write_text("#Fields: date\ttime\tx-severity\tx-category\tx-comment\n"
+                        "2024-01-01\t10:00:00\tERROR\tvhost\tboom one\n")
+    with LogIndex(config['log_index_file'], config['logs_folder']) as index:
+        assert index.update(config) == 1
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write("2024-01-01\t10:05:00\tERROR\tvhost\tboom two\n")
+
+    with LogIndex(config['log_index_file'], config['logs_folder']) as index:
+        assert index.update(config) == 1
+        assert rows(index) == [
+            ("2024-01-01 10:00:00", "ERROR", "vhost", "vhost boom one"),
+            ("2024-01-01 10:05:00", "ERROR", "vhost", "vhost boom two"),
+        ]
+
+
+def test_retrieval_ranks_matches_first_and_fits_the_budget(config):
+    lines = ["#Fields: date\ttime\tx-severity\tx-category\tx-sname\tx-comment"]
+    for second in range(3):
+        lines.append(f"2024-01-01\t10:00:0{second}\tERROR\tstream\tcam{second}\tcodec config missing for track {second}")
+    lines += [
+        "2024-01-01\t10:01:00\tCRITICAL\tserver\tcam9\tout of memory",
+        "2024-01-01\t10:02:00\tWARN\tstream\tcam1\tslow disk",
+        "2024-01-01\t10:03:00\tINFO\tstream\tcam1\tplay started",
+    ]
+    with LogIndex(config['log_index_file'], config['logs_folder']) as index:
+        assert index.add_lines(lines) == 6
+
+        rendered, report = index.retrieve(("codec",), ("CRITICAL", "ERROR", "WARN"))
+        # Search matches first, repeats collapsed; then the other problems, most severe first
+        assert rendered == [
+            "x3 2024-01-01 10:00:00..2024-01-01 10:00:02 ERROR stream codec config missing for track 0 (3 streams)",
+            "2024-01-01 10:01:00 CRITICAL server out of memory (stream cam9)",
+            "2024-01-01 10:02:00 WARN stream slow disk (stream cam1)",
+        ]
+        assert report == {"distinct": 3, "matched": 5, "returned": 3}
+
+        # A budget of one line: the rest is counted but not returned
+        rendered, report = index.retrieve(("codec",), ("CRITICAL", "ERROR", "WARN"), max_tokens=30)
+        assert len(rendered) == 1 and rendered[0].startswith("x3 ")
+        assert report == {"distinct": 3, "matched": 5, "returned": 1}
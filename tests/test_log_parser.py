@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from aggregator import build_summary_payload
+from conftest import w3c_line
+from incremental import IncrementalState
+from log_parser import parse_records
+from log_reader import collect_log_text, iter_log_lines
+from time_windows import iter_time_windows
+
+
+def test_line_not_matching_the_header_is_plain_text():
+    records = list(parse_records([
+        "#Fields: date\ttime\tx-severity\tx-comment",
+        "2025-08-22\t00:00:01\tINFO\tok",
+        "2025-08-22 00:00:02 ERROR server crashed: codec failure",
+    ]))
+    assert [record.severity for record in records] == ["INFO", "ERROR"]
+    assert records[1].comment == "2025-08-22 00:00:02 ERROR server crashed: codec failure"
+    assert records[1].get("date") is None
+
+
+def test_header_applies_to_its_own_file_only(tmp_path, log_start):
+    # A W3C file with a short custom header, a plain text log and a W3C file without header
+    (tmp_path / "a_custom.log").write_text(
+        "#Fields: date\ttime\tx-severity\tx-comment\n2025-08-22\t00:00:01\tWARN\tslow disk\n"
+    )
+    (tmp_path / "b_plain.log").write_text(
+        "2025-08-22 00:00:02 ERROR server crashed: codec failure\n2025-08-22 00:00:03 INFO restarted\n"
+    )
+    (tmp_path / "c_default.log").write_text(w3c_line(log_start, "CRITICAL", "comment", "server", "out of memory") + "\n")
+
+    _, summary = build_summary_payload(iter_log_lines(Path(tmp_path)))
+    assert summary["total_records"] == 4
+    assert summary["severity_distribution"] == {"WARN": 1, "ERROR": 1, "INFO": 1, "CRITICAL": 1}
+    assert summary["time_range"]["start"] == "2025-08-22 00:00:00"
+
+
+def test_resumed_read_keeps_the_file_header(tmp_path, config):
+    log_file = tmp_path / "custom.log"
+    log_file.write_text(
+        "#Fields: date\ttime\tx-severity\tx-category\tx-comment\n"
+        "2025-08-22\t00:00:01\tWARN\tstream\tslow disk\n"
+    )
+    state = IncrementalState(config['incremental_state_file'])
+    _, first = build_summary_payload(iter_log_lines(Path(tmp_path), state=state))
+    state.save()
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write("2025-08-22\t00:05:00\tERROR\tstream\tdecoder failed\n")
+
+    [window] = iter_time_windows(tmp_path, window_minutes=15, state=state)
+    assert (window.label, window.records) == ("2025-08-22 00:00 to 2025-08-22 00:15", 1)
+
+    stats = {}
+    _, second = build_summary_payload(iter_log_lines(Path(tmp_path), stats=stats, state=state), stats=stats)
+
+    assert first["error_categories"] == {}
+    assert second["total_records"] == 1
+    assert second["error_categories"] == {"stream": 1}
+    assert second["time_range"] == {"start": "2025-08-22 00:05:00", "end": "2025-08-22 00:05:00"}
+    # The replayed header is parsed, not counted as a line read
+    assert stats["lines"] == 1
+
+
+
+def test_collected_text_fits_the_byte_limit():
+    lines = ["Überlast: Größe überschritten, Ströme über Äquivalenzgrenze"] * 10
+    stats = {}
+
+    text = collect_log_text(lines, 200, stats=stats)
+
+    # 67 bytes per line with its newline, although only 60 characters
+    assert len(text.encode("utf-8")) <= 200
+    assert text.count("\n") + 1 == 2
+    assert stats["truncated"] is True
@@ -0,0 +1,52 @@
+from conftest import FIELDS_HEADER, w3c_line
+from log_templates import TemplateMiner, build_template_payload
+
+
+def test_similar_lines_share_a_template():
+    miner = TemplateMiner()
+    for session in range(5):
+        miner.add(f"stream camera{session} stopped by client")
+    miner.add("stream camera1 stopped by timeout", "2025-08-22 00:00:10")
+    miner.add("server started", "2025-08-22 00:00:00")
+
+    templates = miner.templates()
+
+    assert [(template["template"], template["count"]) for template in templates] == [
+        ("stream <*> stopped by <*>", 6),
+        ("server started", 1)
+    ]
+    assert templates[0]["examples"] == {"1": ["camera0", "camera1", "camera2"], "4": ["timeout"]}
+    assert templates[1]["first_seen"] == templates[1]["last_seen"] == "2025-08-22 00:00:00"
+
+
+def test_template_count_is_capped():
+    miner = TemplateMiner(max_clusters=2)
+    for word in ("alpha", "beta", "gamma"):
+        miner.add(f"{word} event happened")
+        miner.add(f"{word} event happened")
+
+    assert [template["template"] for template in miner.templates()] == ["beta event happened", "gamma event happened"]
+    assert miner.stats["templates_evicted"] == 1
+    assert miner.stats["evicted_lines"] == 2
+
+
+def test_template_payload_of_w3c_records(log_start):
+    lines = [FIELDS_HEADER] + [
+        w3c_line(log_start.replace(second=index), "ERROR", "comment", comment=f"Reconnect attempt {index} failed")
+        for index in range(10)
+    ]
+    stats = {}
+
+    payload, summary, templates = build_template_payload(lines, stats=stats)
+
+    assert templates == [{
+        # Empty fields ("-") are left out of the mined message
+        "template": "ERROR stream comment Reconnect attempt <*> failed",
+        "count": 10,
+        "first_seen": "2025-08-22 00:00:00",
+        "last_seen": "2025-08-22 00:00:09",
+        "examples": {"5": ["0", "1", "2"]}
+    }]
+    assert summary["total_records"] == 10
+    assert stats["templates"] == 1
+    assert "LOG TEMPLATES (1 most frequent of 10 lines" in payload
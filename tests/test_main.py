@@ -0,0 +1,33 @@
+import json
+import subprocess
+import sys
+
+from conftest import ROOT
+
+# Runs local commands in a fresh interpreter and reports which heavy modules they imported
+LOCAL_COMMANDS = """
+import json, sys
+sys.path.insert(0, {src!r})
+import main
+import ai_analyzer, fleet, planner, watcher
+imported = [name for name in ("openai", "httpx", "dotenv") if name in sys.modules]
+main.main(["report", "results.json"])
+main.main(["plan"])
+print(json.dumps([imported, [name for name in ("openai", "httpx") if name in sys.modules]]))
+"""
+
+
+def test_local_commands_do_not_import_the_openai_client(tmp_path):
+    (tmp_path / "results.json").write_text(json.dumps({"timestamp": "2025-08-22 00:00:00", "results": {}}))
+
+    completed = subprocess.run(
+        [sys.executable, "-c", LOCAL_COMMANDS.format(src=str(ROOT / "src"))],
+        cwd=tmp_path, capture_output=True, text=True, timeout=60
+    )
+
+    assert completed.returncode == 0, completed.stderr
+    assert "Results: results.json" in completed.stdout
+    # Nothing heavy at import time; .env is only loaded once a command reads the configuration
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == [[], []]
+    # Importing the modules and running local commands write no log file
+    assert not (tmp_path / "wowza_analysis.log").exists()
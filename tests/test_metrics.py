@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+
+from metrics import METRIC_PREFIX, PROMETHEUS_FILE, Metrics
+
+
+def test_export_writes_prometheus_counters_and_an_otlp_trace(tmp_path):
+    metrics = Metrics()
+    with metrics.span("analyze", server="edge-1"):
+        with metrics.span("build_payload", lines=120):
+            pass
+        with pytest.raises(TimeoutError):
+            with metrics.span("send_prompt", prompt="main_errors"):
+                raise TimeoutError()
+    metrics.add("tokens_sent", 1200)
+    metrics.add("tokens_sent", 300)
+
+    prometheus_path, trace_path = metrics.export(tmp_path, "run1")
+
+    assert prometheus_path == tmp_path / PROMETHEUS_FILE
+    prometheus = prometheus_path.read_text(encoding="utf-8").splitlines()
+    assert f'{METRIC_PREFIX}_stage_calls_total{{stage="send_prompt"}} 1' in prometheus
+    assert f"{METRIC_PREFIX}_tokens_sent_total 1500" in prometheus
+    assert any(line.startswith(f'{METRIC_PREFIX}_stage_seconds_total{{stage="analyze"}} ') for line in prometheus)
+
+    trace = json.loads(trace_path.read_text(encoding="utf-8"))
+    resource = trace["resourceSpans"][0]
+    spans = {span["name"]: span for span in resource["scopeSpans"][0]["spans"]}
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "wowza-log-analyzer"}}]
+    assert "parentSpanId" not in spans["analyze"]
+    assert spans["build_payload"]["parentSpanId"] == spans["analyze"]["spanId"]
+    assert spans["build_payload"]["attributes"] == [{"key": "lines", "value": {"intValue": "120"}}]
+    assert spans["send_prompt"]["status"] == {"code": 2, "message": "TimeoutError"}
+    assert len({span["traceId"] for span in spans.values()}) == 1
+
+    # The next export only holds the spans finished since, under a new trace ID
+    _, next_trace_path = metrics.export(tmp_path, "run2")
+    next_trace = json.loads(next_trace_path.read_text(encoding="utf-8"))
+    assert next_trace["resourceSpans"][0]["scopeSpans"][0]["spans"] == []
+    assert metrics.stage_summary()["analyze"]["calls"] == 1
+
+
+def test_spans_of_asyncio_tasks_are_children_of_the_open_span():
+    metrics = Metrics()
+
+    async def send(prompt):
+        with metrics.span("send_prompt", prompt=prompt):
+            await asyncio.sleep(0)
+
+    async def run():
+        with metrics.span("dispatch") as parent:
+            await asyncio.gather(send("a"), send("b"))
+        return parent
+
+    parent = asyncio.run(run())
+
+    children = [span for span in metrics.spans if span.name == "send_prompt"]
+    assert len(children) == 2
+    assert all(span.parent_id == parent.span_id for span in children)
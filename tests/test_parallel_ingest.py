@@ -0,0 +1,41 @@
+import gzip
+from pathlib import Path
+
+from aggregator import build_summary_payload, format_summary_payload
+from conftest import w3c_line, write_w3c_lines
+from log_reader import iter_log_lines
+from parallel_ingest import aggregate_logs_parallel
+
+
+def write_mixed_logs(folder, start):
+    """W3C logs with default and custom headers, a plain text log and a gzip archive."""
+    write_w3c_lines(folder / "access.log", start, 400)
+    with open(folder / "custom.log", "w", encoding="utf-8") as f:
+        f.write("#Fields: date\ttime\tx-severity\tx-comment\n")
+        for second in range(300):
+            f.write(f"2025-08-22\t01:{second // 60:02d}:{second % 60:02d}\t{'WARN' if second % 5 else 'INFO'}\tslow disk\n")
+        # Does not match the header: kept as plain text
+        f.write("2025-08-22 01:05:00 ERROR server crashed: codec failure\n")
+    with open(folder / "server.log", "w", encoding="utf-8") as f:
+        for second in range(200):
+            f.write(f"2025-08-22 02:00:{second % 60:02d} {'ERROR' if second % 9 == 0 else 'INFO'} worker {second} ready\n")
+    with gzip.open(folder / "old.log.gz", "wt", encoding="utf-8") as f:
+        f.write("\n".join(w3c_line(start, "CRITICAL", "comment", "server", "out of memory") for _ in range(50)) + "\n")
+
+
+def test_parallel_and_sequential_summaries_are_equal(tmp_path, log_start):
+    write_mixed_logs(tmp_path, log_start)
+
+    sequential_stats = {}
+    sequential = build_summary_payload(iter_log_lines(Path(tmp_path), stats=sequential_stats), sample_lines=50,
+                                       stats=sequential_stats)
+    parallel_stats = {}
+    # Small byte ranges so the W3C and plain files are split across workers
+    aggregator, sampler = aggregate_logs_parallel(tmp_path, workers=3, split_bytes=4096, sample_lines=50,
+                                                  stats=parallel_stats)
+
+    assert parallel_stats["workers"] == 3
+    assert format_summary_payload(aggregator, sampler) == sequential
+    assert sequential[1]["severity_distribution"]["CRITICAL"] == 50
+    for name in ("lines", "records", "plain_lines", "directives"):
+        assert parallel_stats[name] == sequential_stats[name], name
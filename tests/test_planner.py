@@ -0,0 +1,56 @@
+import pytest
+
+from ai_analyzer import analyze_logs
+from conftest import write_w3c_lines
+from planner import budget_overruns, preflight, split_shards
+from prompts import WowzaAnalysisPrompts
+
+
+def test_split_shards_cuts_at_the_chunk_size(config):
+    config.update(chunking_enabled=True, chunk_max_tokens=100)
+    assert split_shards(1000, config) == [400, 400, 200]
+    assert split_shards(800, config) == [400, 400]
+    assert split_shards(0, config) == [0]
+
+    # Without chunking one request is sent, cut at the memory limit
+    config.update(chunking_enabled=False, log_memory_limit_mb=1)
+    assert split_shards(5 * 1024 * 1024, config) == [1024 * 1024]
+
+
+@pytest.fixture
+def over_budget(config, log_start):
+    """Raw run of 2000 lines with a token budget of a third of its projection; returns the prompts."""
+    config.update(log_payload_mode="raw", chunk_max_tokens=2000, max_run_cost_usd=0.0)
+    write_w3c_lines(f"{config['logs_folder']}/access.log", log_start, 2000)
+    prompts = WowzaAnalysisPrompts.get_active_prompts(config['prompt_set'])
+    action, plan, step = preflight(config['logs_folder'], prompts, config)
+    assert (action, step) == (None, 1)
+    config['max_run_tokens'] = plan['total']['tokens'] // 3
+    return prompts
+
+
+def test_preflight_aborts_over_budget(config, over_budget):
+    config['budget_action'] = "abort"
+    action, plan, step = preflight(config['logs_folder'], over_budget, config)
+    assert (action, step) == ("abort", 1)
+    assert plan['budget_problems']
+
+
+def test_preflight_downsamples_to_fit_the_budget(config, over_budget):
+    config['budget_action'] = "downsample"
+    action, plan, step = preflight(config['logs_folder'], over_budget, config)
+    assert action == "downsample"
+    assert step >= 3 and plan['sample_step'] == step
+    assert not budget_overruns(plan, config)
+
+
+def test_preflight_switches_to_summary(config, over_budget):
+    config['budget_action'] = "summary"
+    action, _, _ = preflight(config['logs_folder'], over_budget, config)
+    assert action == "summary"
+
+
+def test_run_over_budget_is_aborted_before_any_request(config, over_budget, mock_server):
+    config['budget_action'] = "abort"
+    assert analyze_logs(config['logs_folder'], config) is None
+    assert mock_server.stats.values["requests"] == 0
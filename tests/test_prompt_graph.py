@@ -0,0 +1,33 @@
+import pytest
+
+from prompt_graph import AGGREGATES, LOGS, plan_stages, resolve_inputs
+
+PROMPTS = {"errors": "...", "streams": "...", "root_cause": "...", "report": "..."}
+
+
+def test_stages_follow_the_dependencies():
+    inputs = resolve_inputs(PROMPTS, {"root_cause": ["errors", AGGREGATES], "report": ["root_cause", "streams"]})
+
+    log_prompts, stages = plan_stages(PROMPTS, inputs)
+
+    assert list(log_prompts) == ["errors", "streams"]
+    assert [list(stage) for stage in stages] == [["root_cause"], ["report"]]
+
+
+def test_prompt_without_its_upstream_prompts_reads_the_logs():
+    prompts = {"streams": "...", "root_cause": "...", "report": "..."}
+    inputs = resolve_inputs(prompts, {"root_cause": ["errors"], "report": ["root_cause", "missing"]})
+
+    assert inputs == {"streams": (LOGS,), "root_cause": (LOGS,), "report": ("root_cause",)}
+
+
+def test_cycle_is_rejected():
+    inputs = resolve_inputs(PROMPTS, {"root_cause": ["report"], "report": ["root_cause"]})
+
+    with pytest.raises(ValueError, match="cycle: root_cause, report"):
+        plan_stages(PROMPTS, inputs)
+
+
+def test_logs_cannot_be_combined_with_other_inputs():
+    with pytest.raises(ValueError, match="report"):
+        resolve_inputs(PROMPTS, {"report": [LOGS, "errors"]})
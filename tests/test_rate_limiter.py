@@ -0,0 +1,59 @@
+import threading
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from rate_limiter import FairSlots, RateLimiter, RequestScheduler
+
+
+class RecordingLimiter(RateLimiter):
+    """Rate limiter that records how many slots were taken while it was waited for."""
+
+    def __init__(self, slots):
+        super().__init__()
+        self.slots = slots
+        self.in_flight_at_acquire = []
+
+    def acquire(self, estimated_tokens):
+        self.in_flight_at_acquire.append(self.slots.total_in_flight)
+        super().acquire(estimated_tokens)
+
+
+def raw_response():
+    return SimpleNamespace(headers={}, parse=lambda: SimpleNamespace(usage=None))
+
+
+def test_slot_is_taken_after_the_rate_limiter():
+    slots = FairSlots(1)
+    limiter = RecordingLimiter(slots)
+    scheduler = RequestScheduler(limiter, slots=slots).for_tenant("edge1")
+
+    scheduler.call(raw_response, 100)
+
+    assert limiter.in_flight_at_acquire == [0]
+    assert slots.total_in_flight == 0
+
+
+def test_retries_are_counted_across_threads():
+    scheduler = RequestScheduler(RateLimiter(), max_retries=3, base_delay=0.0)
+    failures = threading.local()
+
+    def send():
+        failures.count = getattr(failures, "count", 0) + 1
+        if failures.count <= 2:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://mock/v1/responses"))
+        return raw_response()
+
+    def worker():
+        for _ in range(50):
+            failures.count = 0
+            scheduler.call(send, 10)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert scheduler.retries == 8 * 50 * 2
@@ -0,0 +1,38 @@
+import os
+import time
+
+import response_cache
+from response_cache import ResponseCache
+
+
+def entry(index):
+    return {"answer": f"answer {index} " + "x" * 200}
+
+
+def test_cache_folder_is_scanned_only_when_over_the_limit(tmp_path, monkeypatch):
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(response_cache.os, "walk", lambda folder: walks.append(folder) or walk(folder))
+    cache = ResponseCache(str(tmp_path), max_bytes=2000)
+
+    for index in range(5):
+        cache.put(f"{index:02d}" * 32, entry(index))
+    # Measured on the first write only, the rest is counted in memory
+    assert len(walks) == 1
+    assert cache.total_bytes == sum(os.path.getsize(cache._path(f"{index:02d}" * 32)) for index in range(5))
+
+    # Overwriting an entry does not count it twice
+    cache.put("00" * 32, entry(0))
+    assert len(walks) == 1
+
+    for index in range(5, 12):
+        time.sleep(0.01)
+        cache.put(f"{index:02d}" * 32, entry(index))
+    assert len(walks) > 1
+    assert cache.total_bytes <= 2000
+    assert cache.total_bytes == sum(
+        os.path.getsize(os.path.join(directory, name)) for directory, _, names in walk(tmp_path) for name in names
+    )
+    # The most recently written entries are kept
+    assert cache.get("11" * 32)["answer"].startswith("answer 11")
+    assert cache.get("01" * 32) is None
@@ -0,0 +1,42 @@
+from result_sink import ResultSink, open_result_sink
+
+
+def _success(answer):
+    return {"status": "success", "answer": answer}
+
+
+def test_resume_returns_only_successful_results(tmp_path):
+    path = tmp_path / "runs" / "run1.ndjson"
+    sink = ResultSink(path, "run1")
+    sink.record("main_errors [chunk 1]", "fp1", _success("first"))
+    sink.record("main_errors [chunk 2]", "fp2", {"status": "error", "error": "timeout"})
+
+    resumed = ResultSink(path, "run1", resume=True)
+
+    assert resumed.get("main_errors [chunk 1]", "fp1") == dict(_success("first"), resumed=True)
+    # Failed requests and changed inputs are sent again
+    assert resumed.get("main_errors [chunk 2]", "fp2") is None
+    assert resumed.get("main_errors [chunk 1]", "other") is None
+
+
+def test_record_after_a_crash_starts_on_a_new_line(tmp_path):
+    path = tmp_path / "run1.ndjson"
+    ResultSink(path, "run1").record("a", "fp1", _success("first"))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"run_id": "run1", "label": "b", "fing')
+
+    resumed = ResultSink(path, "run1", resume=True)
+    resumed.record("c", "fp3", _success("third"))
+
+    again = ResultSink(path, "run1", resume=True)
+    assert again.get("a", "fp1") is not None
+    assert again.get("c", "fp3") is not None
+    assert not again.partial_line
+
+
+def test_resume_without_earlier_run_starts_a_new_one(config, tmp_path):
+    config.update(runs_folder=str(tmp_path / "runs"), resume=True, run_id=None)
+
+    sink = open_result_sink(config)
+
+    assert sink.run_id and not sink.completed
@@ -0,0 +1,61 @@
+import gzip
+from datetime import timedelta
+
+from ai_analyzer import analyze_logs
+from conftest import FIELDS_HEADER, w3c_line, write_w3c_lines
+from payload import iter_window_payloads
+from time_windows import iter_time_windows
+
+
+def test_window_larger_than_a_chunk_is_split_and_merged(config, log_start):
+    config.update(log_payload_mode="raw", prompt_set="detailed", timeline_window_minutes=15, chunk_max_tokens=600)
+    # 10 minutes of records: one window, several chunks long
+    write_w3c_lines(f"{config['logs_folder']}/access.log", log_start, 60)
+
+    results = analyze_logs(config['logs_folder'], config)
+
+    timeline = results["analysis_results"]["timeline_analysis"]
+    assert timeline["status"] == "success"
+    # The parts are merged back into one result for the window
+    assert timeline["windows"]["total"] == 1
+    window = timeline["windows"]["ranges"][0]
+    assert (window["start"], window["end"], window["records"]) == ("2025-08-22 00:00", "2025-08-22 00:15", 60)
+    assert window["parts"] > 1
+
+
+def test_window_cut_at_the_memory_limit_records_the_dropped_lines(config, log_start):
+    config.update(log_payload_mode="raw", chunking_enabled=False, log_memory_limit_mb=0.003)
+    write_w3c_lines(f"{config['logs_folder']}/access.log", log_start, 60)
+
+    windows = []
+    payloads = list(iter_window_payloads(config['logs_folder'], config, windows=windows))
+
+    assert len(payloads) == 1
+    kept = payloads[0].count("\n")
+    assert windows[0]["truncated"] is True
+    # The window holds its #Fields line and 60 records
+    assert windows[0]["lines_dropped"] == 61 - kept
+    assert 0 < windows[0]["lines_dropped"] < 61
+
+
+def test_files_are_merged_in_time_order(tmp_path, log_start):
+    # Two servers writing every 20 seconds, 10 seconds apart, and an older rotated archive
+    write_w3c_lines(tmp_path / "a.log", log_start + timedelta(minutes=1), 9, step_seconds=20)
+    write_w3c_lines(tmp_path / "b.log", log_start + timedelta(minutes=1, seconds=10), 9, step_seconds=20)
+    with gzip.open(tmp_path / "old.log.gz", "wt", encoding="utf-8") as f:
+        f.write(FIELDS_HEADER + "\n" + "\n".join(w3c_line(log_start + timedelta(seconds=second)) for second in (0, 30)) + "\n")
+    with open(tmp_path / "b.log", "a", encoding="utf-8") as f:
+        # Plain text stays next to the record before it
+        f.write("java.lang.IllegalStateException: codec\n")
+
+    windows = list(iter_time_windows(tmp_path, window_minutes=1))
+
+    assert [window.info() for window in windows] == [
+        {"start": "2025-08-22 00:00", "end": "2025-08-22 00:01", "records": 2},
+        {"start": "2025-08-22 00:01", "end": "2025-08-22 00:02", "records": 6},
+        {"start": "2025-08-22 00:02", "end": "2025-08-22 00:03", "records": 6},
+        {"start": "2025-08-22 00:03", "end": "2025-08-22 00:04", "records": 6},
+    ]
+    times = [line.split("\t")[1] for window in windows for line in window.lines if line[0].isdigit()]
+    assert times == sorted(times) and len(times) == 20
+    assert windows[-1].lines[-1] == "java.lang.IllegalStateException: codec"
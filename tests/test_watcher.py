@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+import openai_client
+from conftest import write_w3c_lines
+from watcher import watch_logs
+
+
+def test_watch_cycles_share_one_client_and_alert_in_raw_mode(config, log_start, monkeypatch, capsys):
+    config.update(log_payload_mode="raw", async_mode=True, timeline_window_minutes=0, watch_backend="polling",
+                  watch_poll_seconds=0.05, watch_debounce_seconds=0.05, watch_max_wait_seconds=1.0)
+    log_file = f"{config['logs_folder']}/access.log"
+    end = write_w3c_lines(log_file, log_start, 120)
+
+    created = []
+    create_async_client = openai_client.create_async_client
+    monkeypatch.setattr(openai_client, "create_async_client",
+                        lambda *args, **kwargs: created.append(1) or create_async_client(*args, **kwargs))
+
+    cycles = []
+
+    def on_results(results):
+        cycles.append(results)
+        if len(cycles) == 1:
+            # New lines for the second cycle
+            write_w3c_lines(log_file, end + timedelta(minutes=1), 20, header=False)
+
+    watch_logs(config, on_results=on_results, max_cycles=2)
+
+    assert [results["logs_info"]["lines"] for results in cycles] == [121, 20]
+    assert all(result["status"] == "success" for results in cycles for result in results["analysis_results"].values())
+    assert len(created) == 1
+    output = capsys.readouterr().out
+    assert "ALERT: 18 errors in 121 new log lines" in output
+    assert "ALERT: 3 errors in 20 new log lines" in output